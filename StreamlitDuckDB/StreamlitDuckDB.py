@@ -1,8 +1,11 @@
 # Importa las librerías necesarias
-import duckdb  # DuckDB: Base de datos embebida de alto rendimiento. Instalación: pip install duckdb
 import streamlit as st  # Streamlit: Framework para crear aplicaciones web interactivas para Machine Learning y Data Science. Instalación: pip install streamlit
-from io import StringIO  # StringIO: Clase para manejar streams de texto en memoria.  Forma parte de la librería estándar de Python.
 from code_editor import code_editor # code-editor: Componente de Streamlit para editar código. Instalación: pip install streamlit-code-editor
+import catalogoDuckDB as cdb  # Catálogo de tablas por sesión, identificadas por el hash de su contenido
+import consultasDuckDB as cq  # Consultas paginadas y descargas por lotes
+import functools  # Para pasar la ruta del archivo a la lectura diferida de la descarga
+import os  # Para borrar los archivos temporales de las descargas
+import tempfile  # Archivos temporales para generar las descargas
 
 
 # Configura la página de Streamlit
@@ -13,60 +16,31 @@ st.set_page_config(
     initial_sidebar_state="expanded"  # Barra lateral expandida al inicio
 )
 
-def eliminarTablas():
-    """
-    Elimina todas las tablas existentes en la base de datos DuckDB.
-
-    Esta función obtiene una lista de todas las tablas presentes en la base de datos DuckDB
-    y las elimina una por una. Utiliza la consulta "SHOW TABLES;" para obtener los nombres
-    de las tablas y luego ejecuta "DROP TABLE IF EXISTS" para eliminar cada tabla.
-
-    Returns:
-        None
-    """
-    tablas = duckdb.query("SHOW TABLES;").df() 
-    # Elimina todas las tablas existentes en DuckDB
-    for tabla in tablas['name'].values:        
-        duckdb.query("DROP TABLE IF EXISTS " + tabla + ";")
-
 st.header("Streamlit con DuckDB") # Título principal de la aplicación
 
-# Verifica si la clave "archivos" está en el estado de la sesión de Streamlit
-if "archivos" not in st.session_state:
-    # Si no está, inicializa la clave "archivos" con el valor 0
-    st.session_state.archivos = 0    
+# Cada sesión tiene su propia base de datos DuckDB en memoria, en lugar de la conexión global compartida
+if "conexion" not in st.session_state:
+    st.session_state.conexion = cdb.crearConexion()
+    # Diccionario {nombre de la tabla: fuente} con los archivos cargados en la sesión
+    st.session_state.catalogo = {}
+    # Caché LRU de los resultados de las consultas de la sesión
+    st.session_state.cache = cq.CacheResultados()
+conexion = st.session_state.conexion
+cache = st.session_state.cache
 # Crea un expander para cargar las fuentes de datos
 with st.expander("Fuentes de datos"):
     # Permite al usuario subir múltiples archivos CSV
     listaArchivos = st.file_uploader("Choose CSV files", accept_multiple_files=True, type="csv")        
+    # Convierte los CSV a Parquet al cargarlos, para que las siguientes sesiones no tengan que volver a leer el CSV
+    parParquet = st.toggle("Convertir a Parquet", help="Guarda una copia Parquet de cada archivo, compartida entre sesiones")
+
+# Carga solo los archivos nuevos o modificados y elimina las tablas de los archivos quitados
+st.session_state.catalogo = cdb.sincronizarCatalogo(conexion, listaArchivos or [], st.session_state.catalogo, parParquet)
 
 # Procesa los archivos subidos si existen
 if listaArchivos:
     # Obtiene las tablas existentes en DuckDB
-    tablas = duckdb.query("SHOW TABLES;").df() 
-    
-    # Verifica si es la primera vez que se suben archivos
-    if st.session_state.archivos == 0:
-        # Actualiza el estado de la sesión con el número de archivos subidos
-        st.session_state.archivos = len(listaArchivos)
-    # Si el número de archivos subidos ha cambiado
-    elif st.session_state.archivos != len(listaArchivos):
-        # Eliminamos las tablas existentes en DuckDB        
-        eliminarTablas()
-        # Actualiza la lista de tablas existentes en DuckDB
-        tablas = duckdb.query("SHOW TABLES;").df()
-    
-    # Itera sobre los archivos CSV subidos
-    for archivo in listaArchivos:
-        # Lee el contenido del archivo en memoria
-        bytes_data = StringIO(archivo.getvalue().decode("utf-8"))        
-        # Define el nombre de la tabla a partir del nombre del archivo
-        table_name = archivo.name[:-4]
-        # Crea la tabla en DuckDB si no existe
-        if table_name not in tablas['name'].values:
-            duckdb.read_csv(bytes_data).to_table(table_name)        
-    # Obtiene las tablas existentes en DuckDB
-    tablas = duckdb.query("SHOW TABLES;").df()
+    tablas = conexion.query("SHOW TABLES;").df()
     # Crea dos columnas en el layout
     c1,c2 = st.columns([3,7])
     # En la primera columna, muestra las tablas y sus columnas.
@@ -77,7 +51,7 @@ if listaArchivos:
         for tabla in tablas['name'].values:
             st.write(f'##### :material/table: {tabla}') # Muestra el nombre de la tabla.
             # Obtiene la información de las columnas de la tabla
-            columnas = duckdb.query(f"DESCRIBE {tabla};").df()
+            columnas = conexion.query(f"DESCRIBE {cdb.identificador(tabla)};").df()
             st.table(columnas) # Muestra la información de las columnas
             # Agrega la información de la tabla al array para el autocompletado
             itemTabla= {
@@ -108,17 +82,79 @@ if listaArchivos:
         st.subheader(":material/table_view: Resultado")
         # Si se ha ingresado una consulta:
         if res["text"]:
-            # Ejecuta la consulta en DuckDB.
-            dfResultado = duckdb.query(res["text"]).df()
-            # Convierte el resultado a CSV y permite descargarlo.
-            csv = dfResultado.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Descargar CSV",
-                data=csv,
-                file_name='resultado.csv',
-                mime='text/csv',
-            )
-            # Muestra el resultado en una tabla.
-            st.dataframe(dfResultado,use_container_width=True)
-else:
-    eliminarTablas()
\ No newline at end of file
+            consulta = cq.limpiarConsulta(res["text"])
+            # Los resultados se guardan en caché por consulta normalizada y contenido de las tablas,
+            # así que volver a ejecutar el script por un cambio en otro control no repite la consulta
+            clave = cq.claveConsulta(consulta, st.session_state.catalogo)
+            # Cuenta las filas con COUNT(*) sin calcular el resultado completo
+            totalFilas = cache.obtener((clave, "filas"), lambda: cq.contarFilas(conexion, consulta)) if cq.esPaginable(consulta) else None
+            if totalFilas is None:
+                # Instrucciones que no son una consulta SELECT (CREATE, INSERT, PRAGMA...): se ejecutan tal cual
+                resultado = conexion.query(res["text"])
+                # La instrucción puede haber modificado las tablas, así que los resultados guardados ya no son válidos
+                cache.limpiar()
+                if resultado is None:
+                    st.success("Instrucción ejecutada")
+                else:
+                    st.dataframe(resultado.df(),use_container_width=True)
+            else:
+                cp1,cp2,cp3 = st.columns(3)
+                # Tamaño de página y página a mostrar. Solo se leen de DuckDB las filas de la página visible
+                parTamanoPagina = cp1.selectbox("Filas por página",options=[100,1000,10000],index=1)
+                numPaginas = max(1, -(-totalFilas // parTamanoPagina))
+                parPagina = cp2.number_input("Página",min_value=1,max_value=numPaginas,value=1)
+                cp3.metric("Filas",f"{totalFilas:,}")
+                tablaPagina = cache.obtener((clave, "pagina", parPagina, parTamanoPagina),
+                                            lambda: cq.leerPagina(conexion, consulta, parPagina, parTamanoPagina))
+                inicio = (parPagina - 1) * parTamanoPagina
+                st.caption(f"Filas {min(inicio + 1, totalFilas):,} a {inicio + tablaPagina.num_rows:,} de {totalFilas:,}")
+                # Muestra la página del resultado en una tabla.
+                st.dataframe(tablaPagina,use_container_width=True)
+
+                # Plan de ejecución con el tiempo y las filas de cada operador
+                with st.expander(":material/speed: Plan de ejecución"):
+                    if st.button("Analizar consulta", help="Ejecuta la consulta con EXPLAIN ANALYZE"):
+                        dfPlan, tiempoTotal = cq.perfilConsulta(conexion, consulta)
+                        st.metric("Tiempo total", f"{tiempoTotal * 1000:,.1f} ms")
+                        st.dataframe(dfPlan.drop(columns="nivel"),use_container_width=True,hide_index=True,
+                                     column_config={"% tiempo": st.column_config.ProgressColumn("% tiempo",format="%.2f",min_value=0,max_value=1),
+                                                    "tiempo (s)": st.column_config.NumberColumn("tiempo (s)",format="%.4f")})
+
+                # Descarga del resultado completo. El archivo se escribe por lotes solo cuando se solicita
+                cd1,cd2 = st.columns([3,7],vertical_alignment="bottom")
+                parFormato = cd1.selectbox("Formato",options=list(cq.FORMATOS_DESCARGA))
+                extension, mime = cq.FORMATOS_DESCARGA[parFormato]
+                # Una descarga preparada para otra consulta u otro formato ya no sirve: se borra su archivo
+                descarga = st.session_state.get("descarga")
+                if descarga and (descarga[:2] != (consulta, parFormato) or not os.path.exists(descarga[2])):
+                    if os.path.exists(descarga[2]):
+                        os.remove(descarga[2])
+                    del st.session_state.descarga
+                if cd2.button("Preparar descarga"):
+                    if "descarga" in st.session_state:
+                        os.remove(st.session_state.descarga[2])
+                        del st.session_state.descarga
+                    # El archivo se genera en un temporal propio de esta descarga. En la sesión solo se guarda su ruta
+                    descriptor, ruta = tempfile.mkstemp(suffix=f".{extension}")
+                    os.close(descriptor)
+                    try:
+                        with st.spinner("Generando archivo..."):
+                            cq.exportarResultado(conexion, consulta, parFormato, ruta)
+                    except Exception:
+                        os.remove(ruta)
+                        raise
+                    st.session_state.descarga = (consulta, parFormato, ruta)
+                # Muestra el botón de descarga si el archivo corresponde a la consulta y el formato actuales.
+                # El archivo se lee recién al hacer clic y se borra después de leerlo
+                descarga = st.session_state.get("descarga")
+                if descarga:
+                    st.download_button(
+                        label=f"Descargar {parFormato} ({os.path.getsize(descarga[2]) / 1024 / 1024:,.1f} MB)",
+                        data=functools.partial(cq.leerYBorrar, descarga[2]),
+                        file_name=f'resultado.{extension}',
+                        mime=mime,
+                    )
+
+# Estado de la caché de resultados de la sesión
+st.sidebar.caption(f"Caché de resultados: {len(cache.entradas)} resultados, {cache.bytes / 1024 / 1024:,.1f} MB, "
+                   f"{cache.aciertos} aciertos, {cache.fallos} fallos")
@@ -0,0 +1,132 @@
+# Catálogo de DuckDB por sesión.
+# Cada archivo subido se guarda como una tabla identificada por el hash de su contenido y se expone con una vista
+# que lleva el nombre del archivo. Así, volver a subir el mismo archivo no cuesta nada y agregar un archivo
+# no obliga a volver a cargar las tablas que ya existen.
+import hashlib
+import os
+import tempfile
+import duckdb  # DuckDB: Base de datos embebida de alto rendimiento. Instalación: pip install duckdb
+
+# Carpeta de los archivos en caché compartidos entre sesiones
+CARPETA_CATALOGO = "catalogo"
+# Subcarpeta donde se guardan temporalmente los CSV subidos antes de cargarlos
+CARPETA_CSV = os.path.join(CARPETA_CATALOGO, "csv")
+# Subcarpeta de los archivos Parquet convertidos. Se comparten entre sesiones
+CARPETA_PARQUET = os.path.join(CARPETA_CATALOGO, "parquet")
+# Esquema donde se guardan las tablas identificadas por hash. SHOW TABLES solo muestra las vistas del esquema principal
+ESQUEMA_DATOS = "datos"
+
+def crearConexion():
+    """
+    Crea la base de datos DuckDB de la sesión, en memoria y separada de la conexión global compartida.
+    Al no usar un archivo, la base de datos desaparece junto con la sesión y no ocupa disco en el servidor;
+    lo único que se guarda en disco son los Parquet identificados por hash, que se comparten entre sesiones.
+    """
+    conexion = duckdb.connect(":memory:")
+    conexion.execute(f"CREATE SCHEMA IF NOT EXISTS {ESQUEMA_DATOS}")
+    return conexion
+
+def identificador(nombre):
+    """
+    Escribe un nombre de tabla o columna entre comillas dobles para usarlo en SQL.
+    """
+    return '"' + nombre.replace('"', '""') + '"'
+
+def literal(texto):
+    """
+    Escribe un texto entre comillas simples para usarlo en SQL.
+    """
+    return "'" + texto.replace("'", "''") + "'"
+
+def hashArchivo(archivo):
+    """
+    Hash del contenido de un archivo subido. getbuffer() devuelve una vista de los bytes, sin copiarlos.
+    """
+    return hashlib.sha256(archivo.getbuffer()).hexdigest()
+
+def fuenteArchivo(hashContenido, usarParquet):
+    """
+    Expresión SQL de donde se leen los datos de un archivo: la tabla del esquema de datos o el archivo Parquet.
+    """
+    if usarParquet:
+        return f"read_parquet({literal(os.path.join(CARPETA_PARQUET, hashContenido + '.parquet'))})"
+    return f"{ESQUEMA_DATOS}.{identificador('t_' + hashContenido)}"
+
+def ingresarArchivo(conexion, archivo, hashContenido, usarParquet):
+    """
+    Carga un archivo CSV subido en el catálogo, si su contenido no está cargado todavía.
+
+    Los bytes se escriben tal cual en un archivo temporal propio de la carga y DuckDB los lee con su lector
+    de CSV nativo, sin decodificar el contenido a un string de Python. Con usarParquet, el CSV se convierte
+    a Parquet una sola vez y las siguientes sesiones leen el Parquet sin volver a interpretar el CSV.
+
+    Returns:
+        La expresión SQL de donde se leen los datos del archivo.
+    """
+    fuente = fuenteArchivo(hashContenido, usarParquet)
+    if usarParquet:
+        rutaParquet = os.path.join(CARPETA_PARQUET, hashContenido + ".parquet")
+        if os.path.exists(rutaParquet):
+            return fuente
+    elif conexion.execute("SELECT count(*) FROM duckdb_tables() WHERE schema_name = ? AND table_name = ?",
+                          [ESQUEMA_DATOS, "t_" + hashContenido]).fetchone()[0]:
+        return fuente
+
+    # Cada carga usa sus propios archivos temporales: las sesiones son hilos del mismo proceso y dos sesiones
+    # pueden subir el mismo archivo al mismo tiempo
+    os.makedirs(CARPETA_CSV, exist_ok=True)
+    descriptor, rutaCSV = tempfile.mkstemp(suffix=".csv", dir=CARPETA_CSV)
+    with os.fdopen(descriptor, "wb") as csv:
+        csv.write(archivo.getbuffer())
+    try:
+        if usarParquet:
+            os.makedirs(CARPETA_PARQUET, exist_ok=True)
+            # Se escribe con otro nombre y se renombra al terminar, para que otra sesión nunca lea un Parquet incompleto
+            descriptor, rutaTemporal = tempfile.mkstemp(suffix=".parquet.tmp", dir=CARPETA_PARQUET)
+            os.close(descriptor)
+            try:
+                conexion.execute(f"COPY (SELECT * FROM read_csv({literal(rutaCSV)})) TO {literal(rutaTemporal)} (FORMAT PARQUET)")
+                os.replace(rutaTemporal, rutaParquet)
+            finally:
+                if os.path.exists(rutaTemporal):
+                    os.remove(rutaTemporal)
+        else:
+            conexion.execute(f"CREATE TABLE {fuente} AS SELECT * FROM read_csv({literal(rutaCSV)})")
+    finally:
+        os.remove(rutaCSV)
+    return fuente
+
+def sincronizarCatalogo(conexion, archivos, catalogo, usarParquet=False):
+    """
+    Actualiza las vistas del catálogo para que correspondan a los archivos subidos.
+
+    Solo se cargan los archivos cuyo contenido cambió, se eliminan las vistas de los archivos que ya no están
+    y se borran las tablas que ninguna vista usa.
+
+    Args:
+        conexion: Conexión DuckDB de la sesión.
+        archivos: Lista de archivos subidos con st.file_uploader.
+        catalogo: Diccionario {nombre de la tabla: fuente} devuelto por la sincronización anterior.
+        usarParquet: Si es True, los archivos se convierten a Parquet al cargarlos.
+
+    Returns:
+        El nuevo diccionario {nombre de la tabla: fuente}.
+    """
+    nuevoCatalogo = {}
+    for archivo in archivos:
+        # Define el nombre de la tabla a partir del nombre del archivo
+        nombre = archivo.name[:-4]
+        hashContenido = hashArchivo(archivo)
+        fuente = fuenteArchivo(hashContenido, usarParquet)
+        if catalogo.get(nombre) != fuente:
+            ingresarArchivo(conexion, archivo, hashContenido, usarParquet)
+            conexion.execute(f"CREATE OR REPLACE VIEW {identificador(nombre)} AS SELECT * FROM {fuente}")
+        nuevoCatalogo[nombre] = fuente
+    for nombre in catalogo.keys() - nuevoCatalogo.keys():
+        conexion.execute(f"DROP VIEW IF EXISTS {identificador(nombre)}")
+    # Elimina las tablas que ya no usa ninguna vista
+    enUso = set(nuevoCatalogo.values())
+    for (tabla,) in conexion.execute("SELECT table_name FROM duckdb_tables() WHERE schema_name = ?", [ESQUEMA_DATOS]).fetchall():
+        if f"{ESQUEMA_DATOS}.{identificador(tabla)}" not in enUso:
+            conexion.execute(f"DROP TABLE {ESQUEMA_DATOS}.{identificador(tabla)}")
+    return nuevoCatalogo
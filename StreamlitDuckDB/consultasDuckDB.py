@@ -0,0 +1,230 @@
+# Ejecución de consultas de la consola SQL de DuckDB sin materializar el resultado completo.
+# La tabla solo lee la página visible (LIMIT/OFFSET), el total de filas se obtiene con COUNT(*)
+# y las descargas se escriben por lotes de Arrow directamente a un archivo.
+# Incluye el perfil de ejecución (EXPLAIN ANALYZE) y una caché LRU de resultados limitada por tamaño.
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+import duckdb  # DuckDB: Base de datos embebida de alto rendimiento. Instalación: pip install duckdb
+import pyarrow.csv as pacsv  # Para escribir CSV por lotes. Se instala con streamlit
+import pyarrow.parquet as pq  # Para escribir Parquet por lotes
+
+# Número de filas por lote al escribir las descargas
+TAMANO_LOTE_DESCARGA = 100_000
+# Formatos de descarga: extensión y tipo MIME
+FORMATOS_DESCARGA = {"CSV": ("csv", "text/csv"), "Parquet": ("parquet", "application/vnd.apache.parquet")}
+# Capacidad por defecto de la caché de resultados de cada sesión
+CAPACIDAD_CACHE_BYTES = 256 * 1024 * 1024
+# Textos entre comillas (constantes y nombres) que se conservan tal cual al normalizar la consulta
+PATRON_COMILLAS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+# Inicio de un comentario SQL
+PATRON_COMENTARIO = re.compile(r"--|/\*")
+
+def limpiarConsulta(sql):
+    """
+    Quita los espacios y los punto y coma del final, para poder usar la consulta como subconsulta.
+    Se usa el tokenizador de DuckDB para encontrar el último punto y coma aunque lo siga un comentario.
+    """
+    sql = sql.strip()
+    tokens = duckdb.tokenize(sql)
+    while tokens and tokens[-1][1] == duckdb.token_type.operator and sql[tokens[-1][0]] == ";":
+        sql = sql[:tokens.pop()[0]].strip()
+    return sql
+
+def esPaginable(sql):
+    """
+    Indica si el texto es una única consulta SELECT, que se puede envolver con COUNT(*) o LIMIT/OFFSET.
+    Las instrucciones como CREATE, INSERT o varias consultas seguidas se ejecutan tal cual.
+    """
+    try:
+        instrucciones = duckdb.extract_statements(sql)
+    except duckdb.Error:
+        return False
+    return len(instrucciones) == 1 and instrucciones[0].type == duckdb.StatementType.SELECT
+
+def contarFilas(conexion, sql):
+    """
+    Cuenta las filas del resultado con COUNT(*) sobre la consulta. DuckDB optimiza la subconsulta
+    (por ejemplo, no lee las columnas que no se necesitan), así que no se calcula el resultado completo.
+
+    Returns:
+        El número de filas, o None si la consulta no se puede envolver en una subconsulta (por ejemplo PRAGMA).
+    """
+    # La consulta va en líneas separadas para que un comentario -- al final no comente el resto del SQL
+    try:
+        return conexion.execute(f"SELECT count(*) FROM (\n{sql}\n) AS consulta").fetchone()[0]
+    except duckdb.ParserException:
+        return None
+
+def leerPagina(conexion, sql, pagina, tamanoPagina):
+    """
+    Lee solo las filas de una página del resultado como tabla de Arrow.
+
+    Args:
+        conexion: Conexión DuckDB.
+        sql: Consulta SELECT.
+        pagina: Número de página, empezando en 1.
+        tamanoPagina: Número de filas por página.
+
+    Returns:
+        Una tabla de PyArrow con las filas de la página.
+    """
+    return conexion.execute(f"SELECT * FROM (\n{sql}\n) AS consulta LIMIT ? OFFSET ?",
+                            [tamanoPagina, (pagina - 1) * tamanoPagina]).fetch_arrow_table()
+
+def exportarResultado(conexion, sql, formato, ruta, tamanoLote=TAMANO_LOTE_DESCARGA):
+    """
+    Escribe el resultado completo de la consulta en un archivo CSV o Parquet, lote a lote.
+    Los lotes de Arrow se leen a medida que se escriben, así que en memoria solo hay un lote a la vez.
+
+    Args:
+        conexion: Conexión DuckDB.
+        sql: Consulta.
+        formato: 'CSV' o 'Parquet'.
+        ruta: Ruta del archivo de salida.
+        tamanoLote: Número de filas por lote.
+
+    Returns:
+        El número de filas escritas.
+    """
+    lector = conexion.execute(sql).fetch_record_batch(tamanoLote)
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    filas = 0
+    if formato == "Parquet":
+        escritor = pq.ParquetWriter(ruta, lector.schema)
+    else:
+        escritor = pacsv.CSVWriter(ruta, lector.schema)
+    with escritor:
+        for lote in lector:
+            escritor.write_batch(lote)
+            filas += lote.num_rows
+    return filas
+
+def leerYBorrar(ruta):
+    """
+    Lee un archivo de descarga ya generado y lo borra. Se usa como función de datos diferida del botón de
+    descarga: el archivo solo se lee cuando el usuario hace clic y no queda en el disco después.
+    """
+    try:
+        with open(ruta, "rb") as archivo:
+            return archivo.read()
+    finally:
+        os.remove(ruta)
+
+def normalizarConsulta(sql):
+    """
+    Normaliza la consulta con el tokenizador de DuckDB: quita comentarios y espacios sobrantes y pasa las
+    palabras clave a minúsculas. Los textos entre comillas se conservan, así que dos consultas con la misma
+    forma normalizada son la misma consulta.
+    """
+    tokens = duckdb.tokenize(sql)
+    partes = []
+    for i, (posicion, tipo) in enumerate(tokens):
+        fin = tokens[i + 1][0] if i + 1 < len(tokens) else len(sql)
+        comillas = PATRON_COMILLAS.match(sql, posicion)
+        texto = comillas.group() if comillas else PATRON_COMENTARIO.split(sql[posicion:fin])[0].strip()
+        partes.append(texto.lower() if tipo == duckdb.token_type.keyword else texto)
+    return " ".join(partes)
+
+def claveConsulta(sql, catalogo):
+    """
+    Clave de la caché: la consulta normalizada y el contenido de las tablas (el catálogo {tabla: fuente}
+    incluye el hash de cada archivo). Si se sube una nueva versión de un archivo, la clave cambia.
+    """
+    return (normalizarConsulta(sql), tuple(sorted(catalogo.items())))
+
+def tamanoResultado(valor):
+    """
+    Tamaño aproximado en bytes de un resultado guardado en la caché.
+    """
+    return getattr(valor, "nbytes", None) or sys.getsizeof(valor)
+
+class CacheResultados:
+    """
+    Caché LRU de resultados de consultas, limitada por el tamaño total en bytes.
+    Cuando se supera la capacidad se eliminan los resultados usados hace más tiempo.
+    """
+    def __init__(self, capacidadBytes=CAPACIDAD_CACHE_BYTES):
+        self.capacidadBytes = capacidadBytes
+        self.entradas = OrderedDict()  # clave -> (valor, tamaño)
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._bloqueo = threading.Lock()
+
+    def obtener(self, clave, calcular):
+        """
+        Devuelve el resultado guardado para la clave o lo calcula con calcular() y lo guarda.
+        """
+        with self._bloqueo:
+            if clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self.entradas[clave][0]
+            self.fallos += 1
+        valor = calcular()
+        tamano = tamanoResultado(valor)
+        # Un resultado más grande que toda la caché no se guarda
+        if tamano > self.capacidadBytes:
+            return valor
+        with self._bloqueo:
+            if clave not in self.entradas:
+                self.entradas[clave] = (valor, tamano)
+                self.bytes += tamano
+            while self.bytes > self.capacidadBytes:
+                _, (_, tamanoEliminado) = self.entradas.popitem(last=False)
+                self.bytes -= tamanoEliminado
+        return valor
+
+    def limpiar(self):
+        with self._bloqueo:
+            self.entradas.clear()
+            self.bytes = 0
+
+def perfilConsulta(conexion, sql):
+    """
+    Ejecuta la consulta con EXPLAIN ANALYZE y devuelve el tiempo y las filas de cada operador del plan.
+
+    Args:
+        conexion: Conexión DuckDB.
+        sql: Consulta.
+
+    Returns:
+        Una tupla que contiene:
+            - Un DataFrame con una fila por operador: nivel en el árbol, operador, tiempo (s), % del tiempo,
+              filas producidas, filas estimadas por el optimizador y detalle.
+            - El tiempo total de la consulta en segundos.
+    """
+    conexion.execute("SET enable_profiling='json'")
+    try:
+        perfil = json.loads(conexion.execute(f"EXPLAIN ANALYZE {sql}").fetchall()[0][1])
+    finally:
+        conexion.execute("RESET enable_profiling")
+    operadores = []
+
+    def recorrer(nodo, nivel):
+        tipo = nodo.get("operator_type", nodo.get("name"))
+        # El nodo EXPLAIN_ANALYZE es el propio comando, no forma parte del plan de la consulta
+        if tipo and tipo != "EXPLAIN_ANALYZE":
+            detalle = dict(nodo.get("extra_info") or {})
+            operadores.append({
+                "nivel": nivel,
+                "operador": f"{'  ' * nivel}{tipo}",
+                "tiempo (s)": nodo.get("operator_timing", nodo.get("timing", 0.0)),
+                "filas": nodo.get("operator_cardinality", nodo.get("cardinality", 0)),
+                "filas estimadas": detalle.pop("Estimated Cardinality", None),
+                "detalle": "; ".join(f"{clave}: {valor}" for clave, valor in detalle.items()),
+            })
+            nivel += 1
+        for hijo in nodo.get("children", []):
+            recorrer(hijo, nivel)
+
+    recorrer(perfil, 0)
+    dfOperadores = pd.DataFrame(operadores, columns=["nivel", "operador", "tiempo (s)", "filas", "filas estimadas", "detalle"])
+    tiempoTotal = perfil.get("latency") or float(dfOperadores["tiempo (s)"].sum())
+    dfOperadores["% tiempo"] = dfOperadores["tiempo (s)"] / max(float(dfOperadores["tiempo (s)"].sum()), 1e-12)
+    return dfOperadores, tiempoTotal
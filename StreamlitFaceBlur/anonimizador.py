@@ -0,0 +1,360 @@
+# Motor de anonimización de rostros con OpenCV.
+# El video se procesa en un pipeline: un hilo lee los frames, un pool de hilos detecta los rostros
+# (OpenCV libera el GIL, así que los detectores trabajan en paralelo en varios núcleos) y el hilo principal
+# difumina y escribe los frames en orden.
+# Los lotes de imágenes (zip o carpeta) se procesan en un pool de procesos que carga el clasificador
+# una sola vez por proceso, y los resultados se escriben en un zip a medida que terminan.
+import os
+import queue
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import cv2
+import numpy as np
+
+# Clasificador Haar Cascade para la detección de rostros frontales
+RUTA_CASCADE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modelo", "haarcascade_frontalface_default.xml")
+# Ancho en píxeles de la imagen usada para detectar. None detecta en la resolución original
+ANCHO_DETECCION = 640
+# Tamaño mínimo del rostro en la resolución original
+TAMANO_MINIMO = (30, 30)
+# Ampliación de las cajas en los frames sin detección, para cubrir el movimiento del rostro entre detecciones
+MARGEN_SEGUIMIENTO = 0.15
+# Número máximo de frames leídos por adelantado por cada hilo de detección
+FRAMES_POR_HILO = 8
+
+# Extensiones de las imágenes que se procesan en los lotes
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png")
+# Número de imágenes enviadas por adelantado a cada proceso del lote
+IMAGENES_POR_PROCESO = 4
+# Carpeta raíz de la que el modo por lotes puede leer imágenes del servidor. Se configura con la variable de
+# entorno FACEBLUR_CARPETA_LOTES; por defecto es la carpeta de ejemplos de la aplicación
+CARPETA_LOTES = os.environ.get("FACEBLUR_CARPETA_LOTES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ejemplos"))
+
+# Cada hilo usa su propio clasificador: detectMultiScale no debe llamarse en paralelo sobre el mismo objeto
+_hilo = threading.local()
+
+def cargarClasificador(rutaCascade=RUTA_CASCADE):
+    """
+    Carga el clasificador Haar Cascade.
+
+    Raises:
+        ValueError: Si no se pudo cargar el archivo.
+    """
+    clasificador = cv2.CascadeClassifier(rutaCascade)
+    if clasificador.empty():
+        raise ValueError(f"No se pudo cargar el cascade en {rutaCascade}")
+    return clasificador
+
+def clasificadorHilo(rutaCascade=RUTA_CASCADE):
+    """
+    Devuelve el clasificador del hilo actual, cargándolo la primera vez que el hilo lo necesita.
+    """
+    if getattr(_hilo, "rutaCascade", None) != rutaCascade:
+        _hilo.clasificador = cargarClasificador(rutaCascade)
+        _hilo.rutaCascade = rutaCascade
+    return _hilo.clasificador
+
+def detectarRostros(clasificador, frame, anchoDeteccion=ANCHO_DETECCION):
+    """
+    Detecta rostros en una versión reducida y en escala de grises del frame y devuelve las cajas en la
+    escala original. Reducir un frame Full HD a 640 px de ancho hace la detección varias veces más rápida.
+
+    Args:
+        clasificador: Clasificador Haar Cascade.
+        frame: Imagen BGR.
+        anchoDeteccion: Ancho de la imagen usada para detectar. None usa la resolución original.
+
+    Returns:
+        numpy.ndarray: Cajas (x, y, ancho, alto) de los rostros, de forma (n, 4).
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    escala = 1.0
+    if anchoDeteccion and gray.shape[1] > anchoDeteccion:
+        escala = anchoDeteccion / gray.shape[1]
+        gray = cv2.resize(gray, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    tamanoMinimo = tuple(max(1, int(round(lado * escala))) for lado in TAMANO_MINIMO)
+    faces = clasificador.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=tamanoMinimo)
+    if len(faces) == 0:
+        return np.empty((0, 4), dtype=int)
+    return np.round(np.asarray(faces, dtype=float) / escala).astype(int)
+
+def difuminarRostros(frame, cajas, kernel=(25, 25)):
+    """
+    Aplica un desenfoque Gaussiano sobre cada caja del frame (modifica el frame).
+    """
+    for (x, y, w, h) in cajas:
+        if w > 0 and h > 0:
+            frame[y:y+h, x:x+w] = cv2.GaussianBlur(frame[y:y+h, x:x+w], kernel, 0)
+    return frame
+
+def ampliarCajas(cajas, margen, ancho, alto):
+    """
+    Amplía las cajas un porcentaje de su tamaño en cada dirección, sin salir del frame.
+    """
+    if len(cajas) == 0:
+        return np.empty((0, 4), dtype=int)
+    cajas = np.asarray(cajas, dtype=float)
+    x0 = np.clip(cajas[:, 0] - cajas[:, 2] * margen, 0, ancho)
+    y0 = np.clip(cajas[:, 1] - cajas[:, 3] * margen, 0, alto)
+    x1 = np.clip(cajas[:, 0] + cajas[:, 2] * (1 + margen), 0, ancho)
+    y1 = np.clip(cajas[:, 1] + cajas[:, 3] * (1 + margen), 0, alto)
+    return np.stack([x0, y0, x1 - x0, y1 - y0], axis=1).round().astype(int)
+
+def interpolarCajas(cajasInicio, cajasFin, t):
+    """
+    Estima las cajas de un frame entre dos detecciones. Cada caja del inicio se empareja con la caja más
+    cercana del fin (si su centro está a menos de un tamaño de rostro) y se interpola linealmente según t (0 a 1).
+    Las cajas sin pareja se conservan: para anonimizar es preferible difuminar de más que dejar un rostro visible.
+    """
+    cajasInicio = np.asarray(cajasInicio, dtype=float).reshape(-1, 4)
+    cajasFin = np.asarray(cajasFin, dtype=float).reshape(-1, 4)
+    resultado = []
+    usadas = np.zeros(len(cajasFin), dtype=bool)
+    centrosFin = cajasFin[:, :2] + cajasFin[:, 2:] / 2
+    for caja in cajasInicio:
+        if len(cajasFin):
+            distancias = np.linalg.norm(centrosFin - (caja[:2] + caja[2:] / 2), axis=1)
+            distancias[usadas] = np.inf
+            j = int(np.argmin(distancias))
+            if distancias[j] < max(caja[2], caja[3]):
+                usadas[j] = True
+                resultado.append(caja * (1 - t) + cajasFin[j] * t)
+                continue
+        resultado.append(caja)
+    resultado.extend(cajasFin[~usadas])
+    return np.asarray(resultado).reshape(-1, 4)
+
+def _leerFrames(cap, cola, detener):
+    # Hilo lector: decodifica los frames y los deja en la cola. None indica el fin del video
+    indice = 0
+    while not detener.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        cola.put((indice, frame))
+        indice += 1
+    cola.put(None)
+
+def _detectar(frame, rutaCascade, anchoDeteccion):
+    return detectarRostros(clasificadorHilo(rutaCascade), frame, anchoDeteccion)
+
+def anonimizarVideo(rutaEntrada, rutaSalida, rutaCascade=RUTA_CASCADE, numHilos=None, cadaN=1,
+                    anchoDeteccion=ANCHO_DETECCION, kernel=(25, 25), progreso=None):
+    """
+    Difumina los rostros de un video con un pipeline de lectura, detección en paralelo y escritura en orden.
+
+    Con cadaN > 1 solo se detecta en uno de cada N frames (frames clave). En los frames intermedios las cajas
+    se interpolan entre los dos frames clave que los rodean y se amplían con MARGEN_SEGUIMIENTO.
+
+    Args:
+        rutaEntrada: Ruta del video original.
+        rutaSalida: Ruta del video procesado (códec mp4v).
+        rutaCascade: Ruta del clasificador Haar Cascade.
+        numHilos: Número de hilos de detección. Por defecto, el número de núcleos.
+        cadaN: Detectar rostros cada N frames.
+        anchoDeteccion: Ancho de la imagen usada para detectar. None usa la resolución original.
+        kernel: Tamaño del kernel del desenfoque Gaussiano (impar).
+        progreso: Función opcional progreso(framesProcesados, totalFrames).
+
+    Returns:
+        dict: Frames procesados, segundos de proceso, frames por segundo y velocidad respecto al tiempo real.
+    """
+    cargarClasificador(rutaCascade)  # Valida el cascade antes de iniciar los hilos
+    numHilos = numHilos or os.cpu_count()
+    cadaN = max(1, int(cadaN))
+    cap = cv2.VideoCapture(rutaEntrada)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+    ancho, alto = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    totalFrames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    out = cv2.VideoWriter(rutaSalida, cv2.VideoWriter_fourcc(*'mp4v'), fps, (ancho, alto))
+
+    # La cola limita los frames leídos por adelantado y, con ellos, la memoria usada
+    maxPendientes = numHilos * FRAMES_POR_HILO + cadaN
+    cola = queue.Queue(maxsize=maxPendientes)
+    detener = threading.Event()
+    lector = threading.Thread(target=_leerFrames, args=(cap, cola, detener), daemon=True)
+    inicio = time.perf_counter()
+    lector.start()
+
+    # Frames leídos que aún no se escriben: (índice, frame, futuro de la detección si es frame clave)
+    pendientes = deque()
+    escritos = 0
+
+    def siguienteClave():
+        # Posición en pendientes del siguiente frame clave después del primero, o None si aún no se leyó
+        return next((i for i in range(1, len(pendientes)) if pendientes[i][2] is not None), None)
+
+    def segmentoListo():
+        # El primer segmento se puede escribir sin esperar si ya terminaron las detecciones de sus dos extremos
+        fin = siguienteClave()
+        return fin is not None and pendientes[0][2].done() and pendientes[fin][2].done()
+
+    def escribirSegmento():
+        # Escribe el frame clave y sus intermedios. Al final del video, el último segmento usa solo sus propias cajas
+        nonlocal escritos
+        fin = siguienteClave()
+        cajasInicio = pendientes[0][2].result()
+        cajasFin = pendientes[fin][2].result() if fin is not None else cajasInicio
+        for _ in range(fin if fin is not None else len(pendientes)):
+            indice, frame, futuro = pendientes.popleft()
+            if futuro is not None:
+                cajas = cajasInicio
+            else:
+                t = (indice % cadaN) / cadaN
+                cajas = ampliarCajas(interpolarCajas(cajasInicio, cajasFin, t), MARGEN_SEGUIMIENTO, ancho, alto)
+            out.write(difuminarRostros(frame, cajas, kernel))
+            escritos += 1
+        if progreso:
+            progreso(escritos, totalFrames)
+
+    try:
+        with ThreadPoolExecutor(max_workers=numHilos) as detectores:
+            while (elemento := cola.get()) is not None:
+                indice, frame = elemento
+                # Los frames clave se envían al pool de detección
+                futuro = detectores.submit(_detectar, frame, rutaCascade, anchoDeteccion) if indice % cadaN == 0 else None
+                pendientes.append((indice, frame, futuro))
+                # Escribe los segmentos listos y, si hay demasiados frames en espera, el más antiguo aunque haya que esperar
+                while segmentoListo() or (len(pendientes) > maxPendientes and siguienteClave() is not None):
+                    escribirSegmento()
+            while pendientes:
+                escribirSegmento()
+    finally:
+        detener.set()
+        # Vacía la cola para que el lector no quede bloqueado si se detuvo por un error
+        while lector.is_alive():
+            try:
+                cola.get_nowait()
+            except queue.Empty:
+                lector.join(0.1)
+        out.release()
+        cap.release()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "frames": escritos,
+        "segundos": segundos,
+        "fps": escritos / segundos if segundos > 0 else 0.0,
+        "tiempoReal": (escritos / fps) / segundos if segundos > 0 else 0.0,
+    }
+
+# Clasificador de cada proceso del pool de lotes. Se carga una sola vez, en el inicializador del proceso
+_clasificadorProceso = None
+
+def _iniciarProceso(rutaCascade):
+    global _clasificadorProceso
+    _clasificadorProceso = cargarClasificador(rutaCascade)
+    # Cada proceso procesa una imagen a la vez: el paralelismo lo da el pool, no los hilos internos de OpenCV
+    cv2.setNumThreads(1)
+
+def anonimizarImagenBytes(nombre, datos, anchoDeteccion=None, kernel=(29, 29)):
+    """
+    Decodifica una imagen, difumina sus rostros y la vuelve a codificar en el mismo formato.
+    Se ejecuta en los procesos del pool con el clasificador cargado por _iniciarProceso.
+
+    Returns:
+        tuple: (nombre, bytes de la imagen procesada o None si no se pudo leer, número de rostros).
+    """
+    img = cv2.imdecode(np.frombuffer(datos, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return nombre, None, 0
+    cajas = detectarRostros(_clasificadorProceso, img, anchoDeteccion)
+    difuminarRostros(img, cajas, kernel)
+    ok, buffer = cv2.imencode(os.path.splitext(nombre)[1].lower(), img)
+    return nombre, buffer.tobytes() if ok else None, len(cajas)
+
+def leerImagenesZip(archivoZip):
+    """
+    Recorre las imágenes de un zip (ruta o archivo abierto) y devuelve (nombre, bytes) de cada una.
+    """
+    with zipfile.ZipFile(archivoZip) as zipEntrada:
+        for info in zipEntrada.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(EXTENSIONES_IMAGEN):
+                yield info.filename, zipEntrada.read(info)
+
+def resolverCarpeta(subcarpeta, raiz=CARPETA_LOTES):
+    """
+    Convierte la subcarpeta indicada por el usuario en una ruta dentro de la carpeta raíz de los lotes.
+
+    Returns:
+        La ruta real de la carpeta, o None si no existe o queda fuera de la raíz
+        (rutas absolutas, '..' o enlaces simbólicos que salen de ella).
+    """
+    raiz = os.path.realpath(raiz)
+    ruta = os.path.realpath(os.path.join(raiz, subcarpeta))
+    if os.path.commonpath([raiz, ruta]) != raiz or not os.path.isdir(ruta):
+        return None
+    return ruta
+
+def leerImagenesCarpeta(carpeta):
+    """
+    Recorre las imágenes de una carpeta (incluidas las subcarpetas) y devuelve (nombre relativo, bytes) de cada una.
+    """
+    for raiz, _, archivos in os.walk(carpeta):
+        for archivo in sorted(archivos):
+            if archivo.lower().endswith(EXTENSIONES_IMAGEN):
+                ruta = os.path.join(raiz, archivo)
+                with open(ruta, "rb") as f:
+                    yield os.path.relpath(ruta, carpeta), f.read()
+
+def anonimizarLote(imagenes, destinoZip, rutaCascade=RUTA_CASCADE, numProcesos=None, anchoDeteccion=None, progreso=None):
+    """
+    Anonimiza un lote de imágenes en un pool de procesos y escribe los resultados en un zip.
+
+    Las imágenes se leen y se envían al pool de a poco (como máximo IMAGENES_POR_PROCESO por proceso),
+    y cada resultado se agrega al zip apenas termina, así que el lote nunca está completo en memoria.
+
+    Args:
+        imagenes: Iterable de (nombre, bytes), por ejemplo leerImagenesZip o leerImagenesCarpeta.
+        destinoZip: Ruta o archivo abierto donde se escribe el zip de salida.
+        rutaCascade: Ruta del clasificador Haar Cascade.
+        numProcesos: Número de procesos. Por defecto, el número de núcleos.
+        anchoDeteccion: Ancho de la imagen usada para detectar. None usa la resolución original.
+        progreso: Función opcional progreso(imagenesProcesadas).
+
+    Returns:
+        dict: Imágenes procesadas, rostros difuminados, nombres de las imágenes que no se pudieron leer,
+        segundos de proceso e imágenes por segundo.
+    """
+    cargarClasificador(rutaCascade)  # Valida el cascade antes de iniciar los procesos
+    numProcesos = numProcesos or os.cpu_count()
+    maxPendientes = numProcesos * IMAGENES_POR_PROCESO
+    pendientes = deque()
+    procesadas, rostros, errores = 0, 0, []
+    inicio = time.perf_counter()
+
+    # Las imágenes ya están comprimidas (JPEG/PNG), así que el zip se guarda sin volver a comprimir
+    with zipfile.ZipFile(destinoZip, "w", zipfile.ZIP_STORED) as zipSalida, \
+         ProcessPoolExecutor(max_workers=numProcesos, initializer=_iniciarProceso, initargs=(rutaCascade,)) as pool:
+
+        def guardarResultado(futuro):
+            nonlocal procesadas, rostros
+            nombre, datos, numRostros = futuro.result()
+            if datos is None:
+                errores.append(nombre)
+            else:
+                zipSalida.writestr(nombre, datos)
+                rostros += numRostros
+            procesadas += 1
+            if progreso:
+                progreso(procesadas)
+
+        for nombre, datos in imagenes:
+            pendientes.append(pool.submit(anonimizarImagenBytes, nombre, datos, anchoDeteccion))
+            # Escribe los resultados en orden; si hay demasiadas imágenes en espera, espera la más antigua
+            while pendientes and (pendientes[0].done() or len(pendientes) >= maxPendientes):
+                guardarResultado(pendientes.popleft())
+        while pendientes:
+            guardarResultado(pendientes.popleft())
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "imagenes": procesadas - len(errores),
+        "rostros": rostros,
+        "errores": errores,
+        "segundos": segundos,
+        "imagenesPorSegundo": procesadas / segundos if segundos > 0 else 0.0,
+    }
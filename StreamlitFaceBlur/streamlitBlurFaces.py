@@ -15,7 +15,9 @@ import streamlit as st
 import cv2
 import numpy as np
 import os
+import tempfile
 import ffmpeg
+import anonimizador as ax  # Pipeline de anonimización: lectura, detección en paralelo y escritura en orden
 
 # Configuración inicial de la página de Streamlit
 st.set_page_config(layout="wide", page_title="Difuminar Rostros en Imágenes y Videos", page_icon=":mask:")
@@ -41,10 +43,12 @@ def anonimizar_imagen(image_path, cascade_path):
     # Los clasificadores Haar funcionan mejor en monocromo (intensidad de luz)
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    # Cargar el clasificador pre-entrenado para detección de rostros frontales
-    face_cascade = cv2.CascadeClassifier(cascade_path)
-    if face_cascade.empty():
-        print(f"Error: No se pudo cargar el cascade en {cascade_path}")
+    # Clasificador pre-entrenado para detección de rostros frontales. Se carga una vez por hilo: cada sesión
+    # de Streamlit corre en su propio hilo y detectMultiScale no debe llamarse en paralelo sobre el mismo objeto
+    try:
+        face_cascade = ax.clasificadorHilo(cascade_path)
+    except ValueError as e:
+        print(f"Error: {e}")
         return
 
     # Detección: Busca rostros en la imagen en escala de grises
@@ -64,75 +68,86 @@ def anonimizar_imagen(image_path, cascade_path):
         # Reemplazar la región original de la cara con la versión difuminada
         img[y:y+h, x:x+w] = blurred_face
 
-    # Limpieza de ventanas de OpenCV (buena práctica aunque Streamlit maneja la visualización)
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
     return img
 
-def anonimizar_video(cascade_path, video_source):
+def anonimizar_video(cascade_path, video_source, num_hilos=None, cada_n=1, ancho_deteccion=ax.ANCHO_DETECCION, progreso=None):
     """
-    Procesa un archivo de video frame por frame para detectar y difuminar rostros.
+    Procesa un archivo de video para detectar y difuminar rostros.
+    Un hilo lee los frames, varios hilos detectan los rostros en paralelo y los frames se escriben en orden.
 
     Args:
         cascade_path (str): Ruta del clasificador Haar Cascade.
         video_source (str): Ruta del archivo de video de entrada.
+        num_hilos (int): Número de hilos de detección. Por defecto, el número de núcleos.
+        cada_n (int): Detectar rostros cada N frames. En los frames intermedios se interpolan las cajas.
+        ancho_deteccion (int): Ancho de la imagen reducida usada para detectar. None usa la resolución original.
+        progreso (callable): Función opcional progreso(framesProcesados, totalFrames).
 
     Returns:
-        str: El nombre del archivo de video procesado (guardado temporalmente).
+        tuple: El nombre del archivo de video procesado (guardado temporalmente) y las estadísticas del proceso.
     """
-    face_cascade = cv2.CascadeClassifier(cascade_path)
-    if face_cascade.empty():
-        print(f"Error: No se pudo cargar el cascade en {cascade_path}")
-        return
-
-    # Inicializar captura de video
-    cap = cv2.VideoCapture(video_source)
-    
-    # Definir el códec y crear el objeto VideoWriter
-    # 'mp4v' es un códec común, pero a veces requiere conversión posterior para web
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    filename = video_source.split("temp\\")[-1]    
+    filename = os.path.basename(video_source)
     videoFilenamePath = f"blurred_{filename}"
     
     # Construir ruta de salida segura
     videoPath = os.path.join(os.path.dirname(__file__), "temp", videoFilenamePath)
-    
-    # Configurar el escritor de video: ruta, códec, FPS, y tamaño (ancho, alto)
-    out = cv2.VideoWriter(videoPath, fourcc, 20.0, (int(cap.get(3)), int(cap.get(4))))
-
-    # Bucle principal: Leer frame -> Procesar -> Guardar
-    while True:
-        ret, frame = cap.read() # Leer un frame
-        if not ret:
-            break # Fin del video
-
-        # Convertir frame actual a escala de grises para detección
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, # Imagen en escala de grises
-                                              scaleFactor=1.1, # Escala de reducción
-                                              minNeighbors=4, # Vecinos para retener
-                                              minSize=(30, 30) # Tamaño mínimo del rostro
-                                              )
-
-        for (x, y, w, h) in faces:
-            # Difuminar la región de la cara
-            frame[y:y+h, x:x+w] = cv2.GaussianBlur(frame[y:y+h, x:x+w], (25, 25), 0)
-            # Dibujar un rectángulo negro alrededor de la cara difuminada
-            # cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 0), 2)
-        
-        # Escribir el frame modificado en el archivo de salida
-        out.write(frame)
-        
-        # Permitir salir del bucle si se presiona 'q' (útil en ejecución local)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-            
-    # Liberar recursos del sistema
-    out.release()
-    cap.release()
-    cv2.destroyAllWindows()
-    
-    return videoFilenamePath
+
+    # Leer frame -> Detectar (en paralelo) -> Difuminar y guardar en orden
+    estadisticas = ax.anonimizarVideo(video_source, videoPath, cascade_path, numHilos=num_hilos, cadaN=cada_n,
+                                      anchoDeteccion=ancho_deteccion, progreso=progreso)
+    return videoFilenamePath, estadisticas
+
+def anonimizar_lote_ui(ancho_deteccion):
+    """
+    Interfaz del modo por lotes: recibe un zip o una carpeta con imágenes (dentro de ax.CARPETA_LOTES), las anonimiza
+    en un pool de procesos y ofrece el zip con los resultados.
+
+    Args:
+        ancho_deteccion (int): Ancho de la imagen reducida usada para detectar. None usa la resolución original.
+    """
+    origen = st.radio("Origen", ["Archivo zip", "Carpeta"], horizontal=True)
+    if origen == "Archivo zip":
+        archivo_zip = st.file_uploader("Elige un zip con imágenes...", type=["zip"])
+        carpeta = None
+    else:
+        # Solo se pueden leer carpetas dentro de la carpeta raíz configurada en el servidor
+        carpeta = st.text_input("Subcarpeta con imágenes", value=".", help=f"Ruta relativa a la carpeta de lotes del servidor: {ax.CARPETA_LOTES}")
+        archivo_zip = None
+    num_procesos = st.number_input("Procesos", min_value=1, max_value=64, value=os.cpu_count() or 1)
+
+    if st.button("Anonimizar lote", disabled=archivo_zip is None and not carpeta):
+        if carpeta:
+            ruta_carpeta = ax.resolverCarpeta(carpeta)
+            if ruta_carpeta is None:
+                st.error(f"La carpeta {carpeta} no existe o está fuera de la carpeta de lotes del servidor")
+                return
+        imagenes = ax.leerImagenesZip(archivo_zip) if archivo_zip is not None else ax.leerImagenesCarpeta(ruta_carpeta)
+        # Cada ejecución escribe en su propio archivo temporal, para que dos sesiones no mezclen sus resultados
+        descriptor, zip_path = tempfile.mkstemp(suffix=".zip")
+        os.close(descriptor)
+        try:
+            with st.spinner("Anonimizando imágenes..."):
+                contador = st.empty()
+                estadisticas = ax.anonimizarLote(imagenes, zip_path, numProcesos=num_procesos, anchoDeteccion=ancho_deteccion,
+                                                 progreso=lambda procesadas: contador.caption(f"{procesadas} imágenes procesadas"))
+                contador.empty()
+            with open(zip_path, "rb") as file:
+                datos_zip = file.read()
+        finally:
+            os.remove(zip_path)
+        # Velocidad del proceso, para dimensionar los trabajos de anonimización
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Imágenes", estadisticas["imagenes"])
+        c2.metric("Rostros difuminados", estadisticas["rostros"])
+        c3.metric("Imágenes por segundo", f"{estadisticas['imagenesPorSegundo']:.1f}")
+        if estadisticas["errores"]:
+            st.warning(f"No se pudieron leer: {', '.join(estadisticas['errores'])}")
+        st.download_button(
+            label="Descargar Imágenes Procesadas",
+            data=datos_zip,
+            file_name="imagenes_anonimizadas.zip",
+            mime="application/zip"
+        )
 
 def main():
     """
@@ -141,6 +156,20 @@ def main():
     """
     st.title("Anonimizador de Imágenes y Videos")
 
+    # Opciones de rendimiento para el proceso de videos
+    with st.sidebar:
+        st.subheader("Opciones de rendimiento")
+        num_hilos = st.number_input("Hilos de detección", min_value=1, max_value=64, value=os.cpu_count() or 1)
+        cada_n = st.number_input("Detectar cada N frames", min_value=1, max_value=30, value=1,
+                                 help="En los frames intermedios las cajas se interpolan entre las detecciones")
+        ancho_deteccion = st.select_slider("Ancho de detección (px)", options=[320, 480, 640, 960, 1280, "Original"], value=ax.ANCHO_DETECCION)
+
+    # Modo de trabajo: un archivo (imagen o video) o un lote de imágenes
+    modo = st.radio("Modo", ["Imagen o video", "Lote de imágenes"], horizontal=True)
+    if modo == "Lote de imágenes":
+        anonimizar_lote_ui(None if ancho_deteccion == "Original" else ancho_deteccion)
+        return
+
     # Widget de carga de archivos (soporta imágenes y videos)
     uploaded_file = st.file_uploader("Elige una imagen o video...", type=["jpg", "jpeg", "png","mp4", "avi", "mov"])
     
@@ -193,7 +222,14 @@ def main():
             with c2:
                 st.subheader("Video con Rostros Difuminados")
                 # Procesar video
-                videoPath = anonimizar_video(os.path.join(os.path.dirname(__file__), "modelo/haarcascade_frontalface_default.xml"), save_path)                                            
+                barra = st.progress(0.0, "Procesando video...")
+                videoPath, estadisticas = anonimizar_video(os.path.join(os.path.dirname(__file__), "modelo/haarcascade_frontalface_default.xml"), save_path,
+                                                           num_hilos=num_hilos, cada_n=cada_n,
+                                                           ancho_deteccion=None if ancho_deteccion == "Original" else ancho_deteccion,
+                                                           progreso=lambda actual, total: barra.progress(min(actual / max(total, 1), 1.0), f"Procesando video... {actual}/{total} frames"))
+                barra.empty()
+                st.caption(f"{estadisticas['frames']} frames en {estadisticas['segundos']:.1f} s: "
+                           f"{estadisticas['fps']:.1f} frames/s ({estadisticas['tiempoReal']:.1f}x tiempo real)")
                 
                 # Transcodificación con FFmpeg
                 # OpenCV genera archivos que a veces los navegadores no reproducen bien.
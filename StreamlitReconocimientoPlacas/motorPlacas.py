@@ -0,0 +1,490 @@
+# Motor de reconocimiento de placas de vehículos.
+# El lector de EasyOCR y la sesión de rembg se crean una sola vez y se reutilizan en todas las imágenes.
+# De cada imagen se buscan los contornos de 4 lados candidatos a placa y todos se leen en una sola
+# llamada al reconocedor de EasyOCR (sin volver a ejecutar el detector de texto en cada recorte).
+# En el modo por lotes (carpeta o video), la búsqueda de candidatos se hace en un pool de procesos y un
+# único hilo de OCR lee los recortes en micro-lotes; los resultados se escriben a CSV o Parquet a medida que salen.
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+import imutils  # Utilidades para OpenCV. Instalación: pip install imutils
+import easyocr  # Reconocimiento óptico de caracteres (OCR). Instalación: pip install easyocr. https://github.com/JaidedAI/EasyOCR
+import rembg  # Eliminación del fondo de imágenes. Instalación: pip install rembg. https://github.com/danielgatis/rembg
+import pyarrow as pa
+import pyarrow.csv as pacsv  # Para escribir CSV por lotes
+import pyarrow.parquet as pq  # Para escribir Parquet por lotes
+
+# Idiomas del lector de EasyOCR
+IDIOMAS_OCR = ["es"]
+# Modelo de rembg para eliminar el fondo
+MODELO_FONDO = "u2net"
+# Lado máximo (px) de la imagen con la que se calcula la máscara del fondo. El modelo trabaja a 320 px,
+# así que no se pierde calidad y se evita convertir la imagen completa; la máscara se amplía a la original
+LADO_MAXIMO_FONDO = 1024
+# Lado máximo (px) de la imagen en el detector de texto de EasyOCR (canvas_size; por defecto 2560)
+LADO_MAXIMO_OCR = 1280
+# Número de contornos más grandes que se revisan como candidatos a placa
+NUM_CONTORNOS = 10
+# Lado mínimo (px) del rectángulo de un candidato a placa
+LADO_MINIMO_CANDIDATO = 8
+# Longitud mínima del texto para considerarlo una placa
+LONGITUD_MINIMA_PLACA = 6
+# Longitud mínima de los textos que se muestran en la tabla de textos detectados
+LONGITUD_MINIMA_TEXTO = 5
+
+# Extensiones de las imágenes que se procesan en los lotes
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png")
+# Número de imágenes enviadas por adelantado a cada proceso del lote
+IMAGENES_POR_PROCESO = 4
+# Carpeta raíz de la que el modo por lotes puede leer imágenes del servidor. Se configura con la variable de
+# entorno PLACAS_CARPETA_LOTES; por defecto es la carpeta de la aplicación
+CARPETA_LOTES = os.environ.get("PLACAS_CARPETA_LOTES", os.path.dirname(os.path.abspath(__file__)))
+# Número máximo de recortes que el hilo de OCR lee en cada micro-lote
+TAMANO_LOTE_OCR = 64
+# Segundos que el hilo de OCR espera más recortes antes de leer un micro-lote incompleto
+ESPERA_LOTE_OCR = 0.05
+# Formatos de salida del lote
+FORMATOS_SALIDA = ("CSV", "Parquet")
+# Columnas de la salida del lote
+ESQUEMA_RESULTADOS = pa.schema([
+    ("origen", pa.string()), ("placa", pa.string()), ("confianza", pa.float64()), ("candidatos", pa.int32()),
+    ("x", pa.int32()), ("y", pa.int32()), ("ancho", pa.int32()), ("alto", pa.int32()),
+])
+
+# Sesión de rembg de cada proceso del pool (se crea una sola vez en _iniciarProceso)
+_sesionProceso = None
+
+def crearLector(idiomas=IDIOMAS_OCR, gpu=False):
+    """
+    Crea el lector de EasyOCR. Carga los modelos del detector y del reconocedor (y los descarga la primera vez),
+    así que debe crearse una sola vez por proceso.
+    """
+    return easyocr.Reader(idiomas, gpu=gpu)
+
+def crearSesionFondo(modelo=MODELO_FONDO):
+    """
+    Crea la sesión de rembg con el modelo cargado, para no volver a cargarlo en cada imagen.
+    """
+    return rembg.new_session(modelo)
+
+def quitarFondo(img, sesion, ladoMaximo=LADO_MAXIMO_FONDO):
+    """
+    Elimina el fondo de la imagen con rembg.
+
+    La máscara se calcula sobre una copia reducida de la imagen y se amplía al tamaño original.
+    El resultado es el mismo que rembg.remove: los píxeles del fondo quedan en negro y la máscara
+    se agrega como canal alfa.
+
+    Args:
+        img: Imagen BGR.
+        sesion: Sesión de rembg creada con crearSesionFondo.
+        ladoMaximo: Lado máximo de la imagen usada para calcular la máscara.
+
+    Returns:
+        La imagen BGRA sin fondo.
+    """
+    alto, ancho = img.shape[:2]
+    escala = min(1.0, ladoMaximo / max(alto, ancho))
+    reducida = cv2.resize(img, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA) if escala < 1 else img
+    mascara = np.asarray(rembg.remove(reducida, session=sesion, only_mask=True))
+    if escala < 1:
+        mascara = cv2.resize(mascara, (ancho, alto), interpolation=cv2.INTER_LINEAR)
+    # Mezcla la imagen con el fondo negro según la máscara (igual que la composición de rembg)
+    sinFondo = cv2.multiply(img, cv2.merge([mascara] * 3), scale=1 / 255)
+    return cv2.merge([*cv2.split(sinFondo), mascara])
+
+def candidatosPlaca(gray, numContornos=NUM_CONTORNOS):
+    """
+    Busca los contornos de 4 lados que pueden ser una placa.
+
+    Args:
+        gray: Imagen en escala de grises.
+        numContornos: Número de contornos más grandes que se revisan.
+
+    Returns:
+        Una tupla que contiene:
+            - La imagen con el filtro bilateral.
+            - La imagen de bordes.
+            - La lista de contornos de 4 lados, de mayor a menor área.
+    """
+    # Aplica un filtro bilateral para reducir el ruido
+    bfilter = cv2.bilateralFilter(gray, 11, 17, 17)
+    # Detecta los bordes de la imagen
+    edged = cv2.Canny(bfilter, 30, 200)
+    # Encuentra los contornos y toma los más grandes
+    contours = imutils.grab_contours(cv2.findContours(edged.copy(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE))
+    contours = sorted(contours, key=cv2.contourArea, reverse=True)[:numContornos]
+    # Aproxima cada contorno a un polígono; si tiene 4 lados es candidato a placa
+    candidatos = [approx for approx in (cv2.approxPolyDP(contour, 10, True) for contour in contours) if len(approx) == 4]
+    # Descarta los candidatos demasiado pequeños para leer texto (un recorte vacío detiene el reconocedor de EasyOCR)
+    candidatos = [approx for approx in candidatos if min(cv2.boundingRect(approx)[2:]) >= LADO_MINIMO_CANDIDATO]
+    return bfilter, edged, candidatos
+
+def cajaCandidato(location):
+    """
+    Rectángulo que contiene el contorno, en el formato de EasyOCR [x_min, x_max, y_min, y_max]. EasyOCR recorta
+    la caja como img[y_min:y_max, x_min:x_max], así que x_max e y_max no se incluyen.
+    """
+    x, y, ancho, alto = cv2.boundingRect(location)
+    return [x, x + ancho, y, y + alto]
+
+def leerCandidatos(lector, gray, candidatos):
+    """
+    Lee el texto de todos los candidatos en una sola llamada al reconocedor de EasyOCR.
+
+    lector.recognize recibe las cajas de los candidatos sobre la imagen completa y solo ejecuta el
+    reconocedor de texto en cada recorte, sin el detector de texto (CRAFT), que es la parte más costosa.
+
+    Returns:
+        Una lista con una tupla (texto, confianza) por candidato. Si no se lee nada, el texto es vacío.
+    """
+    if not candidatos:
+        return []
+    cajas = [cajaCandidato(location) for location in candidatos]
+    resultados = lector.recognize(gray, horizontal_list=cajas, free_list=[], batch_size=len(cajas))
+    # Con GPU EasyOCR ordena los resultados por posición, así que se asocian por las coordenadas de la caja
+    lecturas = {}
+    for caja, texto, confianza in resultados:
+        lecturas[(int(caja[0][0]), int(caja[2][0]), int(caja[0][1]), int(caja[2][1]))] = (texto.strip(), float(confianza))
+    return [lecturas.get(tuple(caja), ("", 0.0)) for caja in cajas]
+
+def elegirPlaca(lecturas, longitudMinima=LONGITUD_MINIMA_PLACA):
+    """
+    Elige el candidato con la placa: el primero (de mayor área) con un texto de al menos longitudMinima
+    caracteres, o si no hay ninguno, el primero con algún texto.
+
+    Returns:
+        El índice del candidato elegido, o None si no se leyó ningún texto.
+    """
+    for i, (texto, _) in enumerate(lecturas):
+        if len(texto) >= longitudMinima:
+            return i
+    return next((i for i, (texto, _) in enumerate(lecturas) if texto), None)
+
+def resaltarPlaca(img, location):
+    """
+    Imagen RGB en la que solo se ve el interior del contorno de la placa.
+    """
+    mask = np.zeros(img.shape[:2], np.uint8)
+    cv2.drawContours(mask, [location], 0, 255, -1)
+    return cv2.cvtColor(cv2.bitwise_and(img, img, mask=mask), cv2.COLOR_BGR2RGB)
+
+def recortarPlaca(gray, location):
+    """
+    Recorta la zona de la placa de la imagen en escala de grises.
+    """
+    x1, x2, y1, y2 = cajaCandidato(location)
+    return gray[y1:y2, x1:x2]
+
+def reconocerPlaca(img, lector, sesion, leerTextos=True):
+    """
+    Reconoce la placa de la imagen de un vehículo.
+
+    Args:
+        img: Imagen BGR.
+        lector: Lector de EasyOCR creado con crearLector.
+        sesion: Sesión de rembg creada con crearSesionFondo.
+        leerTextos: Si es True, también se leen todos los textos de la imagen con el detector de EasyOCR.
+
+    Returns:
+        dict: Resultado con las claves:
+            - placa: Texto de la placa, o None si no se encontró.
+            - confianza: Confianza del OCR en la placa.
+            - location: Contorno de la placa elegida (o None).
+            - sinFondo, gray, bfilter, edged: Imágenes intermedias del proceso.
+            - textos: Textos detectados en toda la imagen con al menos LONGITUD_MINIMA_TEXTO caracteres.
+            - candidatos: Número de contornos candidatos revisados.
+            - segundos: Tiempo de procesamiento.
+    """
+    inicio = time.perf_counter()
+    sinFondo = quitarFondo(img, sesion)
+    # Convierte la imagen a escala de grises
+    gray = cv2.cvtColor(sinFondo, cv2.COLOR_BGRA2GRAY)
+    bfilter, edged, candidatos = candidatosPlaca(gray)
+    lecturas = leerCandidatos(lector, gray, candidatos)
+    elegido = elegirPlaca(lecturas)
+    textos = []
+    if leerTextos:
+        textos = [texto for _, texto, _ in lector.readtext(gray, canvas_size=LADO_MAXIMO_OCR) if len(texto) >= LONGITUD_MINIMA_TEXTO]
+    return {
+        "placa": lecturas[elegido][0] if elegido is not None else None,
+        "confianza": lecturas[elegido][1] if elegido is not None else 0.0,
+        "location": candidatos[elegido] if elegido is not None else None,
+        "sinFondo": sinFondo, "gray": gray, "bfilter": bfilter, "edged": edged,
+        "textos": textos,
+        "candidatos": len(candidatos),
+        "segundos": time.perf_counter() - inicio,
+    }
+
+def leerRecortes(lector, recortes):
+    """
+    Lee el texto de varios recortes (de una o varias imágenes) en una sola llamada al reconocedor.
+
+    Los recortes se apilan en un lienzo en escala de grises y se pasan a lector.recognize como cajas,
+    así el reconocedor procesa todos los recortes en un solo lote.
+
+    Returns:
+        Una lista con una tupla (texto, confianza) por recorte.
+    """
+    if not recortes:
+        return []
+    lienzo = np.zeros((sum(r.shape[0] for r in recortes), max(r.shape[1] for r in recortes)), np.uint8)
+    cajas, y = [], 0
+    for recorte in recortes:
+        alto, ancho = recorte.shape
+        lienzo[y:y + alto, :ancho] = recorte
+        cajas.append([0, ancho, y, y + alto])
+        y += alto
+    resultados = lector.recognize(lienzo, horizontal_list=cajas, free_list=[], batch_size=len(cajas))
+    lecturas = {}
+    for caja, texto, confianza in resultados:
+        lecturas[(int(caja[0][0]), int(caja[2][0]), int(caja[0][1]), int(caja[2][1]))] = (texto.strip(), float(confianza))
+    return [lecturas.get(tuple(caja), ("", 0.0)) for caja in cajas]
+
+def resolverCarpeta(subcarpeta, raiz=CARPETA_LOTES):
+    """
+    Convierte la subcarpeta indicada por el usuario en una ruta dentro de la carpeta raíz de los lotes.
+
+    Returns:
+        La ruta real de la carpeta, o None si no existe o queda fuera de la raíz
+        (rutas absolutas, '..' o enlaces simbólicos que salen de ella).
+    """
+    raiz = os.path.realpath(raiz)
+    ruta = os.path.realpath(os.path.join(raiz, subcarpeta))
+    if os.path.commonpath([raiz, ruta]) != raiz or not os.path.isdir(ruta):
+        return None
+    return ruta
+
+def leerImagenesCarpeta(carpeta):
+    """
+    Genera (nombre, ruta) de cada imagen de la carpeta, ordenadas por nombre.
+    Solo se envía la ruta al proceso, que lee la imagen del disco.
+    """
+    for nombre in sorted(os.listdir(carpeta)):
+        if nombre.lower().endswith(EXTENSIONES_IMAGEN):
+            yield nombre, os.path.join(carpeta, nombre)
+
+def leerFramesVideo(rutaVideo, cadaN=1):
+    """
+    Genera (nombre, frame) de uno de cada N frames del video. Los frames que no se analizan
+    solo se avanzan con grab(), sin decodificarlos.
+    """
+    cap = cv2.VideoCapture(rutaVideo)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    numero = 0
+    try:
+        while cap.grab():
+            if numero % cadaN == 0:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                yield f"frame_{numero:07d}_{numero / fps:.2f}s", frame
+            numero += 1
+    finally:
+        cap.release()
+
+def contarFramesVideo(rutaVideo, cadaN=1):
+    """
+    Número de frames del video que se analizan con leerFramesVideo.
+    """
+    cap = cv2.VideoCapture(rutaVideo)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return -(-total // cadaN)
+
+def _iniciarProceso(usarFondo):
+    """
+    Inicializa cada proceso del pool: OpenCV usa un solo hilo (el paralelismo lo dan los procesos)
+    y, si se elimina el fondo, la sesión de rembg se carga una sola vez por proceso.
+    """
+    global _sesionProceso
+    cv2.setNumThreads(1)
+    if usarFondo:
+        _sesionProceso = crearSesionFondo()
+
+def _candidatosImagen(nombre, imagen):
+    """
+    Etapa de candidatos de una imagen del lote (se ejecuta en los procesos del pool).
+
+    Args:
+        nombre: Nombre de la imagen o del frame.
+        imagen: Ruta de la imagen o frame BGR.
+
+    Returns:
+        Una tupla (nombre, cajas, recortes) con la caja [x_min, x_max, y_min, y_max] y el recorte en
+        escala de grises de cada candidato. Si la imagen no se puede leer, cajas es None.
+    """
+    img = cv2.imread(imagen) if isinstance(imagen, str) else imagen
+    if img is None:
+        return nombre, None, []
+    if _sesionProceso is not None:
+        gray = cv2.cvtColor(quitarFondo(img, _sesionProceso), cv2.COLOR_BGRA2GRAY)
+    else:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    _, _, candidatos = candidatosPlaca(gray)
+    # Solo se devuelven los recortes, no la imagen completa, para que pasar el resultado entre procesos sea barato
+    return nombre, [cajaCandidato(location) for location in candidatos], [recortarPlaca(gray, location) for location in candidatos]
+
+class EscritorResultados:
+    """
+    Escribe las filas de resultados en un archivo CSV o Parquet a medida que se producen.
+    Cada micro-lote se escribe como un lote de Arrow (un row group en Parquet), así que el archivo
+    crece durante el proceso y se puede leer aunque el lote se interrumpa (en CSV).
+    """
+    def __init__(self, ruta, formato="CSV"):
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        if formato == "Parquet":
+            self.escritor = pq.ParquetWriter(ruta, ESQUEMA_RESULTADOS)
+        else:
+            self.escritor = pacsv.CSVWriter(ruta, ESQUEMA_RESULTADOS)
+
+    def escribir(self, filas):
+        if filas:
+            self.escritor.write_table(pa.Table.from_pylist(filas, schema=ESQUEMA_RESULTADOS))
+
+    def cerrar(self):
+        self.escritor.close()
+
+def _hiloOCR(lector, entrada, escritor, tamanoLote, estadisticas):
+    """
+    Hilo único de OCR del lote. Toma de la cola los candidatos de varias imágenes hasta juntar tamanoLote
+    recortes (o hasta que no lleguen más en ESPERA_LOTE_OCR segundos), los lee en un solo micro-lote,
+    elige la placa de cada imagen y escribe sus filas. Un None en la cola indica el fin del lote.
+    Si el OCR falla, el error se guarda en las estadísticas y el hilo termina.
+    """
+    try:
+        _leerMicroLotes(lector, entrada, escritor, tamanoLote, estadisticas)
+    except Exception as error:
+        estadisticas["errorOCR"] = error
+
+def _leerMicroLotes(lector, entrada, escritor, tamanoLote, estadisticas):
+    """
+    Ciclo del hilo de OCR (ver _hiloOCR).
+    """
+    terminar = False
+    while not terminar:
+        lote = [entrada.get()]
+        if lote[0] is None:
+            break
+        numRecortes = len(lote[0][2])
+        while numRecortes < tamanoLote:
+            try:
+                elemento = entrada.get(timeout=ESPERA_LOTE_OCR)
+            except queue.Empty:
+                break
+            if elemento is None:
+                terminar = True
+                break
+            lote.append(elemento)
+            numRecortes += len(elemento[2])
+
+        inicio = time.perf_counter()
+        lecturas = leerRecortes(lector, [recorte for _, _, recortes in lote for recorte in recortes])
+        estadisticas["segundosOCR"] += time.perf_counter() - inicio
+        estadisticas["lotesOCR"] += 1
+        filas = []
+        for nombre, cajas, recortes in lote:
+            lecturasImagen, lecturas = lecturas[:len(recortes)], lecturas[len(recortes):]
+            elegido = elegirPlaca(lecturasImagen)
+            fila = {"origen": nombre, "placa": None, "confianza": None, "candidatos": len(cajas),
+                    "x": None, "y": None, "ancho": None, "alto": None}
+            if elegido is not None:
+                x1, x2, y1, y2 = cajas[elegido]
+                fila.update(placa=lecturasImagen[elegido][0], confianza=lecturasImagen[elegido][1],
+                            x=x1, y=y1, ancho=x2 - x1, alto=y2 - y1)
+                estadisticas["placas"] += 1
+            filas.append(fila)
+        escritor.escribir(filas)
+        estadisticas["imagenes"] += len(lote)
+        estadisticas["candidatos"] += numRecortes
+
+def reconocerLote(imagenes, rutaSalida, lector, formato="CSV", numProcesos=None, tamanoLote=TAMANO_LOTE_OCR,
+                  usarFondo=False, progreso=None):
+    """
+    Reconoce las placas de un lote de imágenes o de los frames de un video.
+
+    La etapa de candidatos (filtro bilateral, Canny, contornos y aproximación de polígonos) se ejecuta en un
+    pool de procesos. Los recortes de los candidatos pasan a un único hilo de OCR, que usa un solo lector
+    (el modelo se carga una vez) y los lee en micro-lotes mientras los procesos siguen buscando candidatos.
+    Las imágenes se envían al pool de a poco (como máximo IMAGENES_POR_PROCESO por proceso), así que el
+    lote nunca está completo en memoria, y los resultados se escriben a medida que se leen.
+
+    Args:
+        imagenes: Iterable de (nombre, ruta o frame BGR), por ejemplo leerImagenesCarpeta o leerFramesVideo.
+        rutaSalida: Ruta del archivo de resultados.
+        lector: Lector de EasyOCR creado con crearLector.
+        formato: 'CSV' o 'Parquet'.
+        numProcesos: Número de procesos. Por defecto, el número de núcleos.
+        tamanoLote: Número máximo de recortes por micro-lote de OCR.
+        usarFondo: Si es True, se elimina el fondo con rembg antes de buscar los candidatos (más lento).
+        progreso: Función opcional progreso(imagenesLeidas), llamada desde el hilo que ejecuta reconocerLote.
+
+    Returns:
+        dict: Imágenes procesadas, placas leídas, candidatos, nombres de las imágenes que no se pudieron leer,
+        micro-lotes de OCR, segundos totales y de OCR, e imágenes por segundo.
+    """
+    numProcesos = numProcesos or os.cpu_count()
+    maxPendientes = numProcesos * IMAGENES_POR_PROCESO
+    estadisticas = {"imagenes": 0, "placas": 0, "candidatos": 0, "errores": [], "lotesOCR": 0, "segundosOCR": 0.0}
+    # La cola está limitada para que los procesos no se adelanten demasiado al OCR
+    colaOCR = queue.Queue(maxsize=4 * tamanoLote)
+    escritor = EscritorResultados(rutaSalida, formato)
+    hilo = threading.Thread(target=_hiloOCR, args=(lector, colaOCR, escritor, tamanoLote, estadisticas), daemon=True)
+    pendientes = deque()
+
+    def ponerEnCola(elemento):
+        # Si el hilo de OCR terminó por un error, nadie vaciaría la cola: se detiene el lote con ese error
+        while hilo.is_alive():
+            try:
+                colaOCR.put(elemento, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+        raise estadisticas.pop("errorOCR", None) or RuntimeError("El hilo de OCR terminó antes de tiempo")
+
+    inicio = time.perf_counter()
+    hilo.start()
+    try:
+        with ProcessPoolExecutor(max_workers=numProcesos, initializer=_iniciarProceso, initargs=(usarFondo,)) as pool:
+
+            def enviarOCR(futuro):
+                nombre, cajas, recortes = futuro.result()
+                if cajas is None:
+                    estadisticas["errores"].append(nombre)
+                else:
+                    ponerEnCola((nombre, cajas, recortes))
+                # El progreso se informa desde este hilo (Streamlit no permite actualizar la página desde otros hilos)
+                if progreso:
+                    progreso(estadisticas["imagenes"])
+
+            for nombre, imagen in imagenes:
+                pendientes.append(pool.submit(_candidatosImagen, nombre, imagen))
+                # Envía los resultados al OCR en orden; si hay demasiadas imágenes en espera, espera la más antigua
+                while pendientes and (pendientes[0].done() or len(pendientes) >= maxPendientes):
+                    enviarOCR(pendientes.popleft())
+            while pendientes:
+                enviarOCR(pendientes.popleft())
+    finally:
+        # Marca el fin del lote para el hilo de OCR (si sigue vivo) y espera a que escriba los últimos resultados
+        while hilo.is_alive():
+            try:
+                colaOCR.put(None, timeout=0.5)
+                break
+            except queue.Full:
+                pass
+        hilo.join()
+        escritor.cerrar()
+    if progreso:
+        progreso(estadisticas["imagenes"])
+
+    if "errorOCR" in estadisticas:
+        raise estadisticas.pop("errorOCR")
+    segundos = time.perf_counter() - inicio
+    estadisticas["segundos"] = segundos
+    estadisticas["imagenesPorSegundo"] = estadisticas["imagenes"] / segundos if segundos > 0 else 0.0
+    return estadisticas
@@ -12,20 +12,6 @@ import cv2
 # Instalación: pip install numpy
 import numpy as np
 
-# EasyOCR: librería para reconocimiento óptico de caracteres (OCR).
-# Instalación: pip install easyocr
-# https://github.com/JaidedAI/EasyOCR
-import easyocr
-
-# imutils: librería con funciones de utilidad para procesamiento de imágenes con OpenCV.
-# Instalación: pip install imutils
-import imutils
-
-# rembg: librería para eliminar el fondo de una imagen.
-# Instalación: pip install rembg
-# https://github.com/danielgatis/rembg
-import rembg
-
 # NumPy: librería para trabajar con matrices y vectores multidimensionales.
 # Instalación: pip install numpy
 import numpy as np
@@ -34,6 +20,16 @@ import numpy as np
 # Instalación: pip install Pillow
 from PIL import Image
 
+# os y tempfile: librerías nativas para manejar rutas y archivos temporales
+import os
+import tempfile
+
+# pandas: librería para mostrar la vista previa de los resultados del lote
+import pandas as pd
+
+# Motor de reconocimiento de placas (OCR por lotes de los candidatos y modelos reutilizables)
+import motorPlacas as mp
+
 # Definimos los parámetros de configuración de la aplicación
 st.set_page_config(
     page_title="Reconocimiento de placas de vehículos", # Título de la página
@@ -43,58 +39,93 @@ st.set_page_config(
 )
 
 
-def obtenerPlaca(location,img,gray):
-    """Obtiene la placa de una imagen de un vehículo
-
-    Args:
-        location (array): coordenadas donde se detecta que puede estar la placa
-        img (imagen): imagen del vehículo
-        gray (imagen): imagen del vehículo en escala de grises
-
-    Returns:
-        placa(str): placa detectada
-        imagenplaca(imagen): imagen de la placa detectada
-        imagenContornos(imagen): imagen de los contornos procesados
-    """    
-    # Crear una imagen en blanco con las mismas dimensiones que la imagen original
-    mask = np.zeros(gray.shape, np.uint8) 
-    # Dibujar los contornos en la imagen de máscara
-    new_image = cv2.drawContours(mask, [location], 0,255, -1) 
-    # Realizar una operación AND bit a bit entre la imagen original y la imagen de máscara
-    new_image = cv2.bitwise_and(img, img, mask=mask) 
-
-    # Convertir la imagen a RGB para mostrarla
-    imagenContornos =cv2.cvtColor(new_image, cv2.COLOR_BGR2RGB) 
-
-    # Encontrar las coordenadas de las cuatro esquinas del documento
-    (x,y) = np.where(mask==255) 
-    # Encontrar la esquina superior izquierda
-    (x1, y1) = (np.min(x), np.min(y)) 
-    # Encontrar la esquina inferior derecha
-    (x2, y2) = (np.max(x), np.max(y)) 
-    # Recortar la imagen usando las coordenadas
-    cropped_image = gray[x1:x2+1, y1:y2+1] 
-
-    # Convertir la imagen a RGB para mostrarla
-    imagenplaca=cv2.cvtColor(cropped_image, cv2.COLOR_BGR2RGB) 
-
-    # Crear un objeto lector easyocr con español como idioma
-    reader = easyocr.Reader(['es']) 
-    # Leer el texto de la imagen recortada
-    result = reader.readtext(cropped_image) 
-    
-    placa=None
-
-    if result:
-        # Extraer el texto del resultado
-        placa = result[0][-2] 
-    
-    return placa,imagenplaca,imagenContornos
+@st.cache_resource(show_spinner="Cargando el modelo de OCR...")
+def cargarLector():
+    """Crea el lector de EasyOCR una sola vez por proceso y lo comparte entre sesiones.
+    Esto puede tomar un tiempo al ejecutarse la primera vez ya que debe descargar el modelo
+    """
+    return mp.crearLector()
+
+@st.cache_resource(show_spinner="Cargando el modelo para eliminar el fondo...")
+def cargarSesionFondo():
+    """Crea la sesión de rembg una sola vez por proceso y la comparte entre sesiones.
+    Esto puede tomar un tiempo al ejecutarse la primera vez ya que debe descargar el modelo
+    """
+    return mp.crearSesionFondo()
+
+def reconocerLoteUI():
+    """Interfaz del modo por lotes: recibe una carpeta con imágenes (dentro de mp.CARPETA_LOTES) o un video, reconoce las placas
+    en un pool de procesos con un único lector de OCR y escribe los resultados en un archivo CSV o Parquet.
+    """
+    origen = st.radio("Origen", ["Carpeta", "Video"], horizontal=True)
+    if origen == "Carpeta":
+        # Solo se pueden leer carpetas dentro de la carpeta raíz configurada en el servidor
+        carpeta = st.text_input("Subcarpeta con imágenes", value=".", help=f"Ruta relativa a la carpeta de lotes del servidor: {mp.CARPETA_LOTES}")
+        video = None
+    else:
+        video = st.file_uploader("Elige un video", type=['mp4','avi','mov'])
+        cadaN = st.number_input("Analizar 1 de cada N frames", min_value=1, max_value=300, value=15)
+        carpeta = None
+    c1,c2,c3 = st.columns(3)
+    formato = c1.selectbox("Formato de salida", mp.FORMATOS_SALIDA)
+    numProcesos = c2.number_input("Procesos", min_value=1, max_value=64, value=os.cpu_count() or 1)
+    tamanoLote = c3.number_input("Recortes por lote de OCR", min_value=1, max_value=512, value=mp.TAMANO_LOTE_OCR)
+    usarFondo = st.checkbox("Eliminar el fondo con rembg", help="Más lento; en fotos de cámaras fijas no suele ser necesario")
+
+    if st.button("Reconocer placas", disabled=video is None and not carpeta):
+        if carpeta:
+            rutaCarpeta = mp.resolverCarpeta(carpeta)
+            if rutaCarpeta is None:
+                st.error(f"La carpeta {carpeta} no existe o está fuera de la carpeta de lotes del servidor")
+                return
+        if video is not None:
+            # OpenCV necesita una ruta de archivo en el disco para abrir el video
+            tfile = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(video.name)[1])
+            tfile.write(video.getbuffer())
+            tfile.close()
+            imagenes = mp.leerFramesVideo(tfile.name, cadaN)
+            total = mp.contarFramesVideo(tfile.name, cadaN)
+        else:
+            imagenes = mp.leerImagenesCarpeta(rutaCarpeta)
+            total = len(list(mp.leerImagenesCarpeta(rutaCarpeta)))
+        extension = "csv" if formato == "CSV" else "parquet"
+        # Cada ejecución escribe en su propio archivo temporal, para que dos sesiones no mezclen sus resultados
+        descriptor, rutaSalida = tempfile.mkstemp(suffix=f".{extension}")
+        os.close(descriptor)
+        barra = st.progress(0.0, "Reconociendo placas...")
+        try:
+            estadisticas = mp.reconocerLote(imagenes, rutaSalida, cargarLector(), formato=formato, numProcesos=numProcesos,
+                                            tamanoLote=tamanoLote, usarFondo=usarFondo,
+                                            progreso=lambda procesadas: barra.progress(min(procesadas / max(total, 1), 1.0), f"{procesadas} de {total} imágenes procesadas"))
+            with open(rutaSalida, "rb") as archivo:
+                datosSalida = archivo.read()
+            vistaPrevia = pd.read_csv(rutaSalida) if formato == "CSV" else pd.read_parquet(rutaSalida)
+        finally:
+            barra.empty()
+            os.remove(rutaSalida)
+            if video is not None:
+                os.remove(tfile.name)
+        # Velocidad del proceso, para dimensionar los trabajos de reconocimiento
+        c1,c2,c3,c4 = st.columns(4)
+        c1.metric("Imágenes", estadisticas["imagenes"])
+        c2.metric("Placas leídas", estadisticas["placas"])
+        c3.metric("Imágenes por segundo", f"{estadisticas['imagenesPorSegundo']:.1f}")
+        c4.metric("Tiempo en OCR", f"{estadisticas['segundosOCR']:.1f} s", help=f"{estadisticas['lotesOCR']} lotes de OCR, {estadisticas['candidatos']} recortes")
+        if estadisticas["errores"]:
+            st.warning(f"No se pudieron leer: {', '.join(estadisticas['errores'])}")
+        st.dataframe(vistaPrevia, use_container_width=True)
+        st.download_button(label="Descargar resultados", data=datosSalida, file_name=f"placas.{extension}",
+                           mime="text/csv" if formato == "CSV" else "application/vnd.apache.parquet")
 
 # Define el encabezado de la aplicación
 st.header('Reconocimiento de placas de Vehículos')
 # Define el subtítulo de la aplicación y muestra un enlace al artículo original
 st.subheader('Adaptación del artículo [Automatic Number Plate Recognition System using EasyOCR](https://www.geeksforgeeks.org/automatic-license-number-plate-recognition-system/)') 
+# Modo de trabajo: una imagen o un lote (carpeta de imágenes o video)
+modo = st.radio("Modo", ["Imagen", "Lote (carpeta o video)"], horizontal=True)
+if modo != "Imagen":
+    reconocerLoteUI()
+    st.stop()
 st.warning("Se debe cargar una foto de un vehículo donde se vea la placa claramente",icon=":material/warning:")
 # Crea un widget para cargar archivos
 archivo_cargado = st.file_uploader("Elige un archivo con la imagen de un vehículo",type=['jpg','png'])
@@ -112,18 +143,18 @@ if archivo_cargado is not None:
         imageBGR = cv2.imdecode(np.frombuffer(bytes_data, np.uint8), 1)
         img= imageBGR    
     
-    # Aplicar la eliminación de fondo utilizando REMBG esto puede 
-    # Esto puede tomar un tiempo al ejecutarse la primera vez ya que debe descargar el modelo
-    output_array = rembg.remove(img)
-    
-    # Crear una imagen PIL a partir de la matriz de salida
-    output_image = Image.fromarray(output_array)
-
+    # Elimina el fondo, busca los contornos candidatos a placa y los lee todos con una sola llamada al OCR.
+    # El lector de EasyOCR y la sesión de rembg se cargan una sola vez y se reutilizan en cada imagen
+    resultado = mp.reconocerPlaca(img, cargarLector(), cargarSesionFondo())
+    placa = resultado["placa"]
+    location = resultado["location"]
+    resultadosOCR = resultado["textos"]
     
     # Muestra un subtítulo en la columna 1
     c1.subheader("Proceso")  
     # Muestra un subtítulo en la columna 2        
     c2.subheader("Resultado")
+    c2.caption(f"Procesada en {resultado['segundos']:.2f} s, {resultado['candidatos']} contornos candidatos a placa")
     
     with c1:
         c3,c4= st.columns(2)
@@ -132,50 +163,18 @@ if archivo_cargado is not None:
         c3.image(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))            
         c4.write("Imagen con fondo eliminado")  
         # Imagen con el fondo eliminado
-        c4.image(cv2.cvtColor(output_array, cv2.COLOR_BGR2RGB))
-        # Convierte la imagen a escala de grises
-        gray = cv2.cvtColor(output_array, cv2.COLOR_BGR2GRAY) 
-        # Aplica un filtro bilateral para reducir el ruido
-        bfilter = cv2.bilateralFilter(gray, 11, 17, 17)         
+        c4.image(cv2.cvtColor(resultado["sinFondo"], cv2.COLOR_BGRA2RGB))
         c3.write("Imagen escala de grises")  
-        # Muestra la imagen en la columna 1 interna
-        c3.image(cv2.cvtColor(bfilter, cv2.COLOR_BGR2RGB)) 
-    
-        # Crea un objeto lector easyocr con español como idioma
-        # Esto puede tomar un tiempo al ejecutarse la primera vez ya que debe descargar el modelo
-        reader = easyocr.Reader(['es'])     
-        # Lee el texto de la imagen en escala de grises
-        result = reader.readtext(gray)    
-        resultadosOCR=[x[1] for x in result if len(x[1])>4]
-        # Detecta los bordes de la imagen
-        edged = cv2.Canny(bfilter, 30, 200)         
+        # Muestra la imagen con el filtro bilateral en la columna 1 interna
+        c3.image(resultado["bfilter"]) 
         c4.write("Imagen con solo bordes")  
-        # Muestra la imagen en la columna 2 interna
-        c4.image(cv2.cvtColor(edged, cv2.COLOR_BGR2RGB))
-
-    # Encuentra los contornos de la imagen
-    keypoints = cv2.findContours(edged.copy(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE) 
-    # Obtiene los contornos
-    contours = imutils.grab_contours(keypoints) 
-    # Ordena los contornos por área en orden descendente y toma los 10 primeros
-    contours = sorted(contours, key=cv2.contourArea, reverse=True)[:10] 
-
-    # Itera sobre los contornos para encontrar el mejor contorno aproximado de los 10 contornos
-    location = None
-    placa=None
-    for contour in contours:
-        # Aproxima el contorno a un polígono
-        approx = cv2.approxPolyDP(contour, 10, True)    
-        # Si el polígono tiene 4 lados, se considera un candidato a placa
-        if len(approx) == 4:            
-            location = approx            
-            # Obtiene la placa, la imagen de la placa y la imagen con la placa resaltada
-            placa,imagenplaca,imagenContornos=obtenerPlaca(location,img,gray)
-            if placa:
-                # Si la longitud de la placa es mayor a 5 caracteres, se considera válida
-                if len(placa)>5:
-                    break
+        # Muestra la imagen de bordes en la columna 2 interna
+        c4.image(resultado["edged"])
+
     if placa:                
+        # Imagen con solo la placa resaltada y recorte de la placa
+        imagenContornos = mp.resaltarPlaca(img, location)
+        imagenplaca = mp.recortarPlaca(resultado["gray"], location)
         c1.write("Imagen con solo placa detectada")  
         # Muestra la imagen con la placa resaltada en la columna 1
         c1.image(imagenContornos) 
@@ -188,7 +187,7 @@ if archivo_cargado is not None:
             # Extrae el texto de la placa
             text = placa 
             # Dibuja un rectángulo alrededor del texto de la placa en la imagen original
-            res = cv2.rectangle(img, tuple(location[0][0]), tuple(location[2][0]), (0,255,0),3)             
+            res = cv2.rectangle(img.copy(), tuple(location[0][0]), tuple(location[2][0]), (0,255,0),3)             
             c4.write("Placa detectada")  
             # Muestra la placa detectada en un formato métrico
             c4.metric("Placa",text)
@@ -203,4 +202,4 @@ if archivo_cargado is not None:
         c2.error("No se ha encontrado placas de vehículos en la imagen")         
         c2.write("Textos detectados con OCR")  
         # Muestra una tabla con los textos detectados con más de 4 caracteres
-        c2.dataframe(resultadosOCR,use_container_width=True)       
\ No newline at end of file
+        c2.dataframe(resultadosOCR,use_container_width=True)       
@@ -1,4 +1,5 @@
 # Importa las librerías necesarias
+import os  # Para obtener el número de núcleos del procesador
 import streamlit as st  # Para crear la interfaz web. Instalar con: pip install streamlit
 import pandas as pd  # Para manipular datos en formato tabular. Instalar con: pip install pandas
 import numpy as np  # Para realizar cálculos numéricos. Instalar con: pip install numpy
@@ -9,6 +10,17 @@ import utils as ut  # Para funciones de utilidad personalizadas. Asegúrate de t
 
 # Ejemplo {{ventas}} * ({{precio}}-({{precio}}*0.1*{{descuento}}))
 
+# Mensajes de los errores de montecarlo.py, por código de error
+MENSAJES_ERROR = {
+    "sintaxis": "Error de sintaxis en la fórmula: {detalle}",
+    "elemento": "Elemento no permitido en la fórmula: {elemento}",
+    "constante": "Constante no permitida en la fórmula: {valor}",
+    "funcion": "Función no permitida en la fórmula: {funcion}",
+    "nombre": "Nombre desconocido en la fórmula: {nombre}. Las variables deben tener el formato {{{{variable}}}}",
+    "correlacionRango": "Las correlaciones deben estar entre -1 y 1",
+    "correlacionNoDefinida": "La combinación de correlaciones no es posible (la matriz no es definida positiva)",
+}
+
 # Configura la página de Streamlit
 st.set_page_config(page_title="Simulador de Montecarlo", layout="wide")
 # Aplica estilos CSS personalizados
@@ -35,12 +47,22 @@ with st.container(border=True, key="panel-parametros"):
     # Muestra un mensaje informativo sobre cómo ingresar la fórmula
     st.info('Ingrese la fórmula de la simulación. Utilice las variables entre llaves dobles. Por ejemplo, si la fórmula es `X1+X2`, debe ingresar `{{X1}}+{{X2}}`', icon=":material/info:")
 
+    c1, c2, c3 = st.columns(3)
     # Input para el número de simulaciones
-    parNumSimulaciones = st.number_input('Número de simulaciones', min_value=1, value=1000)
+    parNumSimulaciones = c1.number_input('Número de simulaciones', min_value=1, value=1000)
+    # Semilla para obtener resultados reproducibles. Con 0 cada simulación es distinta
+    parSemilla = c2.number_input('Semilla (0 = aleatoria)', min_value=0, value=0, help="Con la misma semilla se obtienen exactamente los mismos resultados, sin importar el número de procesos")
+    # Número de procesos entre los que se reparten los bloques de la simulación
+    parNumProcesos = c3.number_input('Procesos', min_value=1, max_value=os.cpu_count() or 1, value=1, help="Reparte la simulación entre varios núcleos del procesador")
     # Si se ha ingresado una fórmula
     if parformula:
-        # Genera las variables a partir de la fórmula ingresada
-        formulaSimulacion, listaNombreVariables = mc.generarVariables(parformula["text"])
+        # Compila la fórmula ingresada (se valida una sola vez y queda en caché) y obtiene sus variables
+        try:
+            _, listaNombreVariables = mc.compilarFormula(parformula["text"])
+        except mc.ErrorSimulacion as e:
+            st.error(MENSAJES_ERROR[e.codigo].format(**e.datos), icon=":material/warning:")
+            st.stop() # Detiene la ejecución si la fórmula no es válida
+        listaNombreVariables = list(listaNombreVariables)
         
         # Verifica si se encontraron variables en la fórmula
         if len(listaNombreVariables) == 0:
@@ -82,6 +104,19 @@ with st.container(border=True, key="panel-parametros"):
                                             )
                                         },
                                         hide_index=True, use_container_width=True)
+            # Estrategia de muestreo de las variables
+            parEstrategia = st.selectbox('Estrategia de muestreo', mc.ESTRATEGIAS_MUESTREO,
+                                         help="Latin Hypercube y Sobol reparten las muestras de forma más uniforme y los resultados convergen con menos simulaciones")
+            # Matriz de correlación entre las variables. Por defecto son independientes
+            with st.expander("Correlación entre variables"):
+                st.caption("Ingrese las correlaciones (entre -1 y 1) en el triángulo superior de la matriz. Se aplican con una cópula gaussiana.")
+                dfCorrelacion = st.data_editor(pd.DataFrame(np.eye(len(listaNombreVariables)), index=listaNombreVariables, columns=listaNombreVariables),
+                                               use_container_width=True)
+            try:
+                matrizCorrelacion = mc.matrizCorrelacion(dfCorrelacion)
+            except mc.ErrorSimulacion as e:
+                st.error(MENSAJES_ERROR[e.codigo].format(**e.datos), icon=":material/warning:")
+                st.stop() # Detiene la ejecución si la matriz de correlación no es válida
             # Botón para iniciar la simulación
             btnSimular = st.button('Simular', type="primary")
             # Calcula el valor mínimo de los parámetros
@@ -129,32 +164,19 @@ with st.container(border=True, key="panel-analisis"):
             st.stop()
         # Si no hay resultados en la sesión o se ha presionado el botón Simular
         if len(st.session_state.resultado) == 0 or btnSimular:
-            # Subtítulo para la sección de resultados            
-            # Declaramos un diccionario para almacenar las variables
-            variables = dict()
-            # Itera sobre las variables y genera valores aleatorios según la distribución seleccionada
-            for index, fila in dfVariables.iterrows():
-                if fila["Distribucion"] == "Normal":
-                    variables[fila["Variable"]] = np.random.normal(fila["Param 1"], fila["Param 2"], parNumSimulaciones)
-                if fila["Distribucion"] == "Uniforme":
-                    variables[fila["Variable"]] = np.random.uniform(fila["Param 1"], fila["Param 2"], parNumSimulaciones)
-                if fila["Distribucion"] == "Binomial":
-                    variables[fila["Variable"]] = np.random.binomial(fila["Param 1"], fila["Param 2"], parNumSimulaciones)
-                if fila["Distribucion"] == "Triangular":
-                    variables[fila["Variable"]] = np.random.triangular(fila["Param 1"], (fila["Param 2"] , fila["Param 3"], parNumSimulaciones))
-                if fila["Tipo Datos"] == "Entero":
-                    variables[fila["Variable"]] = variables[fila["Variable"]].astype(int)
-
-            # Evalúa la fórmula de simulación
-            variables[parVariableResultado] = eval(formulaSimulacion)
-            
-            # Crea un DataFrame con los resultados
-            dfResultado = pd.DataFrame(variables)
-            # Guarda el DataFrame en el estado de la sesión
+            # Genera las variables y evalúa la fórmula compilada por bloques de tamaño fijo. No se guardan las
+            # simulaciones: se conserva un resumen (histograma y percentiles) y solo una muestra del detalle
+            dfResultado, resumenResultado = mc.simular(parformula["text"], dfVariables.to_dict("records"),
+                                                      parNumSimulaciones, parVariableResultado,
+                                                      semilla=parSemilla or None, numProcesos=parNumProcesos,
+                                                      estrategia=parEstrategia, correlacion=matrizCorrelacion)
+            # Guarda los resultados en el estado de la sesión
             st.session_state.resultado = dfResultado
+            st.session_state.resumenResultado = resumenResultado
         else:
             # Si ya hay resultados en la sesión, los carga
             dfResultado = st.session_state.resultado
+            resumenResultado = st.session_state.resumenResultado
         # Subtítulo para la sección de resultados
         st.subheader(':green[:material/insights: Resultados de la simulación]')
         # Crea dos pestañas para mostrar los resultados: Análisis y Datos
@@ -165,6 +187,8 @@ with st.container(border=True, key="panel-analisis"):
             c1, c2 = st.columns([4, 6])
             with c1:
                 st.dataframe(dfResultado, use_container_width=True)
+                if parNumSimulaciones > len(dfResultado):
+                    st.caption(f"Se muestran las primeras {len(dfResultado):,} de {parNumSimulaciones:,} simulaciones")
             with c2:
                 columns = st.columns(3)
                 contador = 0
@@ -176,26 +200,30 @@ with st.container(border=True, key="panel-analisis"):
                     columns[col].plotly_chart(ut.aplicarFormatoChart(fig), use_container_width=True, key=f"chart-{variable}")
                     contador += 1
         with tabAnalisis:
+            if resumenResultado.noValidos > 0:
+                st.warning(f"{resumenResultado.noValidos:,} simulaciones dieron un resultado no numérico (por ejemplo, división por cero) y no se incluyen en el análisis", icon=":material/warning:")
+            if resumenResultado.n == 0:
+                st.error("Ninguna simulación dio un resultado finito, así que no hay nada que analizar. Revisa la fórmula y los parámetros de las variables", icon=":material/warning:")
+                st.stop()
             c1, c2 = st.columns([8, 2])
             with c1:
                 # Calcula el histograma para la variable resultado
-                count, division = np.histogram(dfResultado[parVariableResultado], bins=100)
-                dfHistograma = pd.DataFrame({"count": count, "division": division[:100]})
+                count, division = resumenResultado.histograma(bins=100)
+                dfHistograma = pd.DataFrame({"count": count, "division": (division[:-1] + division[1:]) / 2})
                 # Crea un slider para seleccionar el rango de probabilidad
                 rangoPercentiles = [2.5, 5, 25, 50, 75, 95, 97.5]
-                percentiles = np.percentile(dfResultado[parVariableResultado], rangoPercentiles)
+                percentiles = resumenResultado.percentil(rangoPercentiles)
                 dfPercentiles = pd.DataFrame({"Percentil": [str(i) + " %" for i in rangoPercentiles], "Valor": percentiles})
-                parMontoProbabilidad = st.slider('Monto para calcular probabilidad', float(dfResultado[parVariableResultado].min()),
-                                                 float(dfResultado[parVariableResultado].max()),
+                parMontoProbabilidad = st.slider('Monto para calcular probabilidad', float(resumenResultado.minimo),
+                                                 float(resumenResultado.maximo),
                                                  (float(percentiles[0]), float(percentiles[-1])))
                 # Calcula la probabilidad, el promedio y la mediana para el rango seleccionado
-                dfRango = dfResultado[(dfResultado[parVariableResultado] >= parMontoProbabilidad[0]) & (
-                            dfResultado[parVariableResultado] <= parMontoProbabilidad[1])]
-                probabilidadMonto = dfRango[parVariableResultado].count() / parNumSimulaciones
-                promedioGeneral = dfResultado[parVariableResultado].mean()
-                medianaGeneral = dfResultado[parVariableResultado].median()
-                promedio = dfRango[parVariableResultado].mean()
-                mediana = dfRango[parVariableResultado].median()
+                # Se responde con la distribución acumulada del resumen, sin volver a recorrer las simulaciones
+                probabilidadMonto = resumenResultado.probabilidadRango(*parMontoProbabilidad)
+                promedioGeneral = resumenResultado.promedio()
+                medianaGeneral = float(resumenResultado.percentil(50))
+                promedio = resumenResultado.promedioRango(*parMontoProbabilidad)
+                mediana = resumenResultado.medianaRango(*parMontoProbabilidad)
                 columns = st.columns(3)
                 columns[0].metric(label="Probabilidad", value=f"{probabilidadMonto:,.2%}", delta_color="normal")
                 columns[1].metric(label="Promedio", value=f"{promedio:,.2f}", delta_color="normal")
@@ -205,7 +233,9 @@ with st.container(border=True, key="panel-analisis"):
                 """
                 st.success(interpretacion, icon=":material/emoji_objects:")
                 # Crea un histograma para la variable resultado con el rango seleccionado
-                fig = px.histogram(dfResultado, x=parVariableResultado, title=parVariableResultado)
+                # Se grafica el histograma ya calculado para no enviar todas las simulaciones al gráfico
+                fig = px.bar(dfHistograma, x="division", y="count", title=parVariableResultado,
+                             labels={"division": parVariableResultado, "count": "count"})
                 fig.update_layout(bargap=0.03)
                 fig.add_vrect(x0=parMontoProbabilidad[0], x1=parMontoProbabilidad[1], fillcolor="green", opacity=0.25,
                               line_width=0)
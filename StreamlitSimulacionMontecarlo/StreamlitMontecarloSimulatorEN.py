@@ -1,4 +1,5 @@
 # Imports the necessary libraries
+import os  # To get the number of CPU cores
 import streamlit as st  # To create the web interface. Install with: pip install streamlit
 import pandas as pd  # To manipulate data in tabular format. Install with: pip install pandas
 import numpy as np  # To perform numerical calculations. Install with: pip install numpy
@@ -9,6 +10,17 @@ import utils as ut  # For custom utility functions. Make sure you have the utils
 
 # Example {{sales}} * ({{price}}-({{price}}*0.1*{{discount}}))
 
+# Error messages from montecarlo.py, by error code
+MENSAJES_ERROR = {
+    "sintaxis": "Syntax error in the formula: {detalle}",
+    "elemento": "Element not allowed in the formula: {elemento}",
+    "constante": "Constant not allowed in the formula: {valor}",
+    "funcion": "Function not allowed in the formula: {funcion}",
+    "nombre": "Unknown name in the formula: {nombre}. Variables must be in the format {{{{variable}}}}",
+    "correlacionRango": "Correlations must be between -1 and 1",
+    "correlacionNoDefinida": "This combination of correlations is not possible (the matrix is not positive definite)",
+}
+
 # Configure the Streamlit page
 st.set_page_config(page_title="Monte Carlo Simulator", layout="wide")
 # Apply custom CSS styles
@@ -35,12 +47,22 @@ with st.container(border=True, key="panel-parametros"):
     # Displays an informative message about how to enter the formula
     st.info('Enter the simulation formula. Use variables between double braces. For example, if the formula is `X1+X2`, you should enter `{{X1}}+{{X2}}`', icon=":material/info:")
 
+    c1, c2, c3 = st.columns(3)
     # Input for the number of simulations
-    parNumSimulaciones = st.number_input('Number of simulations', min_value=1, value=1000)
+    parNumSimulaciones = c1.number_input('Number of simulations', min_value=1, value=1000)
+    # Seed to get reproducible results. With 0 every simulation is different
+    parSemilla = c2.number_input('Seed (0 = random)', min_value=0, value=0, help="The same seed gives exactly the same results, regardless of the number of processes")
+    # Number of processes the simulation chunks are split across
+    parNumProcesos = c3.number_input('Processes', min_value=1, max_value=os.cpu_count() or 1, value=1, help="Splits the simulation across several CPU cores")
     # If a formula has been entered
     if parformula:
-        # Generates the variables from the entered formula
-        formulaSimulacion, listaNombreVariables = mc.generarVariables(parformula["text"])
+        # Compiles the entered formula (validated once and cached) and gets its variables
+        try:
+            _, listaNombreVariables = mc.compilarFormula(parformula["text"])
+        except mc.ErrorSimulacion as e:
+            st.error(MENSAJES_ERROR[e.codigo].format(**e.datos), icon=":material/warning:")
+            st.stop() # Stops execution if the formula is not valid
+        listaNombreVariables = list(listaNombreVariables)
         
         # Checks if variables were found in the formula
         if len(listaNombreVariables) == 0:
@@ -82,6 +104,19 @@ with st.container(border=True, key="panel-parametros"):
                                             )
                                         },
                                         hide_index=True, use_container_width=True)
+            # Sampling strategy for the variables
+            parEstrategia = st.selectbox('Sampling strategy', mc.ESTRATEGIAS_MUESTREO,
+                                         help="Latin Hypercube and Sobol spread the samples more evenly, so results converge with fewer simulations")
+            # Correlation matrix between the variables. Independent by default
+            with st.expander("Correlation between variables"):
+                st.caption("Enter the correlations (between -1 and 1) in the upper triangle of the matrix. They are applied with a Gaussian copula.")
+                dfCorrelacion = st.data_editor(pd.DataFrame(np.eye(len(listaNombreVariables)), index=listaNombreVariables, columns=listaNombreVariables),
+                                               use_container_width=True)
+            try:
+                matrizCorrelacion = mc.matrizCorrelacion(dfCorrelacion)
+            except mc.ErrorSimulacion as e:
+                st.error(MENSAJES_ERROR[e.codigo].format(**e.datos), icon=":material/warning:")
+                st.stop() # Stops execution if the correlation matrix is not valid
             # Button to start the simulation
             btnSimular = st.button('Simulate', type="primary")
             # Calculates the minimum value of the parameters
@@ -129,32 +164,19 @@ with st.container(border=True, key="panel-analisis"):
             st.stop()
         # If there are no results in the session or the Simulate button has been pressed
         if len(st.session_state.resultado) == 0 or btnSimular:
-            # Subtitle for the results section
-            # Declare a dictionary to store the variables
-            variables = dict()
-            # Iterates over the variables and generates random values according to the selected distribution
-            for index, row in dfVariables.iterrows():
-                if row["Distribucion"] == "Normal":
-                    variables[row["Variable"]] = np.random.normal(row["Param 1"], row["Param 2"], parNumSimulaciones)
-                if row["Distribucion"] == "Uniforme":
-                    variables[row["Variable"]] = np.random.uniform(row["Param 1"], row["Param 2"], parNumSimulaciones)
-                if row["Distribucion"] == "Binomial":
-                    variables[row["Variable"]] = np.random.binomial(row["Param 1"], row["Param 2"], parNumSimulaciones)
-                if row["Distribucion"] == "Triangular":
-                    variables[row["Variable"]] = np.random.triangular(row["Param 1"], (row["Param 2"] , row["Param 3"], parNumSimulaciones))
-                if row["Tipo Datos"] == "Entero":
-                    variables[row["Variable"]] = variables[row["Variable"]].astype(int)
-
-            # Evaluates the simulation formula
-            variables[parVariableResultado] = eval(formulaSimulacion)
-            
-            # Creates a DataFrame with the results
-            dfResultado = pd.DataFrame(variables)
-            # Saves the DataFrame to the session state
+            # Generates the variables and evaluates the compiled formula in fixed-size chunks. The simulations
+            # are not stored: a summary (histogram and percentiles) and only a sample of the detail are kept
+            dfResultado, resumenResultado = mc.simular(parformula["text"], dfVariables.to_dict("records"),
+                                                      parNumSimulaciones, parVariableResultado,
+                                                      semilla=parSemilla or None, numProcesos=parNumProcesos,
+                                                      estrategia=parEstrategia, correlacion=matrizCorrelacion)
+            # Saves the results to the session state
             st.session_state.resultado = dfResultado
+            st.session_state.resumenResultado = resumenResultado
         else:
             # If there are already results in the session, loads them
             dfResultado = st.session_state.resultado
+            resumenResultado = st.session_state.resumenResultado
         # Subtitle for the results section
         st.subheader(':green[:material/insights: Simulation results]')
         # Creates two tabs to display the results: Analysis and Data
@@ -165,6 +187,8 @@ with st.container(border=True, key="panel-analisis"):
             c1, c2 = st.columns([4, 6])
             with c1:
                 st.dataframe(dfResultado, use_container_width=True)
+                if parNumSimulaciones > len(dfResultado):
+                    st.caption(f"Showing the first {len(dfResultado):,} of {parNumSimulaciones:,} simulations")
             with c2:
                 columns = st.columns(3)
                 contador = 0
@@ -176,26 +200,30 @@ with st.container(border=True, key="panel-analisis"):
                     columns[col].plotly_chart(ut.aplicarFormatoChart(fig), use_container_width=True, key=f"chart-{variable}")
                     contador += 1
         with tabAnalisis:
+            if resumenResultado.noValidos > 0:
+                st.warning(f"{resumenResultado.noValidos:,} simulations gave a non-numeric result (for example, division by zero) and are not included in the analysis", icon=":material/warning:")
+            if resumenResultado.n == 0:
+                st.error("No simulation gave a finite result, so there is nothing to analyze. Check the formula and the parameters of the variables", icon=":material/warning:")
+                st.stop()
             c1, c2 = st.columns([8, 2])
             with c1:
                 # Calculates the histogram for the result variable
-                count, division = np.histogram(dfResultado[parVariableResultado], bins=100)
-                pd.DataFrame({"count": count, "division": division[:100]})
+                count, division = resumenResultado.histograma(bins=100)
+                dfHistograma = pd.DataFrame({"count": count, "division": (division[:-1] + division[1:]) / 2})
                 # Creates a slider to select the probability range
                 rangoPercentiles = [2.5, 5, 25, 50, 75, 95, 97.5]
-                percentiles = np.percentile(dfResultado[parVariableResultado], rangoPercentiles)
+                percentiles = resumenResultado.percentil(rangoPercentiles)
                 dfPercentiles = pd.DataFrame({"Percentil": [str(i) + " %" for i in rangoPercentiles], "Valor": percentiles})
-                parMontoProbabilidad = st.slider('Amount to calculate probability', float(dfResultado[parVariableResultado].min()),
-                                                 float(dfResultado[parVariableResultado].max()),
+                parMontoProbabilidad = st.slider('Amount to calculate probability', float(resumenResultado.minimo),
+                                                 float(resumenResultado.maximo),
                                                  (float(percentiles[0]), float(percentiles[-1])))
                 # Calculates the probability, average and median for the selected range
-                dfRango = dfResultado[(dfResultado[parVariableResultado] >= parMontoProbabilidad[0]) & (
-                            dfResultado[parVariableResultado] <= parMontoProbabilidad[1])]
-                probabilidadMonto = dfRango[parVariableResultado].count() / parNumSimulaciones
-                promedioGeneral = dfResultado[parVariableResultado].mean()
-                medianaGeneral = dfResultado[parVariableResultado].median()
-                promedio = dfRango[parVariableResultado].mean()
-                mediana = dfRango[parVariableResultado].median()
+                # Answered from the summary's cumulative distribution, without scanning the simulations again
+                probabilidadMonto = resumenResultado.probabilidadRango(*parMontoProbabilidad)
+                promedioGeneral = resumenResultado.promedio()
+                medianaGeneral = float(resumenResultado.percentil(50))
+                promedio = resumenResultado.promedioRango(*parMontoProbabilidad)
+                mediana = resumenResultado.medianaRango(*parMontoProbabilidad)
                 columns = st.columns(3)
                 columns[0].metric(label="Probability", value=f"{probabilidadMonto:,.2%}", delta_color="normal")
                 columns[1].metric(label="Average", value=f"{promedio:,.2f}", delta_color="normal")
@@ -205,7 +233,9 @@ with st.container(border=True, key="panel-analisis"):
                 """
                 st.success(interpretacion, icon=":material/emoji_objects:")
                 # Creates a histogram for the result variable with the selected range
-                fig = px.histogram(dfResultado, x=parVariableResultado, title=parVariableResultado)
+                # Plots the precomputed histogram so the chart does not receive every simulation
+                fig = px.bar(dfHistograma, x="division", y="count", title=parVariableResultado,
+                             labels={"division": parVariableResultado, "count": "count"})
                 fig.update_layout(bargap=0.03)
                 fig.add_vrect(x0=parMontoProbabilidad[0], x1=parMontoProbabilidad[1], fillcolor="green", opacity=0.25,
                               line_width=0)
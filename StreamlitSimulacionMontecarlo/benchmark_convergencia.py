@@ -0,0 +1,34 @@
+# Benchmark de convergencia de las estrategias de muestreo del simulador de Montecarlo.
+# Repite la estimación del promedio del resultado con distintas semillas y mide el error estándar
+# (desviación de las estimaciones) de cada estrategia frente al muestreo aleatorio simple.
+# Uso: python benchmark_convergencia.py [repeticiones]
+import sys
+import numpy as np
+import montecarlo as mc
+
+FORMULA = "{{ventas}} * ({{precio}}-({{precio}}*0.1*{{descuento}}))"
+CONFIG_VARIABLES = [
+    {"Variable": "ventas", "Distribucion": "Normal", "Tipo Datos": "Decimales", "Param 1": 1000, "Param 2": 100, "Param 3": 0},
+    {"Variable": "precio", "Distribucion": "Uniforme", "Tipo Datos": "Decimales", "Param 1": 10, "Param 2": 20, "Param 3": 0},
+    {"Variable": "descuento", "Distribucion": "Triangular", "Tipo Datos": "Decimales", "Param 1": 0, "Param 2": 0.2, "Param 3": 0.5},
+]
+
+def errorEstandar(numSimulaciones, repeticiones, estrategia):
+    estimaciones = []
+    for semilla in range(repeticiones):
+        rng = np.random.default_rng(semilla)
+        _, resultado = mc.simularBloque(FORMULA, CONFIG_VARIABLES, numSimulaciones, rng, estrategia)
+        estimaciones.append(resultado.mean())
+    return np.std(estimaciones, ddof=1)
+
+if __name__ == "__main__":
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{'simulaciones':>12} {'estrategia':<16} {'error estándar':>15} {'reducción':>10} {'muestras equivalentes':>22}")
+    for numSimulaciones in [2**10, 2**13, 2**16]:
+        errorBase = errorEstandar(numSimulaciones, repeticiones, "Aleatorio")
+        for estrategia in mc.ESTRATEGIAS_MUESTREO:
+            error = errorBase if estrategia == "Aleatorio" else errorEstandar(numSimulaciones, repeticiones, estrategia)
+            # El error del muestreo aleatorio baja con la raíz del número de muestras: (errorBase / error)^2
+            # indica cuántas veces más simulaciones aleatorias harían falta para lograr el mismo error
+            factor = (errorBase / error) ** 2
+            print(f"{numSimulaciones:>12,} {estrategia:<16} {error:>15.4f} {errorBase / error:>9.1f}x {numSimulaciones * factor:>22,.0f}")
@@ -0,0 +1,46 @@
+# Benchmark del motor de fórmulas del simulador de Montecarlo.
+# Compara las simulaciones por segundo del método anterior (eval sobre todas las muestras + pd.DataFrame)
+# contra la fórmula compilada evaluada por bloques, en un solo proceso y repartida entre todos los núcleos.
+# Uso: python benchmark_formula.py [numSimulaciones]
+import os
+import sys
+import time
+import pandas as pd
+import montecarlo as mc
+
+FORMULA = "{{ventas}} * ({{precio}}-({{precio}}*0.1*{{descuento}}))"
+CONFIG_VARIABLES = [
+    {"Variable": "ventas", "Distribucion": "Normal", "Tipo Datos": "Entero", "Param 1": 1000, "Param 2": 100, "Param 3": 0},
+    {"Variable": "precio", "Distribucion": "Uniforme", "Tipo Datos": "Decimales", "Param 1": 10, "Param 2": 20, "Param 3": 0},
+    {"Variable": "descuento", "Distribucion": "Triangular", "Tipo Datos": "Decimales", "Param 1": 0, "Param 2": 0.2, "Param 3": 0.5},
+]
+
+def simulacionEval(numSimulaciones):
+    # Reproduce el método anterior: muestras completas en memoria, eval del texto y DataFrame con todo
+    formulaSimulacion, _ = mc.generarVariables(FORMULA)
+    variables = mc.generarMuestras(CONFIG_VARIABLES, numSimulaciones)
+    variables["Resultado"] = eval(formulaSimulacion)
+    return pd.DataFrame(variables)["Resultado"].mean()
+
+def simulacionBloques(numSimulaciones):
+    suma = 0.0
+    for _, _, resultado in mc.simularPorBloques(FORMULA, CONFIG_VARIABLES, numSimulaciones):
+        suma += resultado.sum()
+    return suma / numSimulaciones
+
+def simulacionParalela(numSimulaciones):
+    _, resumen = mc.simular(FORMULA, CONFIG_VARIABLES, numSimulaciones, "Resultado", semilla=42, numProcesos=os.cpu_count())
+    return resumen.promedio()
+
+def medir(nombre, funcion, numSimulaciones):
+    inicio = time.perf_counter()
+    funcion(numSimulaciones)
+    duracion = time.perf_counter() - inicio
+    print(f"{nombre:<20} {numSimulaciones:>14,} simulaciones  {duracion:8.3f} s  {numSimulaciones / duracion:>16,.0f} simulaciones/s")
+
+if __name__ == "__main__":
+    listaSimulaciones = [int(sys.argv[1])] if len(sys.argv) > 1 else [10**5, 10**6, 10**7]
+    for numSimulaciones in listaSimulaciones:
+        medir("eval", simulacionEval, numSimulaciones)
+        medir("compilada/bloques", simulacionBloques, numSimulaciones)
+        medir(f"paralela/{os.cpu_count()} procesos", simulacionParalela, numSimulaciones)
@@ -1,6 +1,42 @@
+import ast
 import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+import pandas as pd
 import streamlit as st
-def generarVariables(formula):    
+from scipy import stats
+from scipy.stats import qmc
+from resumen import ResumenSimulacion
+
+# Número de simulaciones que se generan y evalúan en cada bloque. Limita la memoria usada sin importar el total de simulaciones
+TAMANO_BLOQUE = 1_000_000
+# Número de filas de detalle (variables + resultado) que se conservan para mostrar en la pestaña de datos
+FILAS_DETALLE = 10_000
+
+# Estrategias de muestreo disponibles. Latin Hypercube y Sobol cubren el espacio de forma más uniforme que el muestreo aleatorio
+ESTRATEGIAS_MUESTREO = ["Aleatorio", "Latin Hypercube", "Sobol"]
+# Límite para evitar que los cuantiles 0 y 1 den valores infinitos al transformar las muestras uniformes
+EPSILON_UNIFORME = 1e-12
+
+# Funciones de NumPy que se pueden usar en la fórmula, con o sin el prefijo np. Por ejemplo: np.maximum({{ventas}}, 0)
+FUNCIONES_PERMITIDAS = {nombre: getattr(np, nombre) for nombre in [
+    "abs", "absolute", "sqrt", "exp", "expm1", "log", "log10", "log2", "log1p",
+    "sin", "cos", "tan", "arcsin", "arccos", "arctan", "sinh", "cosh", "tanh",
+    "floor", "ceil", "rint", "trunc", "sign", "power", "mod", "hypot",
+    "maximum", "minimum", "fmax", "fmin", "clip", "where",
+]}
+
+# Nodos del árbol de sintaxis (AST) permitidos en la fórmula: aritmética, comparaciones, constantes, variables y llamadas a funciones
+NODOS_PERMITIDOS = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+    ast.BitAnd, ast.BitOr, ast.Invert,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+def generarVariables(formula):
     listaVariables = re.findall(r"({{[A-Za-z0-9]+}})", formula)
     formulaSimulacion = formula
     listaNombreVariables = []
@@ -9,4 +45,260 @@ def generarVariables(formula):
         if nombrevar not in listaNombreVariables:
             listaNombreVariables.append(nombrevar)
         formulaSimulacion = formulaSimulacion.replace(var,f"variables['{nombrevar}']")
-    return formulaSimulacion, listaNombreVariables
\ No newline at end of file
+    return formulaSimulacion, listaNombreVariables
+
+class _QuitarPrefijoNumpy(ast.NodeTransformer):
+    # Convierte np.funcion(...) en funcion(...) para validar ambas formas con la misma lista de funciones
+    def visit_Attribute(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id == "np":
+            return ast.copy_location(ast.Name(id=node.attr, ctx=node.ctx), node)
+        return self.generic_visit(node)
+
+class ErrorSimulacion(ValueError):
+    """
+    Error de validación de la fórmula o de las correlaciones. Lleva un código y los datos del error
+    para que cada página muestre el mensaje en su idioma (str(error) da el mensaje en español).
+    """
+    def __init__(self, codigo, mensaje, **datos):
+        super().__init__(mensaje)
+        self.codigo = codigo
+        self.datos = datos
+
+@lru_cache(maxsize=128)
+def compilarFormula(formula):
+    """
+    Analiza la fórmula una sola vez, la valida contra la lista de funciones permitidas y la compila.
+
+    Args:
+        formula (str): Fórmula con las variables entre llaves dobles, por ejemplo {{ventas}} * {{precio}}.
+
+    Returns:
+        tuple: Función que recibe un diccionario {variable: array} y devuelve el array resultado,
+               y la tupla con los nombres de las variables en orden de aparición.
+
+    Raises:
+        ErrorSimulacion: Si la fórmula tiene errores de sintaxis o usa elementos no permitidos. El código
+            es "sintaxis", "elemento", "constante", "funcion" o "nombre".
+    """
+    listaNombreVariables = []
+
+    def reemplazar(coincidencia):
+        nombrevar = coincidencia.group(1)
+        if nombrevar not in listaNombreVariables:
+            listaNombreVariables.append(nombrevar)
+        # Se usa un prefijo para que nombres como {{1x}} sean identificadores válidos de Python
+        return f"_v_{nombrevar}"
+
+    expresion = re.sub(r"{{([A-Za-z0-9]+)}}", reemplazar, formula).strip()
+    try:
+        arbol = ast.parse(expresion, mode="eval")
+    except SyntaxError as e:
+        raise ErrorSimulacion("sintaxis", f"Error de sintaxis en la fórmula: {e.msg}", detalle=e.msg)
+    arbol = ast.fix_missing_locations(_QuitarPrefijoNumpy().visit(arbol))
+
+    nombresVariables = {f"_v_{nombre}" for nombre in listaNombreVariables}
+    for nodo in ast.walk(arbol):
+        if not isinstance(nodo, NODOS_PERMITIDOS):
+            raise ErrorSimulacion("elemento", f"Elemento no permitido en la fórmula: {type(nodo).__name__}", elemento=type(nodo).__name__)
+        if isinstance(nodo, ast.Constant) and not isinstance(nodo.value, (int, float)):
+            raise ErrorSimulacion("constante", f"Constante no permitida en la fórmula: {nodo.value!r}", valor=repr(nodo.value))
+        if isinstance(nodo, ast.Call):
+            if not isinstance(nodo.func, ast.Name) or nodo.func.id not in FUNCIONES_PERMITIDAS or nodo.keywords:
+                raise ErrorSimulacion("funcion", f"Función no permitida en la fórmula: {ast.unparse(nodo.func)}", funcion=ast.unparse(nodo.func))
+        if isinstance(nodo, ast.Name) and nodo.id not in nombresVariables and nodo.id not in FUNCIONES_PERMITIDAS:
+            raise ErrorSimulacion("nombre", f"Nombre desconocido en la fórmula: {nodo.id}. Las variables deben tener el formato {{{{variable}}}}",
+                                  nombre=nodo.id)
+
+    codigo = compile(arbol, "<formula>", "eval")
+    # Sin builtins: la fórmula solo ve las funciones permitidas y las variables
+    espacioGlobal = {"__builtins__": {}, **FUNCIONES_PERMITIDAS}
+
+    def evaluar(variables):
+        valores = {f"_v_{nombre}": valor for nombre, valor in variables.items()}
+        return eval(codigo, espacioGlobal, valores)
+
+    return evaluar, tuple(listaNombreVariables)
+
+def matrizCorrelacion(dfCorrelacion):
+    """
+    Arma la matriz de correlación a partir del triángulo superior del editor de correlaciones.
+
+    Returns:
+        numpy.ndarray: Matriz de correlación, o None si todas las variables son independientes.
+
+    Raises:
+        ErrorSimulacion: Si alguna correlación está fuera de [-1, 1] (código "correlacionRango") o la matriz
+            no es definida positiva (código "correlacionNoDefinida").
+    """
+    superior = np.triu(dfCorrelacion.to_numpy(dtype=float), 1)
+    if np.any(np.abs(superior) > 1):
+        raise ErrorSimulacion("correlacionRango", "Las correlaciones deben estar entre -1 y 1")
+    matriz = superior + superior.T + np.eye(len(superior))
+    if not superior.any():
+        return None
+    try:
+        np.linalg.cholesky(matriz)
+    except np.linalg.LinAlgError:
+        raise ErrorSimulacion("correlacionNoDefinida", "La combinación de correlaciones no es posible (la matriz no es definida positiva)")
+    return matriz
+
+def generarUniformes(numSimulaciones, dimension, rng, estrategia="Aleatorio"):
+    """
+    Genera una matriz (numSimulaciones x dimension) de valores uniformes en [0, 1) con la estrategia indicada.
+    """
+    if estrategia == "Latin Hypercube":
+        return qmc.LatinHypercube(d=dimension, seed=rng).random(numSimulaciones)
+    if estrategia == "Sobol":
+        # Sobol advierte cuando el número de puntos no es potencia de 2. Con la secuencia aleatorizada (scramble) sigue siendo válida
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            return qmc.Sobol(d=dimension, seed=rng).random(numSimulaciones)
+    return rng.random((numSimulaciones, dimension))
+
+def _transformarUniformes(fila, uniformes):
+    # Convierte valores uniformes en la distribución de la variable con su función cuantil (inversa de la acumulada)
+    if fila["Distribucion"] == "Normal":
+        return stats.norm.ppf(uniformes, fila["Param 1"], fila["Param 2"])
+    if fila["Distribucion"] == "Uniforme":
+        return fila["Param 1"] + uniformes * (fila["Param 2"] - fila["Param 1"])
+    if fila["Distribucion"] == "Binomial":
+        return stats.binom.ppf(uniformes, int(fila["Param 1"]), fila["Param 2"])
+    if fila["Distribucion"] == "Triangular":
+        escala = fila["Param 3"] - fila["Param 1"]
+        return stats.triang.ppf(uniformes, (fila["Param 2"] - fila["Param 1"]) / escala, loc=fila["Param 1"], scale=escala)
+
+def generarMuestras(configVariables, numSimulaciones, rng=np.random, estrategia="Aleatorio", correlacion=None):
+    """
+    Genera las muestras aleatorias de cada variable según su distribución.
+
+    Con muestreo aleatorio y variables independientes se usan directamente los generadores de NumPy.
+    En los demás casos se generan valores uniformes con la estrategia elegida, se correlacionan con una
+    cópula gaussiana y se transforman a la distribución de cada variable.
+
+    Args:
+        configVariables (list): Lista de diccionarios con las columnas del editor de variables.
+        numSimulaciones (int): Número de valores a generar por variable.
+        rng: Generador de NumPy (np.random.Generator) o el módulo np.random.
+        estrategia (str): Una de ESTRATEGIAS_MUESTREO.
+        correlacion (numpy.ndarray, optional): Matriz de correlación entre las variables.
+
+    Returns:
+        dict: Diccionario {variable: array} con las muestras generadas.
+    """
+    variables = dict()
+    if estrategia == "Aleatorio" and correlacion is None:
+        for fila in configVariables:
+            if fila["Distribucion"] == "Normal":
+                variables[fila["Variable"]] = rng.normal(fila["Param 1"], fila["Param 2"], numSimulaciones)
+            elif fila["Distribucion"] == "Uniforme":
+                variables[fila["Variable"]] = rng.uniform(fila["Param 1"], fila["Param 2"], numSimulaciones)
+            elif fila["Distribucion"] == "Binomial":
+                variables[fila["Variable"]] = rng.binomial(int(fila["Param 1"]), fila["Param 2"], numSimulaciones)
+            elif fila["Distribucion"] == "Triangular":
+                variables[fila["Variable"]] = rng.triangular(fila["Param 1"], fila["Param 2"], fila["Param 3"], numSimulaciones)
+    else:
+        uniformes = generarUniformes(numSimulaciones, len(configVariables), rng, estrategia)
+        if correlacion is not None:
+            # Cópula gaussiana: se pasa a normales estándar, se correlacionan con la descomposición de Cholesky y se vuelve a uniformes
+            normales = stats.norm.ppf(np.clip(uniformes, EPSILON_UNIFORME, 1 - EPSILON_UNIFORME))
+            uniformes = stats.norm.cdf(normales @ np.linalg.cholesky(correlacion).T)
+        uniformes = np.clip(uniformes, EPSILON_UNIFORME, 1 - EPSILON_UNIFORME)
+        for j, fila in enumerate(configVariables):
+            variables[fila["Variable"]] = _transformarUniformes(fila, uniformes[:, j])
+    for fila in configVariables:
+        if fila["Tipo Datos"] == "Entero":
+            variables[fila["Variable"]] = variables[fila["Variable"]].astype(int)
+    return variables
+
+def semillasPorBloque(numBloques, semilla=None):
+    """
+    Crea una semilla independiente por bloque a partir de la semilla general (np.random.SeedSequence.spawn).
+    Cada bloque usa siempre la misma semilla sin importar el número de procesos, por lo que los resultados
+    son reproducibles para una misma semilla. Si la semilla es None se usa entropía del sistema.
+    """
+    return np.random.SeedSequence(semilla).spawn(numBloques)
+
+def dividirEnBloques(numSimulaciones, tamanoBloque=TAMANO_BLOQUE):
+    # Lista de (inicio, tamaño) de cada bloque
+    return [(inicio, min(tamanoBloque, numSimulaciones - inicio)) for inicio in range(0, numSimulaciones, tamanoBloque)]
+
+def simularBloque(formula, configVariables, numSimulaciones, rng, estrategia="Aleatorio", correlacion=None):
+    """
+    Genera las muestras de un bloque y evalúa la fórmula compilada sobre ellas.
+
+    Returns:
+        tuple: (muestras, resultado), donde muestras es el diccionario {variable: array}.
+    """
+    evaluar, _ = compilarFormula(formula)
+    muestras = generarMuestras(configVariables, numSimulaciones, rng, estrategia, correlacion)
+    # Si la fórmula devuelve un escalar se expande al tamaño del bloque
+    resultado = np.broadcast_to(np.asarray(evaluar(muestras), dtype=float), (numSimulaciones,))
+    return muestras, resultado
+
+def simularPorBloques(formula, configVariables, numSimulaciones, tamanoBloque=TAMANO_BLOQUE, semilla=None, estrategia="Aleatorio", correlacion=None):
+    """
+    Ejecuta la simulación en bloques de tamaño fijo para mantener acotada la memoria.
+
+    Yields:
+        tuple: (inicio, muestras, resultado) de cada bloque, donde muestras es el diccionario {variable: array}.
+    """
+    bloques = dividirEnBloques(numSimulaciones, tamanoBloque)
+    for (inicio, n), semillaBloque in zip(bloques, semillasPorBloque(len(bloques), semilla)):
+        muestras, resultado = simularBloque(formula, configVariables, n, np.random.default_rng(semillaBloque), estrategia, correlacion)
+        yield inicio, muestras, resultado
+
+def _procesarBloque(argumentos):
+    # Se ejecuta en el proceso trabajador: simula un bloque con su propio generador y devuelve el resumen
+    # del bloque y, si el bloque cae dentro de las primeras FILAS_DETALLE filas, su detalle.
+    # Sin bordes, el bloque es el piloto y define los intervalos del histograma para los demás
+    formula, configVariables, estrategia, correlacion, inicio, n, semillaBloque, variableResultado, bordes = argumentos
+    muestras, resultado = simularBloque(formula, configVariables, n, np.random.default_rng(semillaBloque), estrategia, correlacion)
+    if bordes is None:
+        resumen = ResumenSimulacion.desdePiloto(resultado)
+    else:
+        resumen = ResumenSimulacion(bordes)
+        resumen.agregar(resultado)
+    filas = min(FILAS_DETALLE - inicio, n)
+    dfDetalle = None
+    if filas > 0:
+        dfDetalle = pd.DataFrame({nombre: valores[:filas] for nombre, valores in muestras.items()})
+        dfDetalle[variableResultado] = resultado[:filas]
+    return resumen, dfDetalle
+
+def simular(formula, configVariables, numSimulaciones, variableResultado, tamanoBloque=TAMANO_BLOQUE, semilla=None, numProcesos=1,
+            estrategia="Aleatorio", correlacion=None):
+    """
+    Ejecuta la simulación completa, en el proceso actual o repartiendo los bloques entre varios procesos.
+    Las simulaciones no se guardan: cada bloque se reduce a un ResumenSimulacion y los resúmenes se combinan.
+
+    Args:
+        semilla (int, optional): Semilla para obtener resultados reproducibles. None para resultados aleatorios.
+        numProcesos (int): Número de procesos trabajadores. Con 1 se simula en el proceso actual.
+        estrategia (str): Estrategia de muestreo, una de ESTRATEGIAS_MUESTREO.
+        correlacion (numpy.ndarray, optional): Matriz de correlación entre las variables.
+
+    Returns:
+        tuple: DataFrame con las primeras FILAS_DETALLE filas (variables y resultado)
+               y ResumenSimulacion con el resultado de todas las simulaciones.
+    """
+    bloques = dividirEnBloques(numSimulaciones, tamanoBloque)
+    semillas = semillasPorBloque(len(bloques), semilla)
+    # El primer bloque se simula antes que los demás porque define los intervalos del histograma
+    resumen, dfDetalle = _procesarBloque((formula, configVariables, estrategia, correlacion, *bloques[0], semillas[0], variableResultado, None))
+    detalle = [dfDetalle]
+    argumentos = [(formula, configVariables, estrategia, correlacion, inicio, n, semillaBloque, variableResultado, resumen.bordes)
+                  for (inicio, n), semillaBloque in zip(bloques[1:], semillas[1:])]
+
+    def unirBloques(resultadosBloques):
+        # Los bloques llegan en orden, así que el resultado no depende del número de procesos
+        for resumenBloque, dfDetalle in resultadosBloques:
+            resumen.combinar(resumenBloque)
+            if dfDetalle is not None:
+                detalle.append(dfDetalle)
+
+    if numProcesos > 1 and len(argumentos) > 1:
+        with ProcessPoolExecutor(max_workers=min(numProcesos, len(argumentos))) as pool:
+            unirBloques(pool.map(_procesarBloque, argumentos))
+    else:
+        unirBloques(map(_procesarBloque, argumentos))
+    return pd.concat(detalle, ignore_index=True), resumen
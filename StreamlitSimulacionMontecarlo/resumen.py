@@ -0,0 +1,186 @@
+import numpy as np
+
+# Número de intervalos del histograma interno del resumen. Define la resolución de la función de distribución acumulada
+NUM_BINS_RESUMEN = 2000
+# Margen que se agrega a cada lado del rango del bloque piloto al definir los intervalos del histograma
+MARGEN_PILOTO = 0.25
+
+class SketchKLL:
+    """
+    Sketch de cuantiles KLL: resume un flujo de valores en unos pocos miles de elementos
+    y permite estimar cualquier percentil con un error de rango del orden de 1/k.
+    Dos sketches se pueden combinar, por lo que cada bloque de la simulación construye el suyo.
+    """
+    def __init__(self, k=2000):
+        self.k = k
+        # niveles[h] guarda elementos que representan 2^h valores cada uno
+        self.niveles = [np.empty(0)]
+        # Alterna qué mitad se conserva al compactar. Es determinista para que el resultado sea reproducible
+        self._paridad = 0
+
+    def _capacidad(self, nivel):
+        profundidad = len(self.niveles) - nivel - 1
+        return max(8, int(np.ceil(self.k * (2 / 3) ** profundidad)))
+
+    def _compactar(self):
+        h = 0
+        while h < len(self.niveles):
+            if len(self.niveles[h]) > self._capacidad(h):
+                if h + 1 == len(self.niveles):
+                    self.niveles.append(np.empty(0))
+                nivel = np.sort(self.niveles[h])
+                # Si la cantidad es impar, el primer elemento se queda en el nivel actual
+                impar = len(nivel) % 2
+                self.niveles[h + 1] = np.concatenate([self.niveles[h + 1], nivel[impar + self._paridad::2]])
+                self.niveles[h] = nivel[:impar]
+                self._paridad ^= 1
+            h += 1
+
+    def agregar(self, valores):
+        self.niveles[0] = np.concatenate([self.niveles[0], np.asarray(valores, dtype=float).ravel()])
+        self._compactar()
+
+    def combinar(self, otro):
+        while len(self.niveles) < len(otro.niveles):
+            self.niveles.append(np.empty(0))
+        for h, nivel in enumerate(otro.niveles):
+            self.niveles[h] = np.concatenate([self.niveles[h], nivel])
+        self._compactar()
+
+    def cuantil(self, q):
+        """
+        Estima los cuantiles q (entre 0 y 1) de todos los valores agregados.
+        Devuelve NaN si todavía no se agregó ningún valor.
+        """
+        valores = np.concatenate(self.niveles)
+        if len(valores) == 0:
+            return np.full(np.shape(q), np.nan)
+        pesos = np.concatenate([np.full(len(nivel), 2.0 ** h) for h, nivel in enumerate(self.niveles)])
+        orden = np.argsort(valores, kind="stable")
+        valores, acumulado = valores[orden], np.cumsum(pesos[orden])
+        posicion = np.searchsorted(acumulado, np.asarray(q) * acumulado[-1], side="left")
+        return valores[np.minimum(posicion, len(valores) - 1)]
+
+class ResumenSimulacion:
+    """
+    Resumen incremental del resultado de la simulación: conteo, suma, mínimo y máximo exactos,
+    un histograma de intervalos fijos (con intervalos de desborde a cada lado) y un sketch KLL
+    para los percentiles. Se construye bloque a bloque sin guardar las simulaciones y los
+    resúmenes de varios bloques se combinan sumando sus histogramas y sketches.
+    """
+    def __init__(self, bordes, k=2000):
+        self.bordes = np.asarray(bordes, dtype=float)
+        # conteos[0] son los valores menores al primer borde y conteos[-1] los mayores o iguales al último
+        self.conteos = np.zeros(len(self.bordes) + 1, dtype=np.int64)
+        self.n = 0
+        self.noValidos = 0
+        self.suma = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+        self.sketch = SketchKLL(k)
+        self._curva = None
+
+    @classmethod
+    def desdePiloto(cls, valores, numBins=NUM_BINS_RESUMEN, margen=MARGEN_PILOTO):
+        """
+        Crea el resumen con los intervalos definidos a partir del rango de un bloque piloto
+        y agrega ese bloque. Los demás bloques deben usar los mismos bordes para poder combinarse.
+        """
+        valores = np.asarray(valores, dtype=float)
+        validos = valores[np.isfinite(valores)]
+        if len(validos) == 0:
+            minimo, maximo = 0.0, 1.0
+        else:
+            minimo, maximo = float(validos.min()), float(validos.max())
+        ampliacion = (maximo - minimo) * margen if maximo > minimo else max(abs(minimo), 1.0) * margen
+        resumen = cls(np.linspace(minimo - ampliacion, maximo + ampliacion, numBins + 1))
+        resumen.agregar(valores)
+        return resumen
+
+    def agregar(self, valores):
+        valores = np.asarray(valores, dtype=float).ravel()
+        validos = valores[np.isfinite(valores)]
+        self.noValidos += len(valores) - len(validos)
+        if len(validos) == 0:
+            return
+        self.conteos += np.bincount(np.searchsorted(self.bordes, validos, side="right"), minlength=len(self.conteos))
+        self.n += len(validos)
+        self.suma += float(validos.sum())
+        self.minimo = min(self.minimo, float(validos.min()))
+        self.maximo = max(self.maximo, float(validos.max()))
+        self.sketch.agregar(validos)
+        self._curva = None
+
+    def combinar(self, otro):
+        if not np.array_equal(self.bordes, otro.bordes):
+            raise ValueError("Solo se pueden combinar resúmenes con los mismos intervalos")
+        self.conteos += otro.conteos
+        self.n += otro.n
+        self.noValidos += otro.noValidos
+        self.suma += otro.suma
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+        self.sketch.combinar(otro.sketch)
+        self._curva = None
+
+    def _curvaAcumulada(self):
+        # Puntos y proporción acumulada en cada borde del histograma. Los desbordes se extienden hasta el mínimo y el máximo
+        if self._curva is None:
+            puntos = np.concatenate([[min(self.minimo, self.bordes[0])], self.bordes, [max(self.maximo, self.bordes[-1])]])
+            acumulado = np.concatenate([[0], np.cumsum(self.conteos)]) / max(self.n, 1)
+            self._curva = (puntos, acumulado)
+        return self._curva
+
+    def cdf(self, x):
+        """
+        Proporción de simulaciones menores o iguales a x, interpolando dentro de cada intervalo. Cuesta O(intervalos).
+        """
+        puntos, acumulado = self._curvaAcumulada()
+        return np.interp(x, puntos, acumulado)
+
+    def _inversaCdf(self, p):
+        puntos, acumulado = self._curvaAcumulada()
+        i = int(np.clip(np.searchsorted(acumulado, p, side="left"), 1, len(acumulado) - 1))
+        if acumulado[i] == acumulado[i - 1]:
+            return float(puntos[i])
+        fraccion = (p - acumulado[i - 1]) / (acumulado[i] - acumulado[i - 1])
+        return float(puntos[i - 1] + fraccion * (puntos[i] - puntos[i - 1]))
+
+    def promedio(self):
+        return self.suma / self.n if self.n else np.nan
+
+    def percentil(self, q):
+        """
+        Estima los percentiles q (entre 0 y 100) con el sketch KLL.
+        """
+        return self.sketch.cuantil(np.asarray(q, dtype=float) / 100)
+
+    def probabilidadRango(self, desde, hasta):
+        return float(self.cdf(hasta) - self.cdf(desde))
+
+    def promedioRango(self, desde, hasta):
+        # Promedio ponderado de los puntos medios de cada tramo del histograma dentro del rango
+        puntos, _ = self._curvaAcumulada()
+        tramos = np.concatenate([[desde], puntos[(puntos > desde) & (puntos < hasta)], [hasta]])
+        masas = np.diff(self.cdf(tramos))
+        if masas.sum() <= 0:
+            return np.nan
+        return float(np.sum(masas * (tramos[:-1] + tramos[1:]) / 2) / masas.sum())
+
+    def medianaRango(self, desde, hasta):
+        inicio, fin = self.cdf(desde), self.cdf(hasta)
+        if fin <= inicio:
+            return np.nan
+        return self._inversaCdf((inicio + fin) / 2)
+
+    def histograma(self, bins=100):
+        """
+        Histograma entre el mínimo y el máximo con el número de intervalos indicado, como np.histogram.
+
+        Returns:
+            tuple: (conteos, bordes).
+        """
+        if self.maximo <= self.minimo:
+            return np.array([self.n]), np.array([self.minimo - 0.5, self.maximo + 0.5])
+        bordes = np.linspace(self.minimo, self.maximo, bins + 1)
+        return np.diff(self.cdf(bordes)) * self.n, bordes
@@ -0,0 +1,144 @@
+# Benchmark del rastreador asíncrono de rastreadorSitio.py contra un sitio local de prueba.
+# Levanta un servidor HTTP local con un sitio sintético (un árbol de páginas con enlaces entre sí, enlaces
+# rotos, imágenes y enlaces externos) que responde con una latencia fija, y compara el rastreo secuencial
+# con requests (como lo hacía la versión anterior de la aplicación) con el rastreo asíncrono.
+# También compara la extracción de texto con lxml y con BeautifulSoup, y mide un re-rastreo con la caché:
+# el servidor envía ETag y responde 304 a las peticiones condicionales de las páginas que no cambiaron.
+# Uso: python benchmark_rastreador.py [número de páginas] [latencia en ms]
+import asyncio
+import hashlib
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+import rastreadorSitio as rs
+
+HIJOS_POR_PAGINA = 10
+# Fracción de páginas que cambian entre el primer rastreo y el re-rastreo
+FRACCION_MODIFICADA = 0.05
+
+def crearServidor(numPaginas, latencia, version=None):
+    """
+    Crea el servidor del sitio de prueba. La página i enlaza a sus hijos i*10+1 ... i*10+10 (si existen),
+    a la página de inicio, a una página que no existe, a una imagen y a un sitio externo.
+    version es un diccionario opcional {número de página: versión} para simular páginas que cambian;
+    cada página tiene un ETag según su contenido.
+    """
+    version = {} if version is None else version
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latencia)
+            ruta = self.path.split("?")[0]
+            numero = int(ruta[len("/pagina/"):]) if ruta.startswith("/pagina/") and ruta[len("/pagina/"):].isdigit() else (0 if ruta == "/" else None)
+            if numero is None or numero >= numPaginas:
+                self.send_response(404)
+                self.send_header("Content-Type", "text/html")
+                self.end_headers()
+                self.wfile.write(b"<html><body>404</body></html>")
+                return
+            hijos = range(numero * HIJOS_POR_PAGINA + 1, min(numero * HIJOS_POR_PAGINA + HIJOS_POR_PAGINA + 1, numPaginas))
+            enlaces = "".join(f'<a href="/pagina/{hijo}?ref={numero}#inicio">Página {hijo}</a>' for hijo in hijos)
+            html = (f"<html><body><h1>Página {numero} (versión {version.get(numero, 0)})</h1><p>{'Texto de prueba. ' * 50}</p>{enlaces}"
+                    f'<a href="/">Inicio</a><a href="/no-existe-{numero}">Roto</a><a href="/foto.png">Foto</a>'
+                    f'<a href="https://example.com/">Externo</a></body></html>').encode("utf-8")
+            etag = '"' + hashlib.md5(html).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(html)))
+            self.end_headers()
+            self.wfile.write(html)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    servidor.daemon_threads = True
+    # La cola de conexiones pendientes por defecto (5) es muy corta para muchas conexiones simultáneas
+    servidor.request_queue_size = 256
+    return servidor
+
+def rastrearSecuencial(urlInicial, nivelMaximo, maxPaginas):
+    """
+    Rastreo secuencial de referencia: una petición bloqueante por página, sin reutilizar conexiones.
+    """
+    dominio = urlInicial.split("/")[2]
+    visitados, frontera, filas = {urlInicial}, deque([(urlInicial, 0)]), 0
+    while frontera:
+        url, nivel = frontera.popleft()
+        respuesta = requests.get(url, timeout=rs.TIMEOUT_SEGUNDOS)
+        filas += 1
+        if respuesta.status_code < 400 and nivel < nivelMaximo:
+            for enlace in rs.analizarHTML(respuesta.text, url, dominio)[1]:
+                if len(visitados) < maxPaginas and enlace not in visitados:
+                    visitados.add(enlace)
+                    frontera.append((enlace, nivel + 1))
+    return filas
+
+async def rastrearAsincrono(urlInicial, nivelMaximo, maxPaginas, cache=None, columna="estado"):
+    conteo = {}
+    async for fila in rs.rastrear(urlInicial, nivelMaximo, maxPaginas, cache=cache):
+        conteo[fila[columna]] = conteo.get(fila[columna], 0) + 1
+    return conteo
+
+def medirAnalizador(analizador, html, repeticiones=300):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        analizador(html)
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+if __name__ == "__main__":
+    numPaginas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latencia = (int(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    version = {}
+    servidor = crearServidor(numPaginas, latencia, version)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    urlInicial = f"http://127.0.0.1:{servidor.server_address[1]}/"
+    # Niveles suficientes para llegar a todas las páginas del árbol (más las páginas rotas de cada nivel)
+    nivelMaximo, capacidad = 0, 1
+    while capacidad < numPaginas:
+        nivelMaximo += 1
+        capacidad = capacidad * HIJOS_POR_PAGINA + 1
+    maxPaginas = 2 * numPaginas + 1
+    print(f"Sitio de prueba: {numPaginas} páginas, latencia {latencia * 1000:.0f} ms, {nivelMaximo} niveles")
+
+    # El rastreo secuencial se mide sobre una parte del sitio, porque tarda mucho más
+    paginasSecuencial = min(200, maxPaginas)
+    inicio = time.perf_counter()
+    filas = rastrearSecuencial(urlInicial, nivelMaximo, paginasSecuencial)
+    segundosSecuencial = time.perf_counter() - inicio
+    print(f"secuencial (requests): {filas:>6} páginas en {segundosSecuencial:7.2f} s ({filas / segundosSecuencial:8.1f} páginas/s)")
+
+    inicio = time.perf_counter()
+    estados = asyncio.run(rastrearAsincrono(urlInicial, nivelMaximo, maxPaginas))
+    segundos = time.perf_counter() - inicio
+    total = sum(estados.values())
+    print(f"asíncrono (aiohttp):   {total:>6} páginas en {segundos:7.2f} s ({total / segundos:8.1f} páginas/s)")
+    print(f"Estados: {estados}. Páginas del sitio encontradas: {estados.get('200', 0)} de {numPaginas}")
+
+    html = requests.get(urlInicial + "pagina/1").text
+    print(f"extracción de texto: lxml {medirAnalizador(rs.analizarConLxml, html):.3f} ms/página, "
+          f"BeautifulSoup {medirAnalizador(rs.analizarConBeautifulSoup, html):.3f} ms/página")
+
+    # Re-rastreo con caché: primer rastreo (caché vacía), cambian algunas páginas y se vuelve a rastrear
+    carpetaCache = tempfile.mkdtemp(prefix="benchmark_rastreador_")
+    with rs.CacheRastreo(carpetaCache + "/cache.sqlite") as cache:
+        for ronda in ("con caché vacía", "re-rastreo"):
+            inicio = time.perf_counter()
+            conteo = asyncio.run(rastrearAsincrono(urlInicial, nivelMaximo, maxPaginas, cache, "cache"))
+            segundos = time.perf_counter() - inicio
+            print(f"{ronda + ':':<20} {sum(conteo.values()):>6} páginas en {segundos:7.2f} s. Caché: {conteo}")
+            for numero in range(0, numPaginas, round(1 / FRACCION_MODIFICADA)):
+                version[numero] = version.get(numero, 0) + 1
+    shutil.rmtree(carpetaCache)
+    servidor.shutdown()
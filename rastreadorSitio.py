@@ -0,0 +1,259 @@
+# Rastreador asíncrono de sitios web para streamlitSiteScrapper.py.
+# Las páginas se descargan en paralelo con asyncio y aiohttp: una sola sesión comparte el pool de conexiones
+# (con un límite de conexiones por host), la frontera es una cola en anchura (BFS) con un presupuesto de
+# niveles y de páginas, y los enlaces visitados se guardan en un set. Cada página procesada se entrega
+# apenas termina, así que la interfaz puede mostrar el avance sin esperar al final del rastreo.
+# Con la caché de rastreo (SQLite) los re-rastreos envían peticiones condicionales (ETag/Last-Modified)
+# y no vuelven a extraer el texto de las páginas que no cambiaron.
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urldefrag, urljoin, urlsplit
+import aiohttp  # Cliente HTTP asíncrono. Instalación: pip install aiohttp
+from bs4 import BeautifulSoup  # pip install beautifulsoup4
+import lxml.html  # Analizador HTML rápido (libxml2). Instalación: pip install lxml
+from lxml.etree import ParserError
+
+# Número máximo de páginas por defecto
+MAX_PAGINAS = 100
+# Descargas simultáneas en total y por host
+CONCURRENCIA = 32
+CONEXIONES_POR_HOST = 16
+# Tiempo máximo de cada descarga, en segundos
+TIMEOUT_SEGUNDOS = 15
+# Extensiones de archivos que no son páginas y no se descargan
+EXTENSIONES_OMITIDAS = (".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".pdf", ".zip", ".css", ".js", ".mp4", ".mp3")
+# Identificación del rastreador en las peticiones
+USER_AGENT = "Mozilla/5.0 (compatible; StreamlitSiteScrapper/1.0)"
+# Archivo de la caché de rastreo, en la carpeta del módulo
+RUTA_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_rastreo.sqlite")
+# Etiquetas cuyo contenido no es texto visible (BeautifulSoup tampoco lo incluye en get_text)
+ETIQUETAS_SIN_TEXTO = ("script", "style", "template")
+
+def normalizarEnlace(urlPagina, href, dominio):
+    """
+    Convierte un enlace de la página en una URL absoluta sin parámetros ni fragmento.
+
+    Args:
+        urlPagina: URL de la página donde está el enlace, para resolver los enlaces relativos.
+        href: Valor del atributo href.
+        dominio: Host del sitio. Los enlaces a otros sitios se descartan.
+
+    Returns:
+        La URL normalizada, o None si el enlace no se debe seguir.
+    """
+    href = href.strip()
+    if len(href) <= 1 and href != "/":
+        return None
+    url = urldefrag(urljoin(urlPagina, href))[0].split("?")[0]
+    partes = urlsplit(url)
+    if partes.scheme not in ("http", "https") or partes.netloc != dominio:
+        return None
+    if partes.path.lower().endswith(EXTENSIONES_OMITIDAS):
+        return None
+    return url
+
+def analizarConLxml(html):
+    """
+    Extrae el texto y los href de los enlaces con lxml, sin el contenido de script, style y template.
+    """
+    documento = lxml.html.fromstring(html)
+    for elemento in documento.iter(*ETIQUETAS_SIN_TEXTO):
+        # Conserva el texto que sigue a la etiqueta (tail), que sí es parte del texto visible
+        elemento.drop_tree()
+    return documento.text_content(), documento.xpath("//a/@href")
+
+def analizarConBeautifulSoup(html):
+    """
+    Extrae el texto y los href de los enlaces con BeautifulSoup y el analizador de Python (más lento).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.get_text(), [link["href"] for link in soup.find_all("a", href=True)]
+
+def analizarHTML(html, urlPagina, dominio):
+    """
+    Extrae el texto y los enlaces del sitio de una página HTML.
+    Usa lxml, varias veces más rápido; si lxml no puede leer el documento se usa BeautifulSoup.
+
+    Returns:
+        Una tupla (texto, enlaces), con los enlaces normalizados y sin repetir, en el orden de la página.
+    """
+    try:
+        texto, hrefs = analizarConLxml(html)
+    except (ParserError, ValueError):
+        texto, hrefs = analizarConBeautifulSoup(html)
+    enlaces = {}
+    for href in hrefs:
+        url = normalizarEnlace(urlPagina, href, dominio)
+        if url:
+            enlaces[url] = None
+    return texto.strip(), list(enlaces)
+
+class CacheRastreo:
+    """
+    Caché en disco (SQLite) de las páginas rastreadas: ETag, Last-Modified, hash del contenido,
+    texto extraído y enlaces de cada URL.
+
+    El rastreo la usa desde hilos (asyncio.to_thread) para que una espera por el bloqueo de escritura
+    no detenga el ciclo de eventos. Cada página se guarda en su propia transacción (autocommit), así otro
+    rastreo que use el mismo archivo al mismo tiempo solo espera lo que tarda una escritura.
+    """
+    def __init__(self, ruta=RUTA_CACHE):
+        self.conexion = sqlite3.connect(ruta, isolation_level=None, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("""CREATE TABLE IF NOT EXISTS paginas (
+            url TEXT PRIMARY KEY, etag TEXT, modificado TEXT, hash TEXT, texto TEXT, enlaces TEXT, actualizado REAL)""")
+        # La conexión se comparte entre los hilos del rastreo, pero solo uno la usa a la vez
+        self.bloqueo = threading.Lock()
+
+    def obtener(self, url):
+        """
+        Devuelve la entrada guardada de la URL como diccionario, o None si no está en la caché.
+        """
+        with self.bloqueo:
+            fila = self.conexion.execute("SELECT etag, modificado, hash, texto, enlaces FROM paginas WHERE url = ?", [url]).fetchone()
+        if fila is None:
+            return None
+        etag, modificado, hashContenido, texto, enlaces = fila
+        return {"etag": etag, "modificado": modificado, "hash": hashContenido, "texto": texto, "enlaces": json.loads(enlaces)}
+
+    def guardar(self, url, etag, modificado, hashContenido, texto, enlaces):
+        with self.bloqueo:
+            self.conexion.execute("INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  [url, etag, modificado, hashContenido, texto, json.dumps(enlaces), time.time()])
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+async def descargarPagina(sesion, url, dominio, cache=None):
+    """
+    Descarga una página y extrae su texto y sus enlaces.
+    El análisis del HTML se hace en un hilo para que el ciclo de eventos siga atendiendo las descargas.
+
+    Si la URL está en la caché, la petición es condicional (If-None-Match / If-Modified-Since): con una
+    respuesta 304 el servidor no envía la página y se usan el texto y los enlaces guardados. Si el servidor
+    no usa validadores pero el contenido tiene el mismo hash, tampoco se vuelve a extraer el texto.
+    Un error de la caché (por ejemplo, el archivo bloqueado por otro rastreo) no cuenta como error de la
+    página: la página se descarga sin petición condicional o queda sin guardar.
+
+    Returns:
+        Una tupla (fila, enlaces). La fila tiene 'link', 'estado' (código HTTP o mensaje de error), 'cache'
+        ('nueva', 'modificada', 'sin cambios', 'sin guardar' si no se pudo guardar en la caché, o vacío si
+        la página no es HTML o tuvo error), 'text' y 'segundos'.
+        Las páginas con error no tienen texto ni enlaces.
+    """
+    inicio = time.perf_counter()
+    anterior = None
+    if cache is not None:
+        try:
+            anterior = await asyncio.to_thread(cache.obtener, url)
+        except sqlite3.Error:
+            pass
+    encabezados = {}
+    if anterior:
+        if anterior["etag"]:
+            encabezados["If-None-Match"] = anterior["etag"]
+        if anterior["modificado"]:
+            encabezados["If-Modified-Since"] = anterior["modificado"]
+    estadoCache = ""
+    try:
+        async with sesion.get(url, headers=encabezados) as respuesta:
+            estado = respuesta.status
+            texto, enlaces = "", []
+            if estado == 304 and anterior:
+                texto, enlaces, estadoCache = anterior["texto"], anterior["enlaces"], "sin cambios"
+            elif estado < 400 and "html" in respuesta.headers.get("Content-Type", "text/html"):
+                hashContenido = hashlib.sha256(await respuesta.read()).hexdigest()
+                if anterior and anterior["hash"] == hashContenido:
+                    texto, enlaces, estadoCache = anterior["texto"], anterior["enlaces"], "sin cambios"
+                else:
+                    html = await respuesta.text(errors="replace")
+                    texto, enlaces = await asyncio.to_thread(analizarHTML, html, str(respuesta.url), dominio)
+                    estadoCache = "modificada" if anterior else "nueva"
+                if cache is not None:
+                    try:
+                        await asyncio.to_thread(cache.guardar, url, respuesta.headers.get("ETag"),
+                                                respuesta.headers.get("Last-Modified"), hashContenido, texto, enlaces)
+                    except sqlite3.Error:
+                        estadoCache = "sin guardar"
+    except Exception as error:
+        # Errores de conexión, timeouts o URL inválidas: la página queda registrada con el error
+        estado, texto, enlaces = f"Error: {type(error).__name__} {error}".strip(), "", []
+    return {"link": url, "estado": str(estado), "cache": estadoCache, "text": texto,
+            "segundos": time.perf_counter() - inicio}, enlaces
+
+async def rastrear(urlInicial, nivelMaximo=2, maxPaginas=MAX_PAGINAS, concurrencia=CONCURRENCIA,
+                   conexionesPorHost=CONEXIONES_POR_HOST, timeout=TIMEOUT_SEGUNDOS, cache=None):
+    """
+    Rastrea un sitio en anchura a partir de una URL y entrega cada página a medida que se procesa.
+
+    Un grupo de tareas toma las URL de la frontera (una cola FIFO, así que los niveles se recorren en orden)
+    y las descarga con una sesión compartida. Un enlace entra a la frontera una sola vez (set de visitados),
+    solo si su nivel no supera nivelMaximo y mientras no se alcance maxPaginas.
+
+    Args:
+        urlInicial: URL de inicio. El rastreo se limita al mismo host.
+        nivelMaximo: Número máximo de saltos de enlace desde la URL de inicio.
+        maxPaginas: Número máximo de páginas que se descargan.
+        concurrencia: Número de descargas simultáneas.
+        conexionesPorHost: Número máximo de conexiones abiertas a un mismo host.
+        timeout: Tiempo máximo de cada descarga, en segundos.
+        cache: CacheRastreo opcional para hacer peticiones condicionales y reutilizar el texto de las páginas sin cambios.
+
+    Yields:
+        dict: Una fila por página con 'link', 'nivel', 'estado', 'cache', 'text' y 'segundos'.
+    """
+    urlInicial = urldefrag(urlInicial.strip())[0]
+    if not urlsplit(urlInicial).scheme:
+        urlInicial = "https://" + urlInicial
+    dominio = urlsplit(urlInicial).netloc
+    visitados = {urlInicial}
+    frontera = asyncio.Queue()
+    frontera.put_nowait((urlInicial, 0))
+    salida = asyncio.Queue()
+
+    conector = aiohttp.TCPConnector(limit=concurrencia, limit_per_host=conexionesPorHost)
+    async with aiohttp.ClientSession(connector=conector, headers={"User-Agent": USER_AGENT},
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as sesion:
+
+        async def trabajador():
+            while True:
+                url, nivel = await frontera.get()
+                try:
+                    fila, enlaces = await descargarPagina(sesion, url, dominio, cache)
+                    fila["nivel"] = nivel
+                    if nivel < nivelMaximo:
+                        for enlace in enlaces:
+                            if len(visitados) >= maxPaginas:
+                                break
+                            if enlace not in visitados:
+                                visitados.add(enlace)
+                                frontera.put_nowait((enlace, nivel + 1))
+                    await salida.put(fila)
+                finally:
+                    frontera.task_done()
+
+        async def terminar():
+            # Cuando la frontera queda vacía y todas las páginas se procesaron, se marca el fin de la salida
+            await frontera.join()
+            await salida.put(None)
+
+        tareas = [asyncio.create_task(trabajador()) for _ in range(concurrencia)]
+        tareas.append(asyncio.create_task(terminar()))
+        try:
+            while (fila := await salida.get()) is not None:
+                yield fila
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            await asyncio.gather(*tareas, return_exceptions=True)
@@ -1,12 +1,8 @@
 # Importa las librerías necesarias
 import streamlit as st  # Para la creación de la aplicación web
 import pandas as pd  # Para la manipulación y análisis de datos
-import numpy as np  # Para operaciones numéricas eficientes
-import spacy  # Para el procesamiento del lenguaje natural (NLP)
-from sklearn.feature_extraction.text import TfidfVectorizer  # Para convertir texto a vectores TF-IDF
-# Ejemplo de TF-IDF
-# https://remykarem.github.io/tfidf-demo/
-from sklearn.metrics.pairwise import cosine_similarity  # Para calcular la similitud del coseno entre vectores
+import os  # Para armar las rutas de los índices
+import indiceFormulas as ix  # Índice TF-IDF precalculado. Ejemplo de TF-IDF: https://remykarem.github.io/tfidf-demo/
 
 # Instala las librerías necesarias (si aún no lo has hecho)
 # pip install streamlit pandas numpy spacy scikit-learn
@@ -19,74 +15,32 @@ st.set_page_config(
     initial_sidebar_state="expanded"  # Barra lateral expandida por defecto
 )
 
-# Lista de componentes de procesamiento de lenguaje natural (NLP) de spaCy que no se utilizarán
-# Estos componentes se desactivan para mejorar el rendimiento, ya que no son necesarios para esta tarea.
-unwanted_pipes = ["ner", "parser"]
+# Carga el modelo de lenguaje español de spaCy solo cuando se necesita: para construir un índice que no existe
+# o para lematizar una consulta con palabras que no aparecen en el índice.
+@st.cache_resource(show_spinner="Cargando modelo de lenguaje...")  # El modelo se carga una sola vez por proceso
+def cargarModeloSpacy():
+    return ix.cargarSpacy()
 
-# Carga el modelo de lenguaje español de spaCy
-# Este modelo se utiliza para tokenizar el texto y obtener las raíces de las palabras (lemas).
-nlp = spacy.load("es_core_news_sm")
-
-# Función para tokenizar el texto utilizando spaCy
-def spacy_tokenizer(doc):
-    """
-    Tokeniza el texto utilizando spaCy y realiza un procesamiento básico:
-
-    1. Deshabilita los componentes de NLP no deseados (NER y análisis sintáctico).
-    2. Tokeniza el texto (lo divide en palabras y signos de puntuación).
-    3. Obtiene el lema (raíz de la palabra) de cada token.
-    4. Filtra los tokens para mantener solo palabras alfabéticas y eliminar signos de puntuación y espacios en blanco.
-
-    Args:
-        doc: El texto a tokenizar.
-
-    Returns:
-        Una lista de tokens (lemas) del texto.
-    """
-    with nlp.disable_pipes(*unwanted_pipes):
-        return [t.lemma_ for t in nlp(doc) if not t.is_punct and not t.is_space and t.is_alpha]
-
-# Función para generar las características TF-IDF del corpus
-@st.cache_resource  # Almacena en caché el resultado de la función para mejorar el rendimiento
-def generarFeatures(corpus):
+# Función para cargar el índice TF-IDF del corpus
+@st.cache_resource  # Almacena en caché el índice para no volver a abrirlo en cada ejecución
+def cargarIndiceFormulas(idioma, corpus):
     """
-    Genera las características TF-IDF del corpus:
-
-    1. Crea un objeto TfidfVectorizer, que se utiliza para convertir una colección de documentos de texto en una matriz de características TF-IDF.
-    2. Ajusta el vectorizador al corpus (aprende el vocabulario y los pesos IDF).
-    3. Transforma el corpus en una matriz TF-IDF, donde cada fila representa un documento y cada columna representa una palabra del vocabulario.
+    Carga el índice TF-IDF precalculado del idioma (construido con python indiceFormulas.py).
+    Si el índice no existe o no corresponde al corpus, se construye y se guarda en disco.
 
     Args:
+        idioma: Código del idioma del índice ('ES' o 'EN').
         corpus: Una lista de documentos de texto.
 
     Returns:
-        Una tupla que contiene:
-            - La matriz de características TF-IDF.
-            - El objeto vectorizador TF-IDF.
-    """
-    vectorizer = TfidfVectorizer(tokenizer=spacy_tokenizer)
-    features = vectorizer.fit_transform(corpus)
-    return features, vectorizer
-
-# Función para obtener los índices de los k elementos principales de una matriz
-def top_k(arr, k):
+        El índice, con la matriz de características TF-IDF en 'features'.
     """
-    Devuelve los índices de los k elementos principales de una matriz.
-
-    Args:
-        arr: La matriz.
-        k: El número de elementos principales a devolver.
-
-    Returns:
-        Una matriz NumPy que contiene los índices de los k elementos principales.
-    """
-    kth_largest = (k + 1) * -1
-    return np.argsort(arr)[:kth_largest:-1]
+    return ix.obtenerIndice(corpus, os.path.join(ix.CARPETA_INDICE, idioma), cargarModeloSpacy)
 
 # Carga los archivos CSV que contienen las fórmulas de Excel en español e inglés
 # Estos archivos deben estar en la misma carpeta que el script de Python.
-dfFormulasES = pd.read_csv('excelformulasES.csv')
-dfFormulasEN = pd.read_csv('excelformulasEN.csv')
+dfFormulasES = pd.read_csv(ix.ARCHIVOS_FORMULAS['ES'])
+dfFormulasEN = pd.read_csv(ix.ARCHIVOS_FORMULAS['EN'])
 
 # Título de la aplicación
 st.header('Búsqueda de fórmulas de Excel')
@@ -103,8 +57,8 @@ parIdioma = st.radio('Idioma / Language', options=['Español', 'English'], index
 
 # Inicializa las variables en función del idioma seleccionado
 if parIdioma == 'Español':
-    dfFormulasES['corpus'] = dfFormulasES['descripcion'] + ' ' + dfFormulasES['formula']
-    corpus = dfFormulasES['corpus'].values.astype('U')  # Convierte el texto a Unicode
+    corpus = ix.generarCorpus(dfFormulasES)  # Descripción y nombre de cada fórmula, en Unicode
+    idioma = 'ES'
     etiquetaBusqueda = 'Para qué busca la fórmula'
     etiquetaBoton = 'Buscar'
     etiquetaCantResult = 'Cantidad de resultados'
@@ -112,8 +66,8 @@ if parIdioma == 'Español':
     dfFormulas = dfFormulasES
     tabs=['Búsqueda semántica','Datos']
 else:
-    dfFormulasEN['corpus'] = dfFormulasEN['descripcion'] + ' ' + dfFormulasEN['formula']
-    corpus = dfFormulasEN['corpus'].values.astype('U')
+    corpus = ix.generarCorpus(dfFormulasEN)
+    idioma = 'EN'
     etiquetaBusqueda = 'What kind of formula are you looking for?'
     etiquetaCantResult = 'Number of results'
     etiquetaBoton = 'Search'
@@ -126,8 +80,9 @@ tabBuscar,tabDatos = st.tabs(tabs)
 
 # Contenido de la pestaña "Búsqueda semántica"
 with tabBuscar:
-    # Genera las características TF-IDF del corpus
-    features, vectorizer = generarFeatures(corpus)
+    # Carga el índice TF-IDF precalculado del corpus
+    indice = cargarIndiceFormulas(idioma, corpus)
+    features = indice['features']
         
     # Cuadro de texto para la búsqueda
     parTexto = st.text_input(etiquetaBusqueda)
@@ -140,16 +95,11 @@ with tabBuscar:
 
     # Cuando se presiona el botón de búsqueda
     if btnBuscar:
-        # Procesa la consulta
-        query = [parTexto]
-        query_tfidf = vectorizer.transform(query) # Vectorizamos la consulta
+        # Vectorizamos la consulta con el vocabulario y los pesos IDF del índice
+        query_tfidf = ix.vectorizarConsulta(indice, parTexto, cargarModeloSpacy)
 
-        # Calcula la similitud del coseno entre la consulta y todas las fórmulas
-        cosine_similarities = cosine_similarity(features, query_tfidf).flatten()        
-        
-        # Obtiene los índices de las fórmulas más similares
-        top_related_indices = top_k(cosine_similarities, parNumResult)
-        similarities = cosine_similarities[top_related_indices]        
+        # Obtiene los índices y la similitud del coseno de las fórmulas más similares
+        top_related_indices, similarities = ix.buscar(features, query_tfidf, parNumResult)[0]
         
         # Divide la página en tres columnas
         cols = st.columns(3)
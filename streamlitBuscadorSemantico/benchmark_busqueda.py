@@ -0,0 +1,62 @@
+# Benchmark de latencia de la búsqueda de fórmulas.
+# Compara el método anterior (cosine_similarity densa + np.argsort de todas las similitudes) contra
+# indiceFormulas.buscar (producto disperso + np.argpartition), con una consulta por llamada y en lotes,
+# sobre corpus sintéticos de 1.000, 100.000 y 1.000.000 de documentos.
+# Uso: python benchmark_busqueda.py [numConsultas]
+import sys
+import time
+import numpy as np
+from scipy import sparse
+from sklearn.metrics.pairwise import cosine_similarity
+import indiceFormulas as ix
+
+TAMANO_VOCABULARIO = 20_000
+TERMINOS_POR_DOCUMENTO = 12
+TERMINOS_POR_CONSULTA = 4
+TAMANO_LOTE_CONSULTAS = 64
+K = 10
+
+def matrizSintetica(filas, terminosPorFila, rng):
+    # Los términos siguen una distribución de Zipf, como en un texto real: unos pocos términos aparecen en muchos documentos
+    pesos = 1 / np.arange(1, TAMANO_VOCABULARIO + 1)
+    columnas = rng.choice(TAMANO_VOCABULARIO, size=filas * terminosPorFila, p=pesos / pesos.sum())
+    filasMatriz = np.repeat(np.arange(filas), terminosPorFila)
+    matriz = sparse.csr_matrix((rng.random(len(columnas)), (filasMatriz, columnas)), shape=(filas, TAMANO_VOCABULARIO))
+    matriz.sum_duplicates()
+    return ix.normalizarFilas(matriz)
+
+def top_k(arr, k):
+    # Método anterior de StreamlitExcelSemanticSearch.py
+    kth_largest = (k + 1) * -1
+    return np.argsort(arr)[:kth_largest:-1]
+
+def busquedaAnterior(features, consultas):
+    for i in range(consultas.shape[0]):
+        similitudes = cosine_similarity(features, consultas[i]).flatten()
+        top_k(similitudes, K)
+
+def busquedaIndividual(features, consultas):
+    for i in range(consultas.shape[0]):
+        ix.buscar(features, consultas[i], K)
+
+def busquedaLotes(features, consultas):
+    for inicio in range(0, consultas.shape[0], TAMANO_LOTE_CONSULTAS):
+        ix.buscar(features, consultas[inicio:inicio + TAMANO_LOTE_CONSULTAS], K)
+
+def medir(nombre, funcion, features, consultas):
+    inicio = time.perf_counter()
+    funcion(features, consultas)
+    duracion = time.perf_counter() - inicio
+    print(f"{features.shape[0]:>12,} documentos  {nombre:<22} {1000 * duracion / consultas.shape[0]:>10.3f} ms/consulta  {consultas.shape[0] / duracion:>10,.0f} consultas/s")
+
+if __name__ == "__main__":
+    numConsultas = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    rng = np.random.default_rng(42)
+    consultas = matrizSintetica(numConsultas, TERMINOS_POR_CONSULTA, rng)
+    for numDocumentos in [1_000, 100_000, 1_000_000]:
+        features = matrizSintetica(numDocumentos, TERMINOS_POR_DOCUMENTO, rng)
+        # El método anterior es O(n log n) por consulta: con corpus grandes se mide sobre menos consultas
+        consultasAnterior = consultas[:max(8, numConsultas * 1_000 // numDocumentos)]
+        medir("cosine_similarity+argsort", busquedaAnterior, features, consultasAnterior)
+        medir("buscar (1 consulta)", busquedaIndividual, features, consultas)
+        medir(f"buscar (lotes de {TAMANO_LOTE_CONSULTAS})", busquedaLotes, features, consultas)
@@ -0,0 +1,218 @@
+# Índice TF-IDF precalculado para la búsqueda de fórmulas de Excel.
+# Se construye una sola vez (lematizando con spaCy en lotes) y se guarda en disco, de modo que la aplicación
+# solo tiene que abrir los archivos con memory-mapping al iniciar, sin cargar spaCy ni volver a ajustar el TF-IDF.
+#
+# Para construir los índices de antemano:
+#   python indiceFormulas.py
+import hashlib
+import os
+import re
+from collections import Counter
+import joblib  # Para guardar el vocabulario y los pesos IDF. Se instala con scikit-learn
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Carpeta donde se guardan los índices, uno por idioma
+CARPETA_INDICE = "indice"
+# Archivos CSV con las fórmulas de cada idioma
+ARCHIVOS_FORMULAS = {"ES": "excelformulasES.csv", "EN": "excelformulasEN.csv"}
+# Modelo de lenguaje de spaCy usado para obtener los lemas
+MODELO_SPACY = "es_core_news_sm"
+# Componentes de spaCy que no se necesitan para lematizar y se desactivan para mejorar el rendimiento
+UNWANTED_PIPES = ["ner", "parser"]
+# Número de documentos que spaCy procesa por lote en nlp.pipe
+TAMANO_LOTE = 256
+# Palabras de la consulta: secuencias de letras (incluye tildes y ñ)
+PATRON_PALABRA = re.compile(r"[^\W\d_]+")
+
+def generarCorpus(dfFormulas):
+    """
+    Genera el corpus de búsqueda: descripción y nombre de cada fórmula.
+
+    Args:
+        dfFormulas: DataFrame con las columnas 'descripcion' y 'formula'.
+
+    Returns:
+        Un array NumPy con el texto de cada fórmula en Unicode.
+    """
+    return (dfFormulas['descripcion'] + ' ' + dfFormulas['formula']).values.astype('U')
+
+def hashCorpus(corpus):
+    """
+    Calcula un hash del corpus para saber si el índice guardado corresponde a los datos actuales.
+    """
+    return hashlib.sha256("\n".join(corpus).encode("utf-8")).hexdigest()
+
+def cargarSpacy():
+    """
+    Carga el modelo de spaCy sin los componentes que no se usan.
+    El import se hace aquí para que la aplicación no cargue spaCy si no lo necesita.
+    """
+    import spacy  # Para el procesamiento del lenguaje natural (NLP)
+    return spacy.load(MODELO_SPACY, disable=UNWANTED_PIPES)
+
+def lematizar(nlp, textos):
+    """
+    Lematiza los textos en lotes con nlp.pipe, en lugar de llamar a nlp() documento por documento.
+
+    Igual que TfidfVectorizer, el texto se pasa a minúsculas antes de tokenizar, y solo se conservan
+    los tokens alfabéticos (sin signos de puntuación ni espacios).
+
+    Args:
+        nlp: Modelo de spaCy.
+        textos: Lista de textos.
+
+    Returns:
+        Una tupla que contiene:
+            - Una lista con la lista de lemas de cada texto.
+            - Un diccionario {palabra: lema} con todas las palabras vistas.
+    """
+    documentos = []
+    formas = {}
+    for doc in nlp.pipe((texto.lower() for texto in textos), batch_size=TAMANO_LOTE):
+        lemas = []
+        for t in doc:
+            if not t.is_punct and not t.is_space and t.is_alpha:
+                lemas.append(t.lemma_)
+                formas.setdefault(t.text, t.lemma_)
+        documentos.append(lemas)
+    return documentos, formas
+
+def normalizarFilas(matriz):
+    """
+    Divide cada fila de la matriz dispersa por su norma L2. Las filas vacías quedan en cero.
+    """
+    matriz = sparse.csr_matrix(matriz, dtype=float)
+    normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+    normas[normas == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / normas) @ matriz)
+
+def construirIndice(corpus, nlp, carpeta):
+    """
+    Lematiza el corpus, ajusta el TF-IDF y guarda el índice en la carpeta indicada.
+
+    La matriz dispersa se guarda como tres arrays .npy (data, indices, indptr) para poder abrirla con
+    memory-mapping, y el vocabulario, los pesos IDF y el diccionario de palabras con joblib.
+
+    Args:
+        corpus: Lista de documentos de texto.
+        nlp: Modelo de spaCy.
+        carpeta: Carpeta donde se guarda el índice.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer  # Solo se necesita al construir el índice
+
+    documentos, formas = lematizar(nlp, corpus)
+    # Los documentos ya vienen tokenizados y lematizados, así que el analizador solo devuelve la lista de lemas
+    vectorizer = TfidfVectorizer(analyzer=lambda lemas: lemas)
+    # Las filas se guardan con norma L2 = 1, así la búsqueda solo tiene que multiplicar (ver buscar)
+    features = normalizarFilas(vectorizer.fit_transform(documentos).tocsr())
+
+    os.makedirs(carpeta, exist_ok=True)
+    np.save(os.path.join(carpeta, "data.npy"), features.data)
+    np.save(os.path.join(carpeta, "indices.npy"), features.indices)
+    np.save(os.path.join(carpeta, "indptr.npy"), features.indptr)
+    joblib.dump({
+        "shape": features.shape,
+        "vocabulario": {lema: int(columna) for lema, columna in vectorizer.vocabulary_.items()},
+        "idf": vectorizer.idf_,
+        "formas": formas,
+        "hash": hashCorpus(corpus),
+    }, os.path.join(carpeta, "metadatos.joblib"))
+
+def cargarIndice(carpeta):
+    """
+    Abre un índice guardado. Los arrays de la matriz se abren con memory-mapping (mmap_mode='r'),
+    así que no se leen completos al iniciar: el sistema operativo carga las páginas a medida que se usan.
+
+    Returns:
+        Un diccionario con la matriz 'features' y los metadatos del índice ('vocabulario', 'idf', 'formas', 'hash').
+    """
+    indice = joblib.load(os.path.join(carpeta, "metadatos.joblib"))
+    data, indices, indptr = (np.load(os.path.join(carpeta, f"{nombre}.npy"), mmap_mode="r") for nombre in ["data", "indices", "indptr"])
+    indice["features"] = sparse.csr_matrix((data, indices, indptr), shape=indice["shape"], copy=False)
+    return indice
+
+def obtenerIndice(corpus, carpeta, obtenerNlp):
+    """
+    Carga el índice de la carpeta si corresponde al corpus actual; si no existe o el corpus cambió, lo construye y lo guarda.
+
+    Args:
+        corpus: Lista de documentos de texto.
+        carpeta: Carpeta del índice.
+        obtenerNlp: Función sin argumentos que devuelve el modelo de spaCy. Solo se llama si hay que construir el índice.
+    """
+    if os.path.exists(os.path.join(carpeta, "metadatos.joblib")):
+        indice = cargarIndice(carpeta)
+        if indice["hash"] == hashCorpus(corpus):
+            return indice
+    construirIndice(corpus, obtenerNlp(), carpeta)
+    return cargarIndice(carpeta)
+
+def vectorizarConsulta(indice, texto, obtenerNlp):
+    """
+    Convierte la consulta en un vector TF-IDF con el vocabulario y los pesos IDF del índice
+    (mismo resultado que vectorizer.transform, con normalización L2).
+
+    Si todas las palabras de la consulta ya aparecieron en el corpus, sus lemas se toman del diccionario
+    del índice y no se necesita spaCy. Solo si hay palabras nuevas se lematiza la consulta con spaCy.
+
+    Args:
+        indice: Índice cargado con cargarIndice.
+        texto: Texto de la consulta.
+        obtenerNlp: Función sin argumentos que devuelve el modelo de spaCy.
+
+    Returns:
+        Una matriz dispersa de 1 x tamaño del vocabulario.
+    """
+    palabras = PATRON_PALABRA.findall(texto.lower())
+    if all(palabra in indice["formas"] for palabra in palabras):
+        lemas = [indice["formas"][palabra] for palabra in palabras]
+    else:
+        lemas = lematizar(obtenerNlp(), [texto])[0][0]
+    conteo = Counter(indice["vocabulario"][lema] for lema in lemas if lema in indice["vocabulario"])
+    columnas = np.array(sorted(conteo), dtype=np.int32)
+    valores = np.array([conteo[columna] for columna in columnas], dtype=float) * indice["idf"][columnas]
+    norma = np.linalg.norm(valores)
+    if norma > 0:
+        valores = valores / norma
+    return sparse.csr_matrix((valores, columnas, [0, len(columnas)]), shape=(1, indice["shape"][1]))
+
+def buscar(features, consultas, k):
+    """
+    Busca los k documentos más similares a cada consulta.
+
+    Como las filas de features ya tienen norma L2 = 1, la similitud del coseno es solo el producto
+    features @ consultas.T, que en matrices dispersas únicamente toca los documentos que comparten algún
+    término con la consulta. De esos candidatos se eligen los k mayores con np.argpartition (O(n)) y
+    solo esos k se ordenan, en lugar de ordenar todas las similitudes con np.argsort (O(n log n)).
+
+    Args:
+        features: Matriz dispersa CSR de documentos x vocabulario, con filas normalizadas (normalizarFilas).
+        consultas: Matriz dispersa de consultas x vocabulario. Se pueden buscar varias consultas en una sola llamada.
+        k: Número de resultados por consulta.
+
+    Returns:
+        Una lista con una tupla (índices, similitudes) por consulta, ordenadas de mayor a menor similitud.
+        Los documentos con similitud 0 no se incluyen, así que puede haber menos de k resultados.
+    """
+    consultas = normalizarFilas(consultas)
+    # Documentos x consultas. En formato CSC cada columna tiene los candidatos de una consulta
+    similitudes = (features @ consultas.T).tocsc()
+    resultados = []
+    for j in range(consultas.shape[0]):
+        inicio, fin = similitudes.indptr[j], similitudes.indptr[j + 1]
+        documentos, valores = similitudes.indices[inicio:fin], similitudes.data[inicio:fin]
+        if len(valores) > k:
+            seleccion = np.argpartition(valores, -k)[-k:]
+            documentos, valores = documentos[seleccion], valores[seleccion]
+        orden = np.argsort(-valores, kind="stable")
+        resultados.append((documentos[orden], valores[orden]))
+    return resultados
+
+if __name__ == "__main__":
+    nlp = cargarSpacy()
+    for idioma, archivo in ARCHIVOS_FORMULAS.items():
+        corpus = generarCorpus(pd.read_csv(archivo))
+        construirIndice(corpus, nlp, os.path.join(CARPETA_INDICE, idioma))
+        print(f"Índice {idioma}: {len(corpus)} fórmulas guardadas en {os.path.join(CARPETA_INDICE, idioma)}")
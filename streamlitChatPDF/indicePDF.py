@@ -0,0 +1,255 @@
+# Índice vectorial FAISS incremental para los PDF del chat.
+# Cada trozo de texto se identifica por el hash de su contenido, de modo que al actualizar un PDF
+# solo se calculan las incrustaciones de los trozos nuevos y se eliminan los que ya no están.
+#
+# En modo biblioteca cada PDF de una carpeta tiene su propio índice (fragmento), con el mismo formato
+# en disco que el índice de un solo documento. Los fragmentos se abren en solo lectura con memory-mapping
+# y la búsqueda combina los k mejores resultados de todos ellos.
+import glob
+import hashlib
+import heapq
+import json
+import os
+import pickle
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import faiss
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.document_loaders import PyPDFLoader  # Para cargar documentos PDF
+from langchain.text_splitter import CharacterTextSplitter  # Para dividir el texto en trozos
+from langchain_community.vectorstores import FAISS  # Para crear y buscar en una base de datos vectorial
+
+# Modelo de Hugging Face usado para generar las incrustaciones
+MODELO_EMBEDDINGS = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# Configuración del divisor de texto
+TAMANO_TROZO = 1000
+SOLAPAMIENTO_TROZO = 30
+# Número de trozos por lote al calcular las incrustaciones
+TAMANO_LOTE_EMBEDDINGS = 64
+# Archivo del índice que guarda el hash del PDF con el que se generó
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+# Número de trozos que se recuperan por consulta (el mismo valor por defecto de LangChain)
+K_RESULTADOS = 4
+# Lectura de los fragmentos en modo biblioteca: los vectores se mapean en memoria en lugar de copiarse
+FLAGS_SOLO_LECTURA = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+# Carpeta raíz de las bibliotecas: en modo biblioteca solo se pueden abrir carpetas dentro de ella.
+# Se configura con la variable de entorno CHATPDF_CARPETA_BIBLIOTECA; por defecto es la carpeta de la aplicación
+CARPETA_BIBLIOTECA = os.environ.get("CHATPDF_CARPETA_BIBLIOTECA", os.path.dirname(os.path.abspath(__file__)))
+
+def hashContenido(texto):
+    """
+    Hash del contenido de un trozo de texto. Se usa como id del trozo en el índice FAISS.
+    """
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+def hashArchivo(ruta, tamanoBloque=1 << 20):
+    """
+    Hash del contenido de un archivo, leído por bloques para no cargarlo completo en memoria.
+    """
+    h = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(tamanoBloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def cargarEmbeddings():
+    """
+    Crea el modelo de incrustaciones de Hugging Face. Es costoso, así que la aplicación lo guarda en caché.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings  # Para generar incrustaciones de texto usando modelos de Hugging Face
+    return HuggingFaceEmbeddings(model_name=MODELO_EMBEDDINGS)
+
+def dividirPDF(archivoPDF):
+    """
+    Carga el PDF y lo divide en trozos.
+
+    Returns:
+        Un diccionario {hash del contenido: documento}. Si un trozo se repite (por ejemplo encabezados
+        idénticos) se conserva solo la primera aparición, ya que recuperar el mismo texto dos veces no aporta contexto.
+    """
+    documents = PyPDFLoader(file_path=archivoPDF).load()  # Carga y lee el PDF
+    text_splitter = CharacterTextSplitter(chunk_size=TAMANO_TROZO, chunk_overlap=SOLAPAMIENTO_TROZO, separator="\n")
+    trozos = {}
+    for doc in text_splitter.split_documents(documents=documents):
+        trozos.setdefault(hashContenido(doc.page_content), doc)
+    return trozos
+
+def embeberEnLotes(embeddings, textos, tamanoLote=TAMANO_LOTE_EMBEDDINGS, numHilos=None):
+    """
+    Calcula las incrustaciones de los textos en lotes repartidos entre varios hilos.
+    El modelo libera el GIL durante el cálculo, así que los lotes se procesan en paralelo en la CPU.
+
+    Args:
+        embeddings: Modelo de incrustaciones de LangChain.
+        textos: Lista de textos.
+        tamanoLote: Número de textos por lote.
+        numHilos: Número de hilos. Por defecto, el número de núcleos.
+
+    Returns:
+        Una lista con la incrustación de cada texto, en el mismo orden.
+    """
+    lotes = [textos[i:i + tamanoLote] for i in range(0, len(textos), tamanoLote)]
+    with ThreadPoolExecutor(max_workers=numHilos or os.cpu_count()) as ejecutor:
+        # map devuelve los lotes en orden, así que las incrustaciones quedan alineadas con los textos
+        return [vector for lote in ejecutor.map(embeddings.embed_documents, lotes) for vector in lote]
+
+def leerManifiesto(rutaIndice):
+    ruta = os.path.join(rutaIndice, ARCHIVO_MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+def guardarManifiesto(rutaIndice, manifiesto):
+    with open(os.path.join(rutaIndice, ARCHIVO_MANIFIESTO), "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo)
+
+def rutaIndicePDF(archivoPDF):
+    """
+    Carpeta del índice de un PDF: la ruta del archivo sin la extensión .pdf.
+    """
+    return archivoPDF.replace(".pdf", "")
+
+def indiceVigente(rutaIndice, hashPDF):
+    """
+    Indica si el índice existe y se generó con el contenido actual del PDF.
+    """
+    return os.path.exists(os.path.join(rutaIndice, "index.faiss")) and leerManifiesto(rutaIndice).get("hashArchivo") == hashPDF
+
+def guardarIndice(vectorstore, rutaIndice, manifiesto):
+    """
+    Guarda el índice en una carpeta temporal y reemplaza los archivos con os.replace. Así, los procesos
+    que tienen el índice anterior abierto con memory-mapping siguen leyendo el archivo viejo sin errores.
+    """
+    rutaTemporal = f"{rutaIndice}.tmp"
+    vectorstore.save_local(rutaTemporal)
+    guardarManifiesto(rutaTemporal, manifiesto)
+    os.makedirs(rutaIndice, exist_ok=True)
+    for nombre in os.listdir(rutaTemporal):
+        os.replace(os.path.join(rutaTemporal, nombre), os.path.join(rutaIndice, nombre))
+    shutil.rmtree(rutaTemporal)
+
+def actualizarIndice(archivoPDF, rutaIndice, embeddings, numHilos=None, trozos=None):
+    """
+    Carga el índice FAISS del PDF y lo sincroniza con el contenido actual del archivo.
+
+    Si el hash del PDF coincide con el del manifiesto, el índice se usa tal cual. Si el PDF cambió
+    (o el índice no existe), se divide en trozos y se comparan sus hashes con los ids del índice:
+    solo se calculan las incrustaciones de los trozos nuevos y se eliminan los que ya no están.
+    Los índices creados antes de usar hashes como id se migran en la primera actualización.
+
+    Args:
+        archivoPDF: Ruta del PDF.
+        rutaIndice: Carpeta del índice FAISS.
+        embeddings: Modelo de incrustaciones de LangChain.
+        numHilos: Número de hilos para calcular las incrustaciones.
+        trozos: Trozos del PDF ya calculados con dividirPDF. Si no se indican, se divide el PDF.
+
+    Returns:
+        Una tupla que contiene:
+            - El vectorstore FAISS actualizado.
+            - Un diccionario con el número de trozos 'agregados', 'eliminados' y 'sinCambios'.
+    """
+    hashPDF = hashArchivo(archivoPDF)
+    vectorstore = None
+    if os.path.exists(os.path.join(rutaIndice, "index.faiss")):
+        vectorstore = FAISS.load_local(rutaIndice, embeddings, allow_dangerous_deserialization=True)
+        if indiceVigente(rutaIndice, hashPDF):
+            return vectorstore, {"agregados": 0, "eliminados": 0, "sinCambios": vectorstore.index.ntotal}
+
+    if trozos is None:
+        trozos = dividirPDF(archivoPDF)
+    existentes = set(vectorstore.index_to_docstore_id.values()) if vectorstore else set()
+    eliminados = [id for id in existentes if id not in trozos]
+    nuevos = [id for id in trozos if id not in existentes]
+    if vectorstore is None and not nuevos:
+        raise ValueError(f"No se encontró texto en el archivo {archivoPDF}")
+
+    if eliminados:
+        vectorstore.delete(eliminados)
+    if nuevos:
+        textos = [trozos[id].page_content for id in nuevos]
+        pares = list(zip(textos, embeberEnLotes(embeddings, textos, numHilos=numHilos)))
+        metadatos = [trozos[id].metadata for id in nuevos]
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(pares, embeddings, metadatas=metadatos, ids=nuevos)
+        else:
+            vectorstore.add_embeddings(pares, metadatas=metadatos, ids=nuevos)
+
+    guardarIndice(vectorstore, rutaIndice, {"hashArchivo": hashPDF, "modelo": MODELO_EMBEDDINGS})  # Guarda el índice localmente
+    return vectorstore, {"agregados": len(nuevos), "eliminados": len(eliminados), "sinCambios": len(trozos) - len(nuevos)}
+
+def cargarFragmento(rutaIndice, embeddings):
+    """
+    Abre un índice guardado con save_local (index.faiss + index.pkl) en solo lectura.
+    Los vectores se mapean en memoria, así que abrir muchos fragmentos no copia todos los vectores a la RAM.
+    """
+    index = faiss.read_index(os.path.join(rutaIndice, "index.faiss"), FLAGS_SOLO_LECTURA)
+    with open(os.path.join(rutaIndice, "index.pkl"), "rb") as archivo:
+        docstore, index_to_docstore_id = pickle.load(archivo)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+def resolverCarpeta(subcarpeta, raiz=CARPETA_BIBLIOTECA):
+    """
+    Convierte la subcarpeta indicada por el usuario en una ruta dentro de la carpeta raíz de las bibliotecas.
+
+    Returns:
+        La ruta real de la carpeta, o None si no existe o queda fuera de la raíz
+        (rutas absolutas, '..' o enlaces simbólicos que salen de ella).
+    """
+    raiz = os.path.realpath(raiz)
+    ruta = os.path.realpath(os.path.join(raiz, subcarpeta))
+    if os.path.commonpath([raiz, ruta]) != raiz or not os.path.isdir(ruta):
+        return None
+    return ruta
+
+def ingresarBiblioteca(carpeta, embeddings, numProcesos=None, numHilos=None):
+    """
+    Sincroniza los índices de todos los PDF de una carpeta y los abre como fragmentos de solo lectura.
+
+    Los PDF nuevos o modificados se cargan y dividen en un pool de procesos (la lectura del PDF usa la CPU
+    y no libera el GIL). Luego las incrustaciones de los trozos nuevos se calculan en lotes y cada PDF
+    actualiza su propio índice. Los PDF sin cambios no se vuelven a leer.
+
+    Args:
+        carpeta: Carpeta con los archivos PDF.
+        embeddings: Modelo de incrustaciones de LangChain.
+        numProcesos: Número de procesos para dividir los PDF. Por defecto, el número de núcleos.
+        numHilos: Número de hilos para calcular las incrustaciones.
+
+    Returns:
+        Una tupla que contiene:
+            - Una lista con el vectorstore de cada PDF.
+            - Un diccionario {archivo: cambios} con los trozos agregados y eliminados de cada PDF actualizado.
+    """
+    archivos = sorted(glob.glob(os.path.join(carpeta, "*.pdf")))
+    pendientes = [archivo for archivo in archivos if not indiceVigente(rutaIndicePDF(archivo), hashArchivo(archivo))]
+    cambios = {}
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=numProcesos) as ejecutor:
+            for archivo, trozos in zip(pendientes, ejecutor.map(dividirPDF, pendientes)):
+                if trozos:
+                    _, cambios[archivo] = actualizarIndice(archivo, rutaIndicePDF(archivo), embeddings, numHilos, trozos)
+    fragmentos = [cargarFragmento(rutaIndicePDF(archivo), embeddings) for archivo in archivos
+                  if os.path.exists(os.path.join(rutaIndicePDF(archivo), "index.faiss"))]
+    return fragmentos, cambios
+
+class RetrieverFragmentos(BaseRetriever):
+    """
+    Retriever de LangChain que busca en todos los fragmentos de la biblioteca.
+    La consulta se convierte en vector una sola vez, cada fragmento devuelve sus k mejores trozos
+    (en paralelo: FAISS libera el GIL) y se combinan los k de menor distancia.
+    """
+    fragmentos: list
+    embeddings: Embeddings
+    k: int = K_RESULTADOS
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun):
+        vector = self.embeddings.embed_query(query)
+        with ThreadPoolExecutor() as ejecutor:
+            resultados = ejecutor.map(lambda fragmento: fragmento.similarity_search_with_score_by_vector(vector, k=self.k), self.fragmentos)
+            # Distancia L2: los mejores resultados son los de menor puntaje
+            mejores = heapq.nsmallest(self.k, (par for lista in resultados for par in lista), key=lambda par: par[1])
+        return [documento for documento, _ in mejores]
@@ -2,11 +2,8 @@
 # https://www.editorial-sciela.org/index.php/sciela/article/view/16
 # Importa las bibliotecas necesarias
 import streamlit as st  # Para crear la interfaz web
-from langchain.document_loaders import PyPDFLoader # Para cargar documentos PDF
-from langchain.text_splitter import CharacterTextSplitter # Para dividir el texto en trozos
-from langchain_huggingface import HuggingFaceEmbeddings # Para generar incrustaciones de texto usando modelos de Hugging Face
-# FAISS (Facebook AI Similarity Search) 
-from langchain_community.vectorstores import FAISS # Para crear y buscar en una base de datos vectorial
+# Índice FAISS (Facebook AI Similarity Search) incremental por hash de contenido de cada trozo
+import indicePDF as ip
 from langchain_core.vectorstores import VectorStoreRetriever # Para recuperar información de la base de datos vectorial
 from langchain.chains import create_retrieval_chain # Para crear una cadena de recuperación
 from langchain.chains.combine_documents import create_stuff_documents_chain # Para combinar documentos en una sola respuesta
@@ -39,33 +36,59 @@ llm = ChatGoogleGenerativeAI(
     api_key=GOOGLE_API_KEY # La clave API
 )
 
+# Carga el modelo de incrustaciones una sola vez por proceso, en lugar de crearlo en cada ejecución
+@st.cache_resource(show_spinner="Cargando modelo de incrustaciones...")
+def cargarEmbeddings():
+    return ip.cargarEmbeddings()
+
+# Carga y sincroniza el índice del PDF. Se guarda en caché por archivo y hash del contenido,
+# así que solo se vuelve a revisar el índice cuando el PDF cambia
+@st.cache_resource(show_spinner=False)
+def cargarBDVectorial(archivoPDF, hashPDF):
+    # Crea la ruta para el índice FAISS
+    rutaIndice=ip.rutaIndicePDF(archivoPDF)
+    return ip.actualizarIndice(archivoPDF, rutaIndice, cargarEmbeddings())
+
+# Sincroniza y abre los fragmentos de todos los PDF de la carpeta. La firma (archivo, fecha de modificación
+# y tamaño de cada PDF) evita leer todos los archivos en cada ejecución para saber si algo cambió
+@st.cache_resource(show_spinner=False)
+def cargarBiblioteca(carpeta, firma):
+    return ip.ingresarBiblioteca(carpeta, cargarEmbeddings())
+
 # Define una función para generar una base de datos vectorial
 def generarBDVectorial(archivoPDF):
-    # Crea la ruta para el índice FAISS
-    rutaIndice=archivoPDF.replace(".pdf","")
-    # Inicializa las incrustaciones de Hugging Face
-    embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2" # Especifica el modelo de incrustaciones a usar
-            )
     with st.spinner("Generando índices..."):
-        # Carga el índice FAISS si existe
-        if os.path.exists(rutaIndice):
-            vectorstore =  FAISS.load_local(rutaIndice, embeddings, allow_dangerous_deserialization=True)
-        # Si no existe, crea uno nuevo
-        else:        
-            loader = PyPDFLoader(file_path=archivoPDF) # Carga el PDF
-            documents = loader.load() # Lee el documento
-            text_splitter = CharacterTextSplitter(
-                chunk_size=1000, chunk_overlap=30, separator="\n" # Configura el divisor de texto
-            )
-            docs = text_splitter.split_documents(documents=documents) # Divide el documento en trozos
-            
-            vectorstore = FAISS.from_documents(docs, embeddings) # Crea el índice FAISS
-            vectorstore.save_local(rutaIndice) # Guarda el índice localmente
+        hashPDF = ip.hashArchivo(archivoPDF)
+        try:
+            vectorstore, cambios = cargarBDVectorial(archivoPDF, hashPDF)
+        except ValueError as e:
+            st.error(e)
+            st.stop()
+    # Informa una sola vez los trozos que se agregaron o eliminaron al actualizar el índice
+    if (cambios["agregados"] or cambios["eliminados"]) and st.session_state.get("hashIndice") != hashPDF:
+        st.session_state.hashIndice = hashPDF
+        st.toast(f"Índice actualizado: {cambios['agregados']} trozos nuevos, {cambios['eliminados']} eliminados, {cambios['sinCambios']} sin cambios")
     retriever = VectorStoreRetriever(vectorstore=vectorstore) # Crea un objeto retriever para acceder al índice
 
     return retriever # Devuelve el retriever
 
+# Define una función para generar el retriever de una carpeta de PDFs
+def generarBiblioteca(carpeta):
+    archivosCarpeta = sorted(glob.glob(os.path.join(carpeta, "*.pdf")))
+    if not archivosCarpeta:
+        st.warning(f"No se encontraron archivos PDF en la carpeta **{carpeta}**")
+        st.stop()
+    firma = tuple((archivo, os.path.getmtime(archivo), os.path.getsize(archivo)) for archivo in archivosCarpeta)
+    with st.spinner("Generando índices de la biblioteca..."):
+        fragmentos, cambios = cargarBiblioteca(carpeta, firma)
+    # Informa una sola vez los PDF cuyos índices se actualizaron
+    if cambios and st.session_state.get("firmaBiblioteca") != firma:
+        st.session_state.firmaBiblioteca = firma
+        st.toast(f"Índices actualizados: {', '.join(os.path.basename(archivo) for archivo in cambios)}")
+    st.sidebar.caption(f"{len(fragmentos)} documentos en la biblioteca")
+    # Retriever que busca en todos los fragmentos y combina los mejores resultados
+    return ip.RetrieverFragmentos(fragmentos=fragmentos, embeddings=cargarEmbeddings())
+
 # Define una función para generar una consulta
 def generarConsulta(query,llm,retriever):
     # Define el prompt del sistema
@@ -103,18 +126,31 @@ with st.container():
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
-# Obtiene la lista de archivos PDF
-archivos =glob.glob("*.pdf")
-# Muestra un selector de archivos en la barra lateral
-parArchivo = st.sidebar.selectbox('Archivo',options=archivos,index=0)
-# Reinicia la aplicación si se selecciona un archivo diferente
-if st.session_state.archivo!=parArchivo:
-    st.session_state.archivo=parArchivo
+# Modo de consulta: un solo PDF o todos los PDF de una carpeta
+parModo = st.sidebar.radio('Modo',options=['Documento','Biblioteca'],horizontal=True)
+if parModo=='Documento':
+    # Obtiene la lista de archivos PDF
+    archivos =glob.glob("*.pdf")
+    # Muestra un selector de archivos en la barra lateral
+    parArchivo = st.sidebar.selectbox('Archivo',options=archivos,index=0)
+else:
+    # Carpeta con los PDF de la biblioteca, relativa a la carpeta raíz de las bibliotecas (ip.CARPETA_BIBLIOTECA)
+    parArchivo = st.sidebar.text_input('Subcarpeta',value='.')
+# Reinicia la aplicación si se selecciona un archivo o carpeta diferente
+if st.session_state.archivo!=f"{parModo}:{parArchivo}":
+    st.session_state.archivo=f"{parModo}:{parArchivo}"
     st.session_state.messages = []
     st.rerun()
     
 # Genera la base de datos vectorial
-retriever = generarBDVectorial(parArchivo)
+if parModo=='Documento':
+    retriever = generarBDVectorial(parArchivo)
+else:
+    carpetaBiblioteca = ip.resolverCarpeta(parArchivo)
+    if carpetaBiblioteca is None:
+        st.error(f"La carpeta {parArchivo} no existe o está fuera de la carpeta de bibliotecas del servidor")
+        st.stop()
+    retriever = generarBiblioteca(carpetaBiblioteca)
 # Muestra la entrada de chat
 prompt=st.chat_input("Qué quieres saber?")
 
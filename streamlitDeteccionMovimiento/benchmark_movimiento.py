@@ -0,0 +1,61 @@
+# Benchmark del análisis de movimiento en paralelo por tramos.
+# Genera un video sintético (fondo con ruido y un objeto con textura que se mueve en intervalos conocidos),
+# lo analiza en forma secuencial y con 1, 2, 4... procesos, y muestra el tiempo, la aceleración
+# y los intervalos detectados frente a los reales.
+# Uso: python benchmark_movimiento.py [minutos de video]
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+import motorMovimiento as mm
+
+ANCHO, ALTO, FPS = 640, 360, 30
+# Intervalos con movimiento (segundos de inicio y fin) dentro de cada minuto del video
+MOVIMIENTO_POR_MINUTO = [(5, 12), (30, 33), (47, 55)]
+
+def generarVideo(ruta, minutos, semilla=42):
+    rng = np.random.default_rng(semilla)
+    fondo = cv2.GaussianBlur(rng.integers(0, 255, (ALTO, ANCHO, 3), dtype=np.uint8), (21, 21), 0)
+    # Objeto con textura (como una persona o un vehículo), para que todo su interior cambie al moverse
+    objeto = rng.integers(0, 255, (120, 80, 3), dtype=np.uint8)
+    out = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (ANCHO, ALTO))
+    intervalos = [(m * 60 + inicio, m * 60 + fin) for m in range(minutos) for inicio, fin in MOVIMIENTO_POR_MINUTO]
+    for i in range(int(minutos * 60 * FPS)):
+        segundo = i / FPS
+        # Ruido leve del sensor en cada fotograma
+        frame = cv2.add(fondo, rng.integers(0, 6, (ALTO, ANCHO, 3), dtype=np.uint8))
+        for inicio, fin in intervalos:
+            if inicio <= segundo < fin:
+                x = int((segundo - inicio) / (fin - inicio) * (ANCHO - 80))
+                frame[ALTO // 3:ALTO // 3 + 120, x:x + 80] = objeto
+        out.write(frame)
+    out.release()
+    return intervalos
+
+def medir(nombre, funcion):
+    inicio = time.perf_counter()
+    dfPuntajes, _ = funcion()
+    return nombre, time.perf_counter() - inicio, mm.intervalosMovimiento(dfPuntajes)
+
+if __name__ == "__main__":
+    minutos = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    ruta = os.path.join(tempfile.gettempdir(), "benchmark_movimiento.mp4")
+    print(f"Generando video sintético de {minutos} minutos ({ANCHO}x{ALTO}, {FPS} fps)...")
+    intervalosReales = generarVideo(ruta, minutos)
+    duracion = minutos * 60
+
+    resultados = [medir("secuencial", lambda: mm.analizarVideo(ruta))]
+    numProcesos = 1
+    while numProcesos <= os.cpu_count():
+        resultados.append(medir(f"{numProcesos} procesos", lambda: mm.analizarVideoParalelo(ruta, numProcesos=numProcesos)))
+        numProcesos *= 2
+
+    base = resultados[0][1]
+    print(f"{'modo':<14} {'segundos':>9} {'x tiempo real':>14} {'aceleración':>12} {'intervalos':>11}")
+    for nombre, segundos, intervalos in resultados:
+        print(f"{nombre:<14} {segundos:>9.2f} {duracion / segundos:>14.1f} {base / segundos:>11.2f}x {len(intervalos):>5}/{len(intervalosReales)}")
+    print("Intervalos detectados (en paralelo):", [(round(a, 1), round(b, 1)) for a, b in resultados[-1][2][["inicio", "fin"]].to_numpy()])
+    print("Intervalos reales:                 ", intervalosReales)
+    os.remove(ruta)
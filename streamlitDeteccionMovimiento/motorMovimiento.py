@@ -0,0 +1,241 @@
+# Motor de análisis de movimiento para videos largos (por ejemplo, de cámaras de vigilancia).
+# En lugar de comparar cada par de fotogramas en resolución completa, el motor:
+#   - decodifica solo uno de cada N fotogramas (los demás se saltan con grab(), sin convertirlos),
+#   - trabaja sobre una versión reducida en escala de grises,
+#   - compara contra un modelo de fondo (MOG2 o promedio móvil),
+#   - calcula un puntaje por fotograma (proporción de píxeles en movimiento) sin buscar contornos,
+#   - solo extrae los contornos cuando empieza un evento de movimiento,
+#   - y devuelve intervalos de movimiento en lugar de una lista de segundos.
+# Los videos largos también se pueden dividir en tramos que se analizan en paralelo en varios procesos.
+import os
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+import pandas as pd
+
+# Métodos de modelado del fondo disponibles
+METODOS_FONDO = ["MOG2", "Promedio móvil"]
+# Ancho en píxeles de los fotogramas analizados
+ANCHO_ANALISIS = 320
+# Analizar uno de cada PASO fotogramas
+PASO = 2
+# Proporción mínima de píxeles en movimiento para considerar que hay movimiento en el fotograma
+UMBRAL_PUNTAJE = 0.005
+# Diferencia de intensidad (0-255) a partir de la cual un píxel se considera en movimiento (promedio móvil)
+UMBRAL_PIXEL = 25
+# Velocidad de adaptación del fondo en el promedio móvil (0-1)
+ALFA_PROMEDIO = 0.05
+# Número de fotogramas analizados que usa MOG2 para construir su modelo de fondo
+HISTORIA_MOG2 = 200
+# Pausas de movimiento más cortas que esto (segundos) se unen en un solo intervalo
+PAUSA_MAXIMA = 1.0
+# Segundos de video antes de cada tramo que se usan solo para aprender el fondo en el análisis en paralelo
+SEGUNDOS_CALENTAMIENTO = 2.0
+# Número de tramos por proceso: más tramos que procesos reparte mejor la carga si un tramo es más lento
+TRAMOS_POR_PROCESO = 2
+# Área mínima de un contorno en la resolución original (la misma que usaba el detector anterior)
+AREA_MINIMA = 500
+
+class ModeloFondo:
+    """
+    Modelo del fondo de la escena. apply() devuelve la máscara binaria de los píxeles en movimiento.
+    """
+    def __init__(self, metodo="MOG2", paso=PASO):
+        self.metodo = metodo
+        self.fondo = None
+        if metodo == "MOG2":
+            # Sin detección de sombras: la máscara queda binaria (0 o 255) y es más rápida de calcular
+            self.mog2 = cv2.createBackgroundSubtractorMOG2(history=HISTORIA_MOG2, varThreshold=16, detectShadows=False)
+        # Con un paso mayor, cada fotograma analizado representa más tiempo, así que el fondo se adapta más rápido
+        self.alfa = min(1.0, ALFA_PROMEDIO * paso)
+
+    def apply(self, gray):
+        if self.fondo is None:
+            # El primer fotograma solo inicializa el fondo: todavía no hay con qué compararlo
+            self.fondo = gray.astype(np.float32)
+            if self.metodo == "MOG2":
+                self.mog2.apply(gray)
+            return np.zeros_like(gray)
+        if self.metodo == "MOG2":
+            return self.mog2.apply(gray)
+        diferencia = cv2.absdiff(gray, cv2.convertScaleAbs(self.fondo))
+        cv2.accumulateWeighted(gray, self.fondo, self.alfa)
+        _, mascara = cv2.threshold(diferencia, UMBRAL_PIXEL, 255, cv2.THRESH_BINARY)
+        return mascara
+
+def reducirFrame(frame, ancho=ANCHO_ANALISIS):
+    """
+    Convierte el fotograma a escala de grises, lo reduce al ancho indicado y lo suaviza para quitar ruido.
+
+    Returns:
+        tuple: (imagen reducida, escala aplicada).
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    escala = 1.0
+    if ancho and gray.shape[1] > ancho:
+        escala = ancho / gray.shape[1]
+        gray = cv2.resize(gray, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(gray, (5, 5), 0), escala
+
+def cajasMovimiento(mascara, escala, areaMinima=AREA_MINIMA):
+    """
+    Extrae las cajas de las regiones en movimiento, en coordenadas de la resolución original.
+    Solo se llama al inicio de un evento, no en cada fotograma.
+    """
+    dilatada = cv2.dilate(mascara, None, iterations=2)
+    # RETR_EXTERNAL: solo los contornos exteriores, no se necesita la jerarquía completa
+    contours, _ = cv2.findContours(dilatada, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    areaMinimaReducida = areaMinima * escala * escala
+    return [tuple(int(round(v / escala)) for v in cv2.boundingRect(c)) for c in contours if cv2.contourArea(c) >= areaMinimaReducida]
+
+def analizarVideo(video_path, paso=PASO, ancho=ANCHO_ANALISIS, metodo="MOG2", umbral=UMBRAL_PUNTAJE,
+                  frameInicio=0, frameFin=None, framesCalentamiento=0, progreso=None):
+    """
+    Calcula el puntaje de movimiento de un video (o de un tramo) analizando uno de cada `paso` fotogramas.
+
+    Args:
+        video_path (str): Ruta del video.
+        paso (int): Analizar uno de cada `paso` fotogramas.
+        ancho (int): Ancho de los fotogramas analizados. None usa la resolución original.
+        metodo (str): "MOG2" o "Promedio móvil".
+        umbral (float): Puntaje a partir del cual se considera que hay movimiento.
+        frameInicio (int): Primer fotograma del tramo a analizar.
+        frameFin (int): Fotograma donde termina el tramo (sin incluirlo). None analiza hasta el final.
+        framesCalentamiento (int): Fotogramas antes de frameInicio que solo se usan para aprender el fondo.
+        progreso (callable): Función opcional progreso(proporción entre 0 y 1).
+
+    Returns:
+        tuple: Un DataFrame con las columnas 'frame', 'segundo', 'puntaje' y un DataFrame de eventos
+        ('segundo', 'cajas') con las cajas de movimiento al inicio de cada evento.
+    """
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    totalFrames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frameFin = totalFrames if frameFin is None or frameFin <= 0 else min(frameFin, totalFrames or frameFin)
+    paso = max(1, int(paso))
+    modelo = ModeloFondo(metodo, paso)
+
+    # Salta al inicio del tramo (incluido el calentamiento del modelo de fondo)
+    frameActual = max(0, frameInicio - framesCalentamiento)
+    if frameActual > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frameActual)
+
+    frames, puntajes, eventos = [], [], []
+    enMovimiento = False
+    while frameFin <= 0 or frameActual < frameFin:
+        # Solo se decodifica por completo el fotograma que se analiza. Los demás se saltan con grab()
+        if (frameActual - frameInicio) % paso != 0:
+            if not cap.grab():
+                break
+            frameActual += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray, escala = reducirFrame(frame, ancho)
+        mascara = modelo.apply(gray)
+        if frameActual >= frameInicio:
+            # Puntaje: proporción de píxeles en movimiento. No requiere buscar contornos
+            puntaje = cv2.countNonZero(mascara) / mascara.size
+            frames.append(frameActual)
+            puntajes.append(puntaje)
+            if puntaje >= umbral and not enMovimiento:
+                # Empieza un evento: solo ahora se extraen los contornos
+                eventos.append({"segundo": frameActual / fps, "cajas": cajasMovimiento(mascara, escala)})
+            enMovimiento = puntaje >= umbral
+            # El progreso se informa cada 50 fotogramas analizados para no saturar la interfaz
+            if progreso and totalFrames and len(frames) % 50 == 0:
+                progreso(min(1.0, (frameActual - frameInicio + 1) / max(frameFin - frameInicio, 1)))
+        frameActual += 1
+    cap.release()
+
+    dfPuntajes = pd.DataFrame({"frame": frames, "segundo": np.asarray(frames, dtype=float) / fps, "puntaje": puntajes})
+    return dfPuntajes, pd.DataFrame(eventos, columns=["segundo", "cajas"])
+
+def intervalosMovimiento(dfPuntajes, umbral=UMBRAL_PUNTAJE, pausaMaxima=PAUSA_MAXIMA, duracionMinima=0.0):
+    """
+    Agrupa los fotogramas con movimiento en intervalos. Los intervalos separados por una pausa menor a
+    pausaMaxima segundos se unen, y se descartan los que duran menos de duracionMinima segundos.
+
+    Returns:
+        pandas.DataFrame: Columnas 'inicio', 'fin', 'duracion' (segundos) y 'puntajeMaximo'.
+    """
+    columnas = ["inicio", "fin", "duracion", "puntajeMaximo"]
+    movimiento = dfPuntajes[dfPuntajes["puntaje"] >= umbral].sort_values("segundo")
+    if movimiento.empty:
+        return pd.DataFrame(columns=columnas)
+    segundos = movimiento["segundo"].to_numpy()
+    # Un nuevo intervalo empieza donde la pausa desde el fotograma anterior con movimiento supera pausaMaxima
+    grupo = np.concatenate([[0], np.cumsum(np.diff(segundos) > pausaMaxima)])
+    intervalos = movimiento.assign(grupo=grupo).groupby("grupo").agg(
+        inicio=("segundo", "min"), fin=("segundo", "max"), puntajeMaximo=("puntaje", "max"))
+    intervalos["duracion"] = intervalos["fin"] - intervalos["inicio"]
+    intervalos = intervalos[intervalos["duracion"] >= duracionMinima]
+    return intervalos[columnas].reset_index(drop=True)
+
+def dividirTramos(totalFrames, numTramos, paso=PASO):
+    """
+    Divide el video en tramos de fotogramas [inicio, fin). Los límites son múltiplos del paso, así los
+    tramos analizan exactamente los mismos fotogramas que el análisis secuencial.
+    """
+    numTramos = max(1, min(numTramos, totalFrames // max(paso, 1) or 1))
+    limites = np.linspace(0, totalFrames, numTramos + 1)
+    limites = (np.round(limites / paso) * paso).astype(int)
+    limites[-1] = totalFrames
+    return [(int(inicio), int(fin)) for inicio, fin in zip(limites[:-1], limites[1:]) if fin > inicio]
+
+def _analizarTramo(argumentos):
+    # Función de cada proceso: analiza su tramo después de saltar directamente a su inicio
+    video_path, paso, ancho, metodo, umbral, inicio, fin, calentamiento = argumentos
+    return analizarVideo(video_path, paso=paso, ancho=ancho, metodo=metodo, umbral=umbral,
+                         frameInicio=inicio, frameFin=fin, framesCalentamiento=calentamiento)
+
+def analizarVideoParalelo(video_path, numProcesos=None, paso=PASO, ancho=ANCHO_ANALISIS, metodo="MOG2",
+                          umbral=UMBRAL_PUNTAJE, segundosCalentamiento=SEGUNDOS_CALENTAMIENTO, progreso=None):
+    """
+    Analiza el video dividido en tramos de tiempo, en paralelo en varios procesos.
+
+    Cada proceso salta al inicio de su tramo (menos unos segundos de calentamiento) con CAP_PROP_POS_FRAMES.
+    Los fotogramas de calentamiento solo entrenan el modelo de fondo y no se puntúan, por lo que no se
+    repiten puntajes entre tramos. Al unir las líneas de tiempo se descartan los eventos que empiezan en el
+    límite de un tramo si el movimiento ya venía del tramo anterior.
+
+    Args:
+        video_path (str): Ruta del video.
+        numProcesos (int): Número de procesos. Por defecto, el número de núcleos.
+        paso, ancho, metodo, umbral: Igual que en analizarVideo.
+        segundosCalentamiento (float): Segundos antes de cada tramo usados para aprender el fondo.
+        progreso (callable): Función opcional progreso(proporción entre 0 y 1).
+
+    Returns:
+        tuple: Los mismos DataFrames que analizarVideo, para el video completo.
+    """
+    numProcesos = numProcesos or os.cpu_count()
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    totalFrames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    tramos = dividirTramos(totalFrames, numProcesos * TRAMOS_POR_PROCESO, paso)
+    if numProcesos <= 1 or len(tramos) <= 1:
+        return analizarVideo(video_path, paso, ancho, metodo, umbral, progreso=progreso)
+
+    calentamiento = int(round(segundosCalentamiento * fps))
+    argumentos = [(video_path, paso, ancho, metodo, umbral, inicio, fin, calentamiento) for inicio, fin in tramos]
+    resultados = []
+    with ProcessPoolExecutor(max_workers=numProcesos) as pool:
+        for i, resultado in enumerate(pool.map(_analizarTramo, argumentos)):
+            resultados.append(resultado)
+            if progreso:
+                progreso((i + 1) / len(argumentos))
+
+    dfPuntajes = pd.concat([puntajes for puntajes, _ in resultados], ignore_index=True).sort_values("frame", ignore_index=True)
+    dfEventos = pd.concat([eventos for _, eventos in resultados if not eventos.empty] or [pd.DataFrame(columns=["segundo", "cajas"])],
+                          ignore_index=True)
+    if not dfEventos.empty and not dfPuntajes.empty:
+        # Un evento al inicio de un tramo es la continuación de otro si el fotograma analizado anterior ya tenía movimiento
+        frameEvento = np.round(dfEventos["segundo"].to_numpy() * fps).astype(int)
+        posicion = np.searchsorted(dfPuntajes["frame"].to_numpy(), frameEvento)
+        anterior = dfPuntajes["puntaje"].to_numpy()[np.maximum(posicion - 1, 0)]
+        continuacion = (posicion > 0) & (anterior >= umbral)
+        dfEventos = dfEventos[~continuacion].reset_index(drop=True)
+    return dfPuntajes, dfEventos
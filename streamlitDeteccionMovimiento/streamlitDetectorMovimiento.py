@@ -13,147 +13,111 @@
 #           usa para crear archivos y directorios temporales.
 #
 # datetime: Librería nativa de Python para trabajar con fechas y horas.
+#
+# motorMovimiento: Módulo de este proyecto con el motor de análisis de movimiento
+#                  (fondo MOG2 o promedio móvil sobre fotogramas reducidos).
 # ==============================================================================
 
 import streamlit as st                # Importa la librería Streamlit para crear la interfaz web
 import cv2                            # Importa OpenCV para procesamiento de video e imágenes
 import tempfile                       # Importa tempfile para crear archivos temporales
+import os                             # Importa os para conocer el número de núcleos del equipo
 from datetime import timedelta        # De la librería datetime, importa timedelta para manejar duraciones de tiempo
+import motorMovimiento as mm          # Motor de análisis de movimiento por intervalos
 
 # Configura la página de Streamlit para que tenga un título y ocupe todo el ancho
 st.set_page_config(page_title="Detector de Movimiento en Video", layout="wide")
 
+def formatoTiempo(segundos):
+    """
+    Convierte segundos a texto mm:ss.
+    """
+    minutos, segundos = divmod(int(segundos), 60)
+    return f"{minutos:02d}:{segundos:02d}"
+
 @st.fragment
-def MostrarVideo(video_path, segundosMovimiento):
+def MostrarVideo(video_path, intervalos):
     """
-    Muestra el video analizado y permite al usuario navegar a los momentos
-    específicos donde se detectó movimiento.
+    Muestra el video analizado y permite al usuario navegar a los intervalos
+    donde se detectó movimiento.
 
     Args:
         video_path (str): La ruta al archivo de video que se va a mostrar.
-        segundosMovimiento (list): Una lista de enteros que representan los segundos
-                                  en los que se detectó movimiento.
+        intervalos (pandas.DataFrame): Intervalos de movimiento con las columnas
+                                       'inicio', 'fin', 'duracion' y 'puntajeMaximo'.
 
     Returns:
         None: No devuelve ningún valor, renderiza componentes en la interfaz de Streamlit.
     """
     st.success("Análisis de movimiento completado.")  # Muestra un mensaje de éxito al finalizar el análisis
+    if intervalos.empty:
+        st.info("No se detectó movimiento en el video.")
+        st.video(video_path)
+        return
     
-    # Crea un control segmentado para que el usuario elija un segundo específico
+    # Crea un control segmentado para que el usuario elija un intervalo de movimiento
     parMoviminto = st.segmented_control(
-                                            "Segundos de movimiento",
-                                            options=segundosMovimiento,
-                                            default=segundosMovimiento[0] if segundosMovimiento else 0
+                                            "Intervalos de movimiento",
+                                            options=list(intervalos.index),
+                                            format_func=lambda i: f"{formatoTiempo(intervalos.loc[i, 'inicio'])} - {formatoTiempo(intervalos.loc[i, 'fin'])}",
+                                            default=intervalos.index[0]
                                         )
+    inicio = intervalos.loc[parMoviminto, 'inicio'] if parMoviminto is not None else 0
     
-    # Muestra el componente de video de Streamlit, comenzando la reproducción en el segundo seleccionado
-    st.video(video_path, start_time=timedelta(seconds=parMoviminto))
+    # Muestra el componente de video de Streamlit, comenzando la reproducción al inicio del intervalo seleccionado
+    st.video(video_path, start_time=timedelta(seconds=int(inicio)))
 
 # Título principal de la aplicación web
 st.title("Detector de Movimiento en Video")
 
+# Opciones del análisis
+with st.sidebar:
+    st.subheader("Opciones de análisis")
+    parPaso = st.number_input("Analizar 1 de cada N fotogramas", min_value=1, max_value=30, value=mm.PASO)
+    parAncho = st.select_slider("Ancho de análisis (px)", options=[160, 240, 320, 480, 640, "Original"], value=mm.ANCHO_ANALISIS)
+    parMetodo = st.selectbox("Modelo de fondo", options=mm.METODOS_FONDO)
+    parUmbral = st.number_input("Umbral de movimiento (% de píxeles)", min_value=0.01, max_value=50.0, value=mm.UMBRAL_PUNTAJE * 100, step=0.1) / 100
+    parPausa = st.number_input("Unir pausas menores a (segundos)", min_value=0.0, max_value=60.0, value=mm.PAUSA_MAXIMA, step=0.5)
+    # Con más de un proceso el video se divide en tramos que se analizan en paralelo
+    parProcesos = st.number_input("Procesos en paralelo", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1)
+
 # Componente de Streamlit para que el usuario suba un archivo de video
 uploaded_file = st.file_uploader("Carga un video", type=["mp4", "avi", "mov"])
 
 # Verifica si el usuario ha subido un archivo
 if uploaded_file is not None:
-    # Crea un archivo temporal para guardar el video subido.
+    # Guarda el video subido en un archivo temporal una sola vez por archivo.
     # OpenCV necesita una ruta de archivo en el disco para abrir el video.
-    tfile = tempfile.NamedTemporaryFile(delete=False)
-    tfile.write(uploaded_file.read()) # Escribe los bytes del video subido al archivo temporal
-    video_path = tfile.name           # Obtiene la ruta del archivo temporal
-    # st.write(video_path)
-    # Abre el video usando OpenCV
-    cap = cv2.VideoCapture(video_path)
-    # Crea un contenedor vacío en Streamlit que se actualizará dinámicamente con los fotogramas
-    stframe = st.empty()
-    
-    # Lee los dos primeros fotogramas para iniciar la comparación
-    ret, frame1 = cap.read()
-    ret, frame2 = cap.read()
-    
-    # Inicializa una lista para almacenar los segundos en los que se detecta movimiento
-    segundosMovimiento = []
-    
-    # Bucle principal: se ejecuta mientras haya fotogramas disponibles en el video
-    while ret and frame2 is not None:
-        
-        # --- PASOS DE PROCESAMIENTO DE IMAGEN PARA DETECTAR MOVIMIENTO ---
+    if st.session_state.get("idArchivo") != uploaded_file.file_id:
+        tfile = tempfile.NamedTemporaryFile(delete=False)
+        tfile.write(uploaded_file.getbuffer()) # Escribe los bytes del video subido al archivo temporal
+        tfile.close()
+        st.session_state.idArchivo = uploaded_file.file_id
+        st.session_state.video_path = tfile.name
+        st.session_state.analisis = None
+    video_path = st.session_state.video_path           # Obtiene la ruta del archivo temporal
 
-        # 1. Diferencia Absoluta: Calcula la diferencia pixel a pixel entre dos fotogramas.
-        #    Las áreas que no cambian resultan en negro, y las que cambian, en color.
-        diff = cv2.absdiff(frame1, frame2)
-        
-        # 2. Escala de Grises: Convierte la imagen de diferencia a escala de grises.
-        #    Simplifica el análisis al trabajar con una sola dimensión de intensidad.
-        gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-        
-        # 3. Desenfoque Gaussiano: Aplica un filtro de desenfoque para suavizar la imagen
-        #    y eliminar el ruido de alta frecuencia (pequeñas variaciones irrelevantes).
-        blur = cv2.GaussianBlur(gray, (5,5), 0)
-        
-        # 4. Umbral (Thresholding): Crea una imagen binaria (blanco y negro).
-        #    Píxeles con intensidad mayor a 20 se convierten en blanco (movimiento)
-        #    y los demás en negro (sin movimiento).
-        _, thresh = cv2.threshold(blur, 20, 255, cv2.THRESH_BINARY)
-        
-        # 5. Dilatación: "Engorda" las áreas blancas para rellenar pequeños agujeros y
-        #    conectar regiones de movimiento cercanas, creando contornos más sólidos.
-        dilated = cv2.dilate(thresh, None, iterations=3)
-        
-        # 6. Encontrar Contornos: Detecta los bordes de las formas blancas (áreas de movimiento)
-        #    en la imagen dilatada.
-        # cv2.findContours: Encuentra los contornos en la imagen binaria dilatada.
-        # Parámetros:
-        #   - dilated: Imagen binaria donde buscar los contornos.
-        #   - cv2.RETR_TREE: Modo de recuperación de contornos, recupera todos los contornos y construye una jerarquía completa de contornos anidados.
-        #   - cv2.CHAIN_APPROX_SIMPLE: Método de aproximación de contornos, comprime los segmentos horizontales, verticales y diagonales dejando solo sus puntos extremos.
-        contours, _ = cv2.findContours(dilated, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    # El análisis se repite solo si cambian las opciones que lo afectan
+    parametros = (parPaso, None if parAncho == "Original" else parAncho, parMetodo, parUmbral, parProcesos)
+    if st.session_state.analisis is None or st.session_state.analisis[0] != parametros:
+        barra = st.progress(0.0, "Analizando movimiento...")
+        dfPuntajes, _ = mm.analizarVideoParalelo(video_path, numProcesos=parProcesos, paso=parPaso, ancho=parametros[1],
+                                                 metodo=parMetodo, umbral=parUmbral, progreso=lambda avance: barra.progress(avance, "Analizando movimiento..."))
+        barra.empty()
+        st.session_state.analisis = (parametros, dfPuntajes)
+    _, dfPuntajes = st.session_state.analisis
 
-        # Itera sobre cada contorno encontrado
-        for contour in contours:
-            # Filtra los contornos pequeños que probablemente son ruido
-            if cv2.contourArea(contour) < 500:
-                continue
-            
-            # Obtiene el rectángulo delimitador que encierra el contorno
-            (x, y, w, h) = cv2.boundingRect(contour)
-            # Dibuja el rectángulo verde sobre el fotograma original para visualizar el movimiento
-            cv2.rectangle(
-                frame1,           # Imagen sobre la que se dibuja el rectángulo (el fotograma original)
-                (x, y),           # Coordenada superior izquierda del rectángulo (esquina inicial)
-                (x+w, y+h),       # Coordenada inferior derecha del rectángulo (esquina final)
-                (0,255,0),        # Color del rectángulo en formato BGR (verde)
-                2                 # Grosor del borde del rectángulo en píxeles
-            )
-            
-            # Obtiene el tiempo actual del video en milisegundos, lo convierte a segundos
-            # y lo añade a la lista de momentos con movimiento.
-            segundosMovimiento.append(int(cap.get(cv2.CAP_PROP_POS_MSEC)/1000))
+    # Agrupa los fotogramas con movimiento en intervalos
+    intervalos = mm.intervalosMovimiento(dfPuntajes, umbral=parUmbral, pausaMaxima=parPausa)
 
-        # Muestra los resultados en la interfaz de Streamlit
-        with stframe.container():
-            # Crea un diseño de 2 columnas para una mejor visualización
-            c1, c2 = st.columns([7, 3])
-            # En la columna ancha, muestra el video con los rectángulos de movimiento
-            c1.image(frame1, channels="BGR", caption="Video con Detección de Movimiento")
-            # En la columna estrecha, muestra las diferentes etapas del procesamiento
-            with c2.container(horizontal=True,horizontal_alignment ="left"):
-                st.image(diff, caption="1. Diferencia", width=200)
-                st.image(gray, caption="2. Escala de Grises", width=200)
-                st.image(blur, caption="3. Desenfoque", width=200)
-                st.image(dilated, caption="4. Dilatación", width=200)
-            
-        # Actualiza los fotogramas para la siguiente iteración
-        frame1 = frame2          # El fotograma 2 se convierte en el fotograma 1
-        ret, frame2 = cap.read() # Lee un nuevo fotograma para ser el fotograma 2
-    
-    # Procesa la lista de segundos para eliminar duplicados y ordenarla
-    # set() elimina duplicados, list() lo convierte a lista, sorted() la ordena.
-    segundosMovimiento = sorted(list(set(segundosMovimiento)))
-    
-    # Libera el objeto de captura de video para cerrar el archivo y liberar recursos
-    cap.release()
+    c1, c2 = st.columns([7, 3])
+    # Puntaje de movimiento a lo largo del video, con el umbral como referencia
+    c1.line_chart(dfPuntajes.assign(umbral=parUmbral).set_index("segundo")[["puntaje", "umbral"]], y_label="Proporción de píxeles en movimiento")
+    # Tabla de intervalos detectados
+    c2.dataframe(intervalos.assign(inicio=intervalos["inicio"].map(formatoTiempo), fin=intervalos["fin"].map(formatoTiempo)),
+                 hide_index=True, use_container_width=True,
+                 column_config={"duracion": st.column_config.NumberColumn("duración (s)", format="%.1f"),
+                                "puntajeMaximo": st.column_config.ProgressColumn("puntaje máximo", min_value=0, max_value=1)})
     
     # Llama a la función para mostrar el video final y los controles de navegación
-    MostrarVideo(video_path, segundosMovimiento)
\ No newline at end of file
+    MostrarVideo(video_path, intervalos)
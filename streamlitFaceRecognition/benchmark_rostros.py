@@ -0,0 +1,60 @@
+# Benchmark de la búsqueda de rostros: exacta frente a aproximada (HNSW de FAISS).
+# Genera una galería sintética de codificaciones (varias fotos por persona con ruido), la agrega al
+# almacén por partes como lo haría la actualización incremental, elimina una parte de las filas
+# (lápidas) y mide el recall@k y el tiempo por consulta con distintos tamaños de galería.
+# Uso: python benchmark_rostros.py [número máximo de rostros]
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import indiceRostros as ir
+
+FOTOS_POR_PERSONA = 4
+NUM_CONSULTAS = 500
+FRACCION_ELIMINADA = 0.1
+
+def galeriaSintetica(numRostros, rng):
+    """
+    Codificaciones parecidas a las de face_recognition: cada persona tiene un centro y sus fotos
+    están a poca distancia de él (menos que la tolerancia de 0.6).
+    """
+    centros = rng.normal(0, 0.09, (numRostros // FOTOS_POR_PERSONA + 1, ir.DIMENSION)).astype(np.float32)
+    personas = np.arange(numRostros) // FOTOS_POR_PERSONA
+    return centros, personas, centros[personas] + rng.normal(0, 0.02, (numRostros, ir.DIMENSION)).astype(np.float32)
+
+if __name__ == "__main__":
+    maximo = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = np.random.default_rng(0)
+    centros, personas, codificaciones = galeriaSintetica(maximo, rng)
+    carpetaIndice = tempfile.mkdtemp(prefix="benchmark_rostros_")
+    metadatos = ir.metadatosVacios()
+    print(f"{'rostros':>9} {'agregar (s)':>12} {'recall@' + str(ir.K_RESULTADOS):>10} {'exacta (ms)':>12} {'aprox. (ms)':>12}")
+    tamano = ir.FILAS_MINIMAS_ANN
+    while True:
+        # Agrega las filas nuevas al almacén y al grafo HNSW, sin reconstruir lo que ya existe
+        inicio = time.perf_counter()
+        nuevas = codificaciones[metadatos["filas"]:tamano]
+        filas = ir.agregarFilas(carpetaIndice, metadatos, nuevas)
+        metadatos["archivos"].extend(f"persona{personas[fila]}_{fila}.jpg" for fila in filas)
+        metadatos["nombres"].extend(f"persona{personas[fila]}" for fila in filas)
+        # Elimina una parte de las filas nuevas (por ejemplo, fotos reemplazadas)
+        metadatos["eliminadas"].extend(int(fila) for fila in rng.choice(filas, int(len(filas) * FRACCION_ELIMINADA), replace=False))
+        ir.actualizarIndiceAproximado(carpetaIndice, metadatos)
+        ir.guardarMetadatos(carpetaIndice, metadatos)
+        segundos = time.perf_counter() - inicio
+
+        indice = ir.cargarIndice(carpetaIndice)
+        # Consultas: fotos nuevas de personas de la galería
+        personasConsulta = rng.integers(0, personas[tamano - 1] + 1, NUM_CONSULTAS)
+        consultas = centros[personasConsulta] + rng.normal(0, 0.02, (NUM_CONSULTAS, ir.DIMENSION)).astype(np.float32)
+        medida = ir.medirRecall(indice, consultas)
+        # Con pocas filas vigentes no se construye el índice aproximado y ambas búsquedas son exactas
+        aproximada = f"{medida['msAproximada']:>12.3f}" if indice["ann"] is not None else f"{'(exacta)':>12}"
+        print(f"{tamano:>9} {segundos:>12.2f} {medida['recall']:>10.3f} {medida['msExacta']:>12.3f} {aproximada}")
+        if tamano >= maximo:
+            break
+        tamano = min(tamano * 2, maximo)
+    for nombre in os.listdir(carpetaIndice):
+        os.remove(os.path.join(carpetaIndice, nombre))
+    os.rmdir(carpetaIndice)
@@ -0,0 +1,425 @@
+# Índice precalculado de los rostros de la galería de celebridades.
+# Las codificaciones de 128 dimensiones de face_recognition se calculan una sola vez (en varios procesos)
+# y se guardan en un almacén de solo agregar: las imágenes nuevas se agregan al final, y las que se
+# eliminan o cambian se marcan como eliminadas (lápidas) hasta que se compacta el almacén.
+# Sobre el almacén se construye un índice aproximado HNSW de FAISS para que la búsqueda siga siendo
+# sub-lineal cuando la galería crece. La búsqueda exacta vectorizada se usa en galerías pequeñas.
+#
+# Para construir o actualizar el índice de antemano y medir el recall de la búsqueda aproximada:
+#   python indiceRostros.py [carpeta de imágenes]
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import faiss  # pip install faiss-cpu
+
+# Carpeta con las imágenes de referencia
+CARPETA_GALERIA = "Celebrity Faces Dataset"
+# Carpeta donde se guarda el índice
+CARPETA_INDICE = "indice"
+# Extensiones de imagen que se indexan
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png")
+# Dimensión de las codificaciones de face_recognition
+DIMENSION = 128
+# Distancia máxima para considerar que dos rostros son de la misma persona (valor por defecto de face_recognition)
+TOLERANCIA = 0.6
+# Número de resultados por defecto
+K_RESULTADOS = 5
+# Sufijo numérico de los archivos de una misma persona: 'Brad Pitt_1.jpg' -> 'Brad Pitt'
+PATRON_SUFIJO = re.compile(r"_\d+$")
+# El almacén se compacta cuando esta fracción de las filas está eliminada
+FRACCION_COMPACTAR = 0.25
+# Con menos filas la búsqueda exacta es igual de rápida y no se construye el índice aproximado
+FILAS_MINIMAS_ANN = 10_000
+# Parámetros del grafo HNSW: vecinos por nodo, amplitud al construir y amplitud al buscar
+HNSW_M = 32
+HNSW_EF_CONSTRUCCION = 80
+HNSW_EF_BUSQUEDA = 128
+# Permite agregar y eliminar imágenes de la galería desde la página. Desactivado por defecto: la galería se
+# mantiene copiando o borrando archivos en la carpeta y ejecutando este módulo. Se activa con ROSTROS_ADMINISTRAR_GALERIA=1
+ADMINISTRAR_GALERIA = os.environ.get("ROSTROS_ADMINISTRAR_GALERIA") == "1"
+
+def nombrePersona(archivo):
+    """
+    Obtiene el nombre de la persona a partir del nombre del archivo, sin la extensión ni el sufijo numérico.
+    """
+    return PATRON_SUFIJO.sub("", os.path.splitext(archivo)[0])
+
+def listarImagenes(carpeta):
+    """
+    Lista los archivos de imagen de la carpeta, ordenados por nombre.
+    """
+    return sorted(archivo for archivo in os.listdir(carpeta) if archivo.lower().endswith(EXTENSIONES_IMAGEN))
+
+def firmaImagen(ruta):
+    """
+    Firma de una imagen con su tamaño y fecha de modificación, para saber si cambió sin tener que leerla.
+    """
+    estado = os.stat(ruta)
+    return f"{estado.st_size}|{estado.st_mtime_ns}"
+
+def firmaGaleria(carpeta):
+    """
+    Firma de la galería completa: el nombre y la firma de cada imagen. Cambia al agregar, quitar o
+    renombrar imágenes y también al reemplazar una imagen con otra del mismo nombre.
+    """
+    return tuple((archivo, firmaImagen(os.path.join(carpeta, archivo))) for archivo in listarImagenes(carpeta))
+
+def rutaNuevaImagen(carpeta, nombre):
+    """
+    Ruta libre para una nueva imagen de la persona: '<nombre>_<número>.jpg' con el primer número libre.
+    Del nombre solo se conservan letras, números, espacios, '_' y '-'.
+
+    Returns:
+        La ruta dentro de la carpeta, o None si el nombre queda vacío o la ruta sale de la carpeta.
+    """
+    nombre = re.sub(r"[^\w\- ]", "", nombre).strip()
+    if not nombre:
+        return None
+    carpeta = os.path.realpath(carpeta)
+    numero = 1
+    while os.path.exists(os.path.join(carpeta, f"{nombre}_{numero}.jpg")):
+        numero += 1
+    ruta = os.path.realpath(os.path.join(carpeta, f"{nombre}_{numero}.jpg"))
+    if os.path.commonpath([carpeta, ruta]) != carpeta:
+        return None
+    return ruta
+
+def codificarImagen(ruta):
+    """
+    Calcula las codificaciones de todos los rostros de una imagen.
+    El import se hace aquí para que buscar en el índice no necesite cargar face_recognition (dlib).
+
+    Returns:
+        Un array float32 de rostros x 128. Si no se detecta ningún rostro, el array tiene 0 filas.
+    """
+    import face_recognition  # pip install face_recognition
+    imagen = face_recognition.load_image_file(ruta)
+    return np.array(face_recognition.face_encodings(imagen), dtype=np.float32).reshape(-1, DIMENSION)
+
+def codificarImagenes(rutas, numProcesos=None):
+    """
+    Codifica varias imágenes repartidas entre procesos (dlib es lento por imagen y usa un solo núcleo).
+    """
+    if len(rutas) <= 1:
+        return [codificarImagen(ruta) for ruta in rutas]
+    with ProcessPoolExecutor(max_workers=numProcesos) as pool:
+        return list(pool.map(codificarImagen, rutas, chunksize=max(1, len(rutas) // (4 * (numProcesos or os.cpu_count() or 1)))))
+
+def metadatosVacios():
+    """
+    Metadatos de un índice sin filas.
+        - filas: número de filas válidas del almacén. Los bytes que haya después (de una escritura interrumpida) se ignoran.
+        - archivos, nombres: archivo y nombre de la persona de cada fila.
+        - eliminadas: filas marcadas como eliminadas (lápidas), pendientes de compactar.
+        - imagenes: {archivo: {'firma', 'filas'}} de cada imagen indexada.
+        - sinRostro: imágenes en las que no se detectó ningún rostro.
+        - filasAnn: número de filas incluidas en el índice aproximado (0 si no existe).
+    """
+    return {"filas": 0, "archivos": [], "nombres": [], "eliminadas": [], "imagenes": {}, "sinRostro": [], "filasAnn": 0}
+
+def completarCompactacion(carpetaIndice):
+    """
+    Termina una compactación interrumpida. Los metadatos compactados (metadatos.compactado.json) se escriben
+    antes de reemplazar los archivos de datos: si existen, la compactación ya se había confirmado y se
+    completa el reemplazo de los archivos. Si no existen, los archivos .tmp de datos son de una
+    compactación que no llegó a confirmarse y se descartan.
+    """
+    rutaCompactado = os.path.join(carpetaIndice, "metadatos.compactado.json")
+    for nombre in ["codificaciones.f32", "normas.f32"]:
+        ruta = os.path.join(carpetaIndice, nombre)
+        if os.path.exists(ruta + ".tmp"):
+            if os.path.exists(rutaCompactado):
+                os.replace(ruta + ".tmp", ruta)
+            else:
+                os.remove(ruta + ".tmp")
+    if os.path.exists(rutaCompactado):
+        os.replace(rutaCompactado, os.path.join(carpetaIndice, "metadatos.json"))
+
+def leerMetadatos(carpetaIndice):
+    """
+    Lee los metadatos del índice, o devuelve metadatos vacíos si el índice no existe.
+    Antes se completa la última compactación si se interrumpió (ver completarCompactacion).
+    """
+    completarCompactacion(carpetaIndice)
+    ruta = os.path.join(carpetaIndice, "metadatos.json")
+    if not os.path.exists(ruta):
+        return metadatosVacios()
+    with open(ruta, encoding="utf-8") as archivo:
+        metadatos = json.load(archivo)
+    # Los índices del formato anterior (codificaciones.npy, sin almacén de solo agregar) se reconstruyen
+    return metadatos if "filas" in metadatos else metadatosVacios()
+
+def guardarMetadatos(carpetaIndice, metadatos, nombre="metadatos.json"):
+    """
+    Guarda los metadatos con otro nombre y los renombra al terminar. Se escriben después de los datos,
+    así que el número de filas de los metadatos siempre corresponde a filas completas del almacén.
+    """
+    ruta = os.path.join(carpetaIndice, nombre)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+        json.dump(metadatos, archivo, ensure_ascii=False)
+    os.replace(ruta + ".tmp", ruta)
+
+def agregarFilas(carpetaIndice, metadatos, codificaciones):
+    """
+    Agrega codificaciones al final del almacén (codificaciones.f32 y normas.f32, float32 sin encabezado).
+    Antes de agregar, los archivos se recortan a las filas válidas por si una escritura anterior se interrumpió.
+
+    Returns:
+        La lista de filas asignadas a las codificaciones.
+    """
+    for nombre, ancho in [("codificaciones.f32", DIMENSION), ("normas.f32", 1)]:
+        with open(os.path.join(carpetaIndice, nombre), "ab") as archivo:
+            archivo.truncate(metadatos["filas"] * ancho * 4)
+            if nombre == "normas.f32":
+                archivo.write(np.einsum("ij,ij->i", codificaciones, codificaciones).astype(np.float32).tobytes())
+            else:
+                archivo.write(np.ascontiguousarray(codificaciones, dtype=np.float32).tobytes())
+    filas = list(range(metadatos["filas"], metadatos["filas"] + len(codificaciones)))
+    metadatos["filas"] += len(codificaciones)
+    return filas
+
+def abrirAlmacen(carpetaIndice, filas):
+    """
+    Abre las codificaciones y normas del almacén con memory-mapping (solo las filas válidas).
+    """
+    if filas == 0:
+        return np.empty((0, DIMENSION), dtype=np.float32), np.empty(0, dtype=np.float32)
+    return (np.memmap(os.path.join(carpetaIndice, "codificaciones.f32"), dtype=np.float32, mode="r", shape=(filas, DIMENSION)),
+            np.memmap(os.path.join(carpetaIndice, "normas.f32"), dtype=np.float32, mode="r", shape=(filas,)))
+
+def compactarAlmacen(carpetaIndice, metadatos):
+    """
+    Reescribe el almacén solo con las filas vigentes y renumera las filas de cada imagen.
+    Los archivos nuevos se escriben con otro nombre y, antes de reemplazar los archivos actuales, se guardan
+    los metadatos compactados en metadatos.compactado.json: desde ese momento la compactación está confirmada
+    y, si se interrumpe, leerMetadatos la completa. El índice aproximado se descarta, porque sus ids son las
+    filas antiguas, y se reconstruye en la siguiente actualización.
+    """
+    codificaciones, normas = abrirAlmacen(carpetaIndice, metadatos["filas"])
+    eliminadas = set(metadatos["eliminadas"])
+    vigentes = np.array([fila for fila in range(metadatos["filas"]) if fila not in eliminadas], dtype=np.intp)
+    nuevaFila = {int(fila): i for i, fila in enumerate(vigentes)}
+    for nombre, datos in [("codificaciones.f32", codificaciones), ("normas.f32", normas)]:
+        with open(os.path.join(carpetaIndice, nombre + ".tmp"), "wb") as archivo:
+            archivo.write(np.ascontiguousarray(datos[vigentes]).tobytes())
+    del codificaciones, normas
+    metadatos["archivos"] = [metadatos["archivos"][fila] for fila in vigentes]
+    metadatos["nombres"] = [metadatos["nombres"][fila] for fila in vigentes]
+    for imagen in metadatos["imagenes"].values():
+        imagen["filas"] = [nuevaFila[fila] for fila in imagen["filas"]]
+    metadatos["filas"] = len(vigentes)
+    metadatos["eliminadas"] = []
+    metadatos["filasAnn"] = 0
+    guardarMetadatos(carpetaIndice, metadatos, "metadatos.compactado.json")
+    completarCompactacion(carpetaIndice)
+
+def crearIndiceAproximado():
+    """
+    Crea un índice HNSW de FAISS vacío. HNSW permite agregar vectores sin reentrenar, así que se actualiza
+    junto con el almacén. Las filas eliminadas se excluyen al buscar con un selector de ids.
+    """
+    ann = faiss.IndexHNSWFlat(DIMENSION, HNSW_M)
+    ann.hnsw.efConstruction = HNSW_EF_CONSTRUCCION
+    return ann
+
+def actualizarIndiceAproximado(carpetaIndice, metadatos):
+    """
+    Agrega al índice aproximado las filas nuevas del almacén, o lo construye si no existe.
+    Los ids de FAISS son las filas del almacén, porque HNSW numera los vectores en el orden en que se agregan.
+    """
+    rutaAnn = os.path.join(carpetaIndice, "ann.faiss")
+    vigentes = metadatos["filas"] - len(metadatos["eliminadas"])
+    if vigentes < FILAS_MINIMAS_ANN:
+        if os.path.exists(rutaAnn):
+            os.remove(rutaAnn)
+        metadatos["filasAnn"] = 0
+        return
+    if metadatos["filasAnn"] == metadatos["filas"]:
+        return
+    ann = faiss.read_index(rutaAnn) if metadatos["filasAnn"] > 0 and os.path.exists(rutaAnn) else None
+    if ann is not None and ann.ntotal != metadatos["filasAnn"]:
+        # El índice se guardó pero los metadatos no (escritura interrumpida): sus ids ya no corresponden
+        # a las filas que indican los metadatos, así que se reconstruye
+        ann = None
+    if ann is None:
+        ann, metadatos["filasAnn"] = crearIndiceAproximado(), 0
+    codificaciones, _ = abrirAlmacen(carpetaIndice, metadatos["filas"])
+    ann.add(np.ascontiguousarray(codificaciones[metadatos["filasAnn"]:]))
+    faiss.write_index(ann, rutaAnn + ".tmp")
+    os.replace(rutaAnn + ".tmp", rutaAnn)
+    metadatos["filasAnn"] = metadatos["filas"]
+
+def actualizarIndice(carpeta=CARPETA_GALERIA, carpetaIndice=CARPETA_INDICE, numProcesos=None):
+    """
+    Sincroniza el índice con las imágenes actuales de la galería sin reconstruirlo.
+
+    Solo se codifican las imágenes nuevas o modificadas, que se agregan al final del almacén. Las filas
+    de las imágenes eliminadas o modificadas se marcan como eliminadas. Cuando las filas eliminadas
+    superan FRACCION_COMPACTAR, el almacén se compacta. Al final se agregan las filas nuevas al índice aproximado.
+
+    Args:
+        carpeta: Carpeta con las imágenes de referencia.
+        carpetaIndice: Carpeta donde se guarda el índice.
+        numProcesos: Número de procesos para codificar las imágenes. Por defecto, el número de núcleos.
+
+    Returns:
+        Una tupla que contiene:
+            - El índice cargado con cargarIndice.
+            - Un diccionario con el número de imágenes 'agregadas', 'eliminadas' y 'sinCambios', y si se 'compacto'.
+    """
+    os.makedirs(carpetaIndice, exist_ok=True)
+    metadatos = leerMetadatos(carpetaIndice)
+    actuales = {archivo: firmaImagen(os.path.join(carpeta, archivo)) for archivo in listarImagenes(carpeta)}
+    sinRostro = set(metadatos["sinRostro"])
+    eliminadas = [archivo for archivo, imagen in metadatos["imagenes"].items() if actuales.get(archivo) != imagen["firma"]]
+    nuevas = [archivo for archivo in actuales if archivo not in metadatos["imagenes"] or archivo in eliminadas]
+
+    for archivo in eliminadas:
+        metadatos["eliminadas"].extend(metadatos["imagenes"].pop(archivo)["filas"])
+        sinRostro.discard(archivo)
+    if nuevas:
+        codificacionesImagen = codificarImagenes([os.path.join(carpeta, archivo) for archivo in nuevas], numProcesos)
+        filas = agregarFilas(carpetaIndice, metadatos, np.concatenate(codificacionesImagen))
+        for archivo, codificaciones in zip(nuevas, codificacionesImagen):
+            filasImagen, filas = filas[:len(codificaciones)], filas[len(codificaciones):]
+            metadatos["imagenes"][archivo] = {"firma": actuales[archivo], "filas": filasImagen}
+            metadatos["archivos"].extend([archivo] * len(codificaciones))
+            metadatos["nombres"].extend([nombrePersona(archivo)] * len(codificaciones))
+            if len(codificaciones) == 0:
+                sinRostro.add(archivo)
+    metadatos["sinRostro"] = sorted(sinRostro)
+
+    compacto = metadatos["filas"] > 0 and len(metadatos["eliminadas"]) > FRACCION_COMPACTAR * metadatos["filas"]
+    if compacto:
+        compactarAlmacen(carpetaIndice, metadatos)
+    actualizarIndiceAproximado(carpetaIndice, metadatos)
+    if eliminadas or nuevas or compacto or not os.path.exists(os.path.join(carpetaIndice, "metadatos.json")):
+        guardarMetadatos(carpetaIndice, metadatos)
+    cambios = {"agregadas": len(nuevas), "eliminadas": len(eliminadas),
+               "sinCambios": len(metadatos["imagenes"]) - len(nuevas), "compacto": compacto}
+    return cargarIndice(carpetaIndice), cambios
+
+def cargarIndice(carpetaIndice=CARPETA_INDICE):
+    """
+    Abre un índice guardado. El almacén se abre con memory-mapping, así que no se lee completo al iniciar:
+    el sistema operativo carga las páginas a medida que se usan.
+
+    Returns:
+        Un diccionario con los metadatos, 'codificaciones', 'normas', 'vigentes' (máscara de filas no
+        eliminadas) y 'ann' (el índice aproximado, o None si la galería es pequeña).
+    """
+    indice = leerMetadatos(carpetaIndice)
+    indice["codificaciones"], indice["normas"] = abrirAlmacen(carpetaIndice, indice["filas"])
+    indice["vigentes"] = np.ones(indice["filas"], dtype=bool)
+    indice["vigentes"][indice["eliminadas"]] = False
+    rutaAnn = os.path.join(carpetaIndice, "ann.faiss")
+    indice["ann"] = faiss.read_index(rutaAnn) if indice["filasAnn"] == indice["filas"] > 0 and os.path.exists(rutaAnn) else None
+    if indice["ann"] is not None and indice["ann"].ntotal != indice["filas"]:
+        # Índice aproximado de una escritura interrumpida: se usa la búsqueda exacta hasta la siguiente actualización
+        indice["ann"] = None
+    return indice
+
+def obtenerIndice(carpeta=CARPETA_GALERIA, carpetaIndice=CARPETA_INDICE, numProcesos=None):
+    """
+    Carga el índice sincronizado con las imágenes actuales de la galería (ver actualizarIndice).
+    """
+    return actualizarIndice(carpeta, carpetaIndice, numProcesos)[0]
+
+def buscarExacta(indice, consultas, k):
+    """
+    Búsqueda exacta: las distancias euclidianas (las mismas de face_recognition.face_distance) se calculan
+    para toda la galería a la vez con ||g - q||² = ||g||² - 2 g·q + ||q||², que es un único producto de
+    matrices. De esas distancias se eligen las k menores con np.argpartition (O(n)) y solo esas k se ordenan.
+    """
+    # Galería x consultas. La norma de cada consulta se suma después, solo a las k distancias elegidas
+    distancias = indice["normas"][:, None] - 2 * (indice["codificaciones"] @ consultas.T)
+    distancias[~indice["vigentes"]] = np.inf
+    k = min(k, int(indice["vigentes"].sum()))
+    resultados = []
+    for j, consulta in enumerate(consultas):
+        columna = distancias[:, j]
+        filas = np.argpartition(columna, k - 1)[:k] if 0 < k < len(columna) else np.flatnonzero(np.isfinite(columna))
+        valores = np.sqrt(np.maximum(columna[filas] + consulta @ consulta, 0))
+        orden = np.argsort(valores, kind="stable")
+        resultados.append((filas[orden], valores[orden]))
+    return resultados
+
+def buscarAproximada(indice, consultas, k):
+    """
+    Búsqueda aproximada en el grafo HNSW. Solo recorre una parte de la galería, así que el tiempo crece
+    de forma sub-lineal con el número de rostros. Las filas eliminadas se excluyen durante la búsqueda.
+    """
+    parametros = faiss.SearchParametersHNSW()
+    parametros.efSearch = max(HNSW_EF_BUSQUEDA, k)
+    # Los selectores son variables locales: siguen vivos durante toda la búsqueda y el índice, compartido
+    # entre sesiones, no se modifica (otra búsqueda simultánea podría reemplazarlos y liberarlos)
+    eliminadas = selector = None
+    if indice["eliminadas"]:
+        eliminadas = faiss.IDSelectorBatch(np.asarray(indice["eliminadas"], dtype=np.int64))
+        selector = faiss.IDSelectorNot(eliminadas)
+        parametros.sel = selector
+    distancias, filas = indice["ann"].search(consultas, k, params=parametros)
+    resultados = []
+    for filasConsulta, distanciasConsulta in zip(filas, distancias):
+        validas = filasConsulta >= 0
+        resultados.append((filasConsulta[validas].astype(np.intp), np.sqrt(np.maximum(distanciasConsulta[validas], 0))))
+    return resultados
+
+def buscarRostros(indice, consultas, k=K_RESULTADOS, exacta=False):
+    """
+    Busca los k rostros de la galería más cercanos a cada consulta.
+
+    Args:
+        indice: Índice cargado con cargarIndice.
+        consultas: Array de consultas x 128 (o una sola codificación de 128).
+        k: Número de resultados por consulta.
+        exacta: Si es True, compara con toda la galería aunque exista el índice aproximado.
+
+    Returns:
+        Una lista con una tupla (filas, distancias) por consulta, ordenadas de menor a mayor distancia.
+        Con las filas se obtienen el archivo y el nombre: indice['archivos'][fila], indice['nombres'][fila].
+    """
+    consultas = np.ascontiguousarray(np.atleast_2d(np.asarray(consultas, dtype=np.float32)))
+    if indice["filas"] == 0:
+        return [(np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)) for _ in consultas]
+    if indice["ann"] is not None and not exacta:
+        return buscarAproximada(indice, consultas, k)
+    return buscarExacta(indice, consultas, k)
+
+def medirRecall(indice, consultas, k=K_RESULTADOS):
+    """
+    Compara la búsqueda aproximada con la exacta.
+
+    Returns:
+        Un diccionario con el 'recall' (fracción de los k vecinos exactos que también devuelve la búsqueda
+        aproximada, promedio de las consultas) y los milisegundos por consulta de cada búsqueda.
+    """
+    inicio = time.perf_counter()
+    exactos = buscarRostros(indice, consultas, k, exacta=True)
+    msExacta = (time.perf_counter() - inicio) * 1000 / len(consultas)
+    inicio = time.perf_counter()
+    aproximados = buscarRostros(indice, consultas, k)
+    msAproximada = (time.perf_counter() - inicio) * 1000 / len(consultas)
+    aciertos = [len(np.intersect1d(a[0], e[0])) / max(len(e[0]), 1) for a, e in zip(aproximados, exactos)]
+    return {"recall": float(np.mean(aciertos)), "msExacta": msExacta, "msAproximada": msAproximada}
+
+if __name__ == "__main__":
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else CARPETA_GALERIA
+    indice, cambios = actualizarIndice(carpeta)
+    print(f"Índice actualizado en {CARPETA_INDICE}: {int(indice['vigentes'].sum())} rostros vigentes "
+          f"({cambios['agregadas']} imágenes agregadas, {cambios['eliminadas']} eliminadas, {cambios['sinCambios']} sin cambios"
+          f"{', almacén compactado' if cambios['compacto'] else ''})")
+    if indice["sinRostro"]:
+        print(f"Imágenes sin rostro detectado: {', '.join(indice['sinRostro'])}")
+    if indice["ann"] is not None:
+        # Se usan rostros de la propia galería, con un poco de ruido, como consultas
+        rng = np.random.default_rng(0)
+        filas = rng.choice(np.flatnonzero(indice["vigentes"]), size=min(1000, int(indice["vigentes"].sum())), replace=False)
+        consultas = indice["codificaciones"][filas] + rng.normal(0, 0.02, (len(filas), DIMENSION)).astype(np.float32)
+        medida = medirRecall(indice, consultas)
+        print(f"Recall@{K_RESULTADOS} de la búsqueda aproximada: {medida['recall']:.3f} "
+              f"({medida['msAproximada']:.2f} ms por consulta, exacta {medida['msExacta']:.2f} ms)")
@@ -4,6 +4,7 @@ import cv2 # pip install cv2
 import numpy as np
 from PIL import Image, ImageDraw # pip install PIL
 import os
+import indiceRostros as ir # Índice precalculado de los rostros de la galería
 
 # Definimos los parámetros de configuración de la aplicación
 st.set_page_config(
@@ -13,37 +14,75 @@ st.set_page_config(
     initial_sidebar_state="expanded" # Definimos si el sidebar aparece expandido o colapsado
 )
 
-def identificarRostro(imagen_buscada):
-    """Compara la imagen entregada 
+@st.cache_resource(show_spinner="Indexando la galería de rostros...")
+def cargarIndiceRostros(firma):
+    """Carga el índice de rostros de la galería y lo sincroniza con las imágenes actuales: solo se codifican
+    las imágenes nuevas y las eliminadas se marcan como tales, sin reconstruir el índice.
+    Se guarda en caché para todas las sesiones. La firma de la galería (nombre, tamaño y fecha de modificación
+    de cada imagen) sirve como clave de la caché, así que una imagen reemplazada con el mismo nombre también se vuelve a indexar.
 
     Args:
-        imagen_buscada (array): Imagen que se usará para comparar con los rostros conocidos
+        firma (tuple): Firma de la galería, de ir.firmaGaleria
+    """
+    return ir.actualizarIndice(ir.CARPETA_GALERIA, ir.CARPETA_INDICE)
+
+def identificarRostro(encoding_a_buscar, k=ir.K_RESULTADOS, tolerancia=ir.TOLERANCIA, exacta=False):
+    """Compara el rostro entregado con todos los rostros de la galería en una sola búsqueda en el índice
+
+    Args:
+        encoding_a_buscar (array): Codificación del rostro que se usará para comparar con los rostros conocidos
+        k (int): Número de rostros más parecidos que se muestran
+        tolerancia (float): Distancia máxima para considerar que el rostro coincide
+        exacta (bool): Si es True se compara con toda la galería en lugar de usar el índice aproximado
     """    
-    # Recorre todos los archivos en el directorio
-    directorioBase='Celebrity Faces Dataset/'
-    encoding_a_buscar = face_recognition.face_encodings(imagen_buscada)[0]    
-    
-    st.subheader('Búsqueda')
-    # Reemplace contenido con varios elememntos
-    with st.empty():   
-        for filename in os.listdir(directorioBase):        
-            # Construye la ruta del archivo completo
-            file_path = os.path.join(directorioBase, filename)        
+    indice, _ = cargarIndiceRostros(ir.firmaGaleria(ir.CARPETA_GALERIA))
+    filas, distancias = ir.buscarRostros(indice, encoding_a_buscar, k, exacta=exacta)[0]
 
-            imagen_comparacion = face_recognition.load_image_file(file_path)
-            encoding_comparacion = face_recognition.face_encodings(imagen_comparacion)[0]                      
-            resultados = face_recognition.compare_faces([encoding_a_buscar], encoding_comparacion,tolerance=0.6)
-            # Detenemos la búsqueda con la primera opción encontrada
-            st.image(imagen_comparacion)
-            # Paramos si el rostro coincide
-            if resultados[0]==True:                
-                break    
-    if resultados[0]==True: # Si el rostro coincide lo mostramos
-        st.success(f"Encontrado:{filename}" )        
+    st.subheader('Búsqueda')
+    if len(filas) > 0 and distancias[0] <= tolerancia: # Si el rostro más cercano coincide lo mostramos
+        st.success(f"Encontrado:{indice['archivos'][filas[0]]}" )        
         st.balloons()
     else:
         st.error(f"Celebridad no encontrada" )
+    # Mostramos los rostros más parecidos con su distancia
+    for fila, distancia in zip(filas, distancias):
+        st.image(os.path.join(ir.CARPETA_GALERIA, indice['archivos'][fila]),
+                 caption=f"{indice['nombres'][fila]} (distancia {distancia:.3f})", width=200)
                     
+# Opciones de la búsqueda
+with st.sidebar:
+    parK = st.number_input("Rostros más parecidos a mostrar", min_value=1, max_value=20, value=ir.K_RESULTADOS)
+    parTolerancia = st.slider("Tolerancia", min_value=0.3, max_value=0.8, value=ir.TOLERANCIA, step=0.05)
+    parExacta = st.checkbox("Búsqueda exacta", help="Compara con todos los rostros en lugar de usar el índice aproximado HNSW")
+
+    # Estado de la galería. Las imágenes agregadas o eliminadas se sincronizan con el índice sin reconstruirlo
+    with st.expander("Galería"):
+        indice, cambios = cargarIndiceRostros(ir.firmaGaleria(ir.CARPETA_GALERIA))
+        st.caption(f"{int(indice['vigentes'].sum())} rostros de {len(indice['imagenes'])} imágenes, "
+                   f"{len(indice['eliminadas'])} eliminados sin compactar. "
+                   f"Búsqueda: {'HNSW aproximada' if indice['ann'] is not None else 'exacta'}. "
+                   f"Última actualización: {cambios['agregadas']} imágenes agregadas, {cambios['eliminadas']} eliminadas"
+                   f"{', almacén compactado' if cambios['compacto'] else ''}.")
+        # Agregar y eliminar imágenes solo si está habilitado en la configuración (ver ir.ADMINISTRAR_GALERIA)
+        if ir.ADMINISTRAR_GALERIA:
+            nuevaImagen = st.file_uploader("Agregar imagen", type='jpg', key="nuevaImagen")
+            nuevoNombre = st.text_input("Nombre de la persona")
+            if st.button("Agregar a la galería", disabled=nuevaImagen is None or not nuevoNombre.strip()):
+                # Numeramos la imagen con el primer número libre de la misma persona
+                rutaImagen = ir.rutaNuevaImagen(ir.CARPETA_GALERIA, nuevoNombre)
+                if rutaImagen is None:
+                    st.error("El nombre debe tener letras o números")
+                else:
+                    with open(rutaImagen, "wb") as archivo:
+                        archivo.write(nuevaImagen.getbuffer())
+                    st.rerun()
+            personasEliminar = st.multiselect("Eliminar personas", options=sorted({ir.nombrePersona(archivo) for archivo in indice['imagenes']}))
+            if st.button("Eliminar de la galería", disabled=not personasEliminar):
+                for archivo in list(indice['imagenes']):
+                    if ir.nombrePersona(archivo) in personasEliminar:
+                        os.remove(os.path.join(ir.CARPETA_GALERIA, archivo))
+                st.rerun()
+
 st.header('Qué celebridad es?')
 st.subheader('Uso de [face_recognition](https://github.com/ageitgey/face_recognition)') 
 # declaramos el control para cargar archivos
@@ -115,4 +154,4 @@ if archivo_cargado is not None:
                 st.code(image_encoding)
     with c4:
         # Ejecutamos la búsqueda de rostro
-        identificarRostro(image)
+        identificarRostro(image_encoding, parK, parTolerancia, parExacta)
@@ -13,6 +13,16 @@ import pandas as pd
 # Comando para instalar: pip install numpy
 import numpy as np
 
+# Librería: scipy
+# Propósito: SciPy complementa a NumPy con funciones científicas. Aquí se usa scipy.stats para obtener el p-valor de la prueba chi-cuadrado.
+# Comando para instalar: pip install scipy
+from scipy import stats
+
+# Librería: io e itertools (incluidas en Python)
+# Propósito: io permite leer el archivo cargado línea a línea sin decodificarlo completo, e itertools agrupar esas líneas en bloques.
+import io
+import itertools
+
 # Librería: plotly
 # Propósito: Plotly es una librería de graficación interactiva. plotly.graph_objects es un módulo específico que permite crear figuras complejas y personalizadas.
 # Comando para instalar: pip install plotly
@@ -30,7 +40,7 @@ st.set_page_config(
     layout="wide" # Utiliza todo el ancho disponible de la página
 )
 
-def color_diferencia(val):
+def color_diferencia(val, umbral=None):
     """
     Aplica un color rojo al texto si el valor absoluto de la diferencia porcentual supera un umbral.
 
@@ -38,6 +48,7 @@ def color_diferencia(val):
 
     Args:
         val (str): Un valor de cadena que representa un porcentaje (ej. '5.25%').
+        umbral (float, optional): Umbral de la prueba. Por defecto se usa el umbral global 'parUmbral'.
 
     Returns:
         str: Una cadena de estilo CSS ('color: red') si la condición se cumple, sino una cadena vacía.
@@ -45,14 +56,24 @@ def color_diferencia(val):
     try:
         # Intenta convertir el valor (quitando el '%' y espacios) a un número flotante y dividir por 100 para obtener la proporción.
         num = float(val.strip('%')) / 100
-        # Comprueba si el valor absoluto del número es mayor que el umbral global 'parUmbral'.
-        if abs(num) >= parUmbral:
+        # Comprueba si el valor absoluto del número es mayor que el umbral (por defecto el umbral global 'parUmbral').
+        if abs(num) >= (parUmbral if umbral is None else umbral):
             return 'color: red' # Devuelve el estilo CSS para texto rojo
     except:
         # Si ocurre algún error durante la conversión (ej. el valor no es un porcentaje válido), no hace nada.
         pass
     return '' # Devuelve una cadena vacía si no se cumple la condición o hay error.
 
+# Número de valores que se procesan por bloque al leer archivos grandes. Limita la memoria usada sin importar el tamaño del archivo.
+TAMANO_BLOQUE = 1_000_000
+
+# Umbrales de MAD (desviación absoluta media) de Nigrini para clasificar la conformidad con la Ley de Benford.
+# Cada lista tiene los límites para: conformidad cercana, aceptable y marginal. Por encima del último, no hay conformidad.
+UMBRALES_MAD = {
+    "primer": [0.006, 0.012, 0.015],
+    "primeros_dos": [0.0012, 0.0018, 0.0022],
+}
+
 def generar_distribucion_benford():
     """
     Calcula la distribución teórica de los primeros dígitos según la Ley de Benford.
@@ -67,73 +88,444 @@ def generar_distribucion_benford():
     # La fórmula np.log10(1 + 1/d) se aplica a cada elemento 'd' del array.
     return np.log10(1 + 1 / np.arange(1, 10))
 
+def generar_distribucion_benford_dos_digitos():
+    """
+    Calcula la distribución teórica de los dos primeros dígitos (10-99) según la Ley de Benford.
+
+    La probabilidad de que un número empiece por los dígitos 'd' (10-99) es P(d) = log10(1 + 1/d).
+
+    Returns:
+        numpy.ndarray: Un array con las probabilidades teóricas para los valores del 10 al 99.
+    """
+    return np.log10(1 + 1 / np.arange(10, 100))
+
+def generar_distribucion_ultimo_digito():
+    """
+    Calcula la distribución esperada del último dígito (0-9).
+
+    A diferencia del primer dígito, el último dígito de datos naturales debería ser uniforme:
+    cada dígito aparece con probabilidad 1/10. Excesos en algún dígito suelen indicar redondeos o cifras inventadas.
+
+    Returns:
+        numpy.ndarray: Un array con la probabilidad 0.1 para cada dígito del 0 al 9.
+    """
+    return np.full(10, 0.1)
+
+def obtener_parte_entera(numeros):
+    """
+    Convierte los números a un array con la parte entera de su valor absoluto, como str(abs(int(num))).
+
+    Args:
+        numeros (array-like): Números (enteros o flotantes).
+
+    Returns:
+        numpy.ndarray: Parte entera de cada número. Se descartan los valores no numéricos (NaN)
+                       y los que tienen parte entera cero, igual que con la condición int(num) != 0.
+    """
+    valores = np.floor(np.abs(np.asarray(numeros, dtype=float)))
+    return valores[np.isfinite(valores) & (valores >= 1)]
+
+def obtener_potencia_de_diez(valores):
+    """
+    Calcula, para cada valor >= 1, la potencia de 10 de su primer dígito: 10^floor(log10(v)).
+
+    Args:
+        valores (numpy.ndarray): Valores enteros mayores o iguales a 1.
+
+    Returns:
+        numpy.ndarray: La potencia de 10 de cada valor (ej. 1000 para 4523).
+    """
+    potencia = 10.0 ** np.floor(np.log10(valores))
+    # Corrige los errores de redondeo de log10 justo en las potencias de 10 (ej. log10(1000) = 2.9999...).
+    potencia = np.where(potencia > valores, potencia / 10, potencia)
+    return np.where(valores >= potencia * 10, potencia * 10, potencia)
+
 def obtener_primer_digito(numeros):
     """
-    Extrae el primer dígito significativo de una lista de números.
+    Extrae el primer dígito significativo de un conjunto de números sin convertirlos a texto.
+
+    Args:
+        numeros (array-like): Números (enteros o flotantes).
+
+    Returns:
+        numpy.ndarray: Un array de enteros (1-9) con el primer dígito de la parte entera
+                       de cada número. Los números cuya parte entera es cero son ignorados.
+    """
+    valores = obtener_parte_entera(numeros)
+    # floor(v / potencia) es el primer dígito: 4523 // 1000 = 4.
+    return (valores // obtener_potencia_de_diez(valores)).astype(np.int64)
+
+def contar_digitos(numeros):
+    """
+    Cuenta en una sola pasada las frecuencias del primer dígito, de los dos primeros dígitos
+    y del último dígito de la parte entera de los números.
+
+    Args:
+        numeros (array-like): Números (enteros o flotantes).
+
+    Returns:
+        dict: Conteos por prueba: 'primer' (dígitos 1-9), 'primeros_dos' (10-99) y 'ultimo' (0-9).
+              Los dos primeros y el último dígito solo se cuentan en números de al menos dos dígitos.
+    """
+    valores = obtener_parte_entera(numeros)
+    potencia = obtener_potencia_de_diez(valores)
+    primer = (valores // potencia).astype(np.int64)
+    dos_o_mas = valores >= 10
+    primeros_dos = (valores[dos_o_mas] // (potencia[dos_o_mas] / 10)).astype(np.int64)
+    ultimo = (valores[dos_o_mas] % 10).astype(np.int64)
+    # np.bincount cuenta cuántas veces aparece cada dígito, sin recorrer los datos una vez por dígito.
+    return {
+        "primer": np.bincount(primer, minlength=10)[1:10],
+        "primeros_dos": np.bincount(primeros_dos, minlength=100)[10:100],
+        "ultimo": np.bincount(ultimo, minlength=10),
+    }
+
+def sumar_conteos(conteos, conteos_bloque):
+    """
+    Acumula los conteos de un bloque sobre los conteos totales.
+
+    Args:
+        conteos (dict or None): Conteos acumulados hasta el momento (None si es el primer bloque).
+        conteos_bloque (dict): Conteos del bloque, como los devuelve contar_digitos.
+
+    Returns:
+        dict: Los conteos acumulados.
+    """
+    if conteos is None:
+        return conteos_bloque
+    return {prueba: conteos[prueba] + conteos_bloque[prueba] for prueba in conteos}
+
+def columnas_numericas_csv(archivo):
+    """
+    Recorre el CSV por bloques y devuelve la posición de las columnas que son numéricas en todos los bloques.
+    Una columna con un solo valor de texto no es numérica, igual que al leer el archivo completo con pd.read_csv.
+
+    Args:
+        archivo: Archivo CSV (ruta o archivo cargado en Streamlit).
+
+    Returns:
+        list or None: Posiciones de las columnas numéricas, o None si el archivo no tiene datos.
+    """
+    numericas = None
+    for bloque in pd.read_csv(archivo, chunksize=TAMANO_BLOQUE):
+        # El tipo de cada columna se infiere en cada bloque, así que se conservan solo las que son numéricas en todos
+        posiciones = {i for i, tipo in enumerate(bloque.dtypes) if pd.api.types.is_numeric_dtype(tipo) and not pd.api.types.is_bool_dtype(tipo)}
+        numericas = posiciones if numericas is None else numericas & posiciones
+    return None if numericas is None else sorted(numericas)
+
+def contar_digitos_csv(archivo):
+    """
+    Lee un CSV por bloques de TAMANO_BLOQUE filas y cuenta los dígitos de todas sus columnas numéricas,
+    de forma que archivos con decenas de millones de montos no se cargan completos en memoria.
+    Las columnas numéricas se deciden una sola vez para todo el archivo (ver columnas_numericas_csv)
+    y se usan las mismas en todos los bloques.
+
+    Args:
+        archivo: Archivo CSV (ruta o archivo cargado en Streamlit).
+
+    Returns:
+        dict or None: Conteos acumulados, o None si el archivo no tiene datos.
+    """
+    numericas = columnas_numericas_csv(archivo)
+    if numericas is None:
+        return None
+    if not numericas:
+        return contar_digitos(np.empty(0))
+    if hasattr(archivo, "seek"):
+        archivo.seek(0)
+    conteos = None
+    for bloque in pd.read_csv(archivo, usecols=numericas, dtype=float, chunksize=TAMANO_BLOQUE):
+        # to_numpy convierte las columnas numéricas en un solo array. Los NaN se descartan al contar.
+        numeros = bloque.to_numpy(dtype=float).ravel()
+        conteos = sumar_conteos(conteos, contar_digitos(numeros))
+    return conteos
+
+def contar_digitos_lineas(lineas):
+    """
+    Cuenta los dígitos de un iterable de líneas de texto (un número por línea), procesándolas en bloques.
+
+    Args:
+        lineas (iterable): Líneas de texto. Las que no son números válidos se ignoran.
+
+    Returns:
+        dict or None: Conteos acumulados, o None si no hay líneas.
+    """
+    conteos = None
+    lineas = iter(lineas)
+    while bloque := list(itertools.islice(lineas, TAMANO_BLOQUE)):
+        # pd.to_numeric con errors='coerce' convierte todo el bloque de una vez y marca como NaN las líneas que no son números.
+        numeros = pd.to_numeric(pd.Series(bloque).str.strip(), errors="coerce").to_numpy(dtype=float)
+        conteos = sumar_conteos(conteos, contar_digitos(numeros))
+    return conteos
+
+def contar_primer_digito_por_grupo(grupos, numeros):
+    """
+    Cuenta la frecuencia del primer dígito de cada grupo (proveedor, sucursal, cuenta, etc.) en una sola pasada.
+
+    Cada par (grupo, dígito) se codifica como un único entero: código_grupo * 9 + (dígito - 1), de modo que
+    un solo np.bincount cuenta los dígitos de todos los grupos a la vez, sin recorrer los datos por grupo.
+
+    Args:
+        grupos (array-like): Valor de la columna de agrupación de cada número.
+        numeros (array-like): Números a analizar, alineados con 'grupos'.
+
+    Returns:
+        pandas.DataFrame: Conteos con un grupo por fila y una columna por dígito (1-9).
+    """
+    # pd.factorize asigna un código entero a cada grupo distinto. Los grupos vacíos (NaN) reciben el código -1.
+    codigos, etiquetas = pd.factorize(pd.Series(grupos))
+    valores = np.floor(np.abs(np.asarray(numeros, dtype=float)))
+    validos = np.isfinite(valores) & (valores >= 1) & (codigos >= 0)
+    valores, codigos = valores[validos], codigos[validos]
+    primer = (valores // obtener_potencia_de_diez(valores)).astype(np.int64)
+    conteos = np.bincount(codigos * 9 + primer - 1, minlength=len(etiquetas) * 9).reshape(len(etiquetas), 9)
+    return pd.DataFrame(conteos, index=etiquetas, columns=list(range(1, 10)))
+
+def contar_primer_digito_por_grupo_csv(archivo, columna_grupo, columna_valor):
+    """
+    Lee un CSV por bloques de TAMANO_BLOQUE filas y acumula los conteos del primer dígito de cada grupo.
+
+    Args:
+        archivo: Archivo CSV (ruta o archivo cargado en Streamlit).
+        columna_grupo (str): Columna por la que se agrupan los números.
+        columna_valor (str): Columna con los montos a analizar.
+
+    Returns:
+        pandas.DataFrame: Conteos con un grupo por fila y una columna por dígito (1-9).
+    """
+    dfConteos = None
+    # La columna de agrupación se lee como texto para que un mismo grupo tenga el mismo tipo en todos los bloques.
+    for bloque in pd.read_csv(archivo, usecols=[columna_grupo, columna_valor], dtype={columna_grupo: str}, chunksize=TAMANO_BLOQUE):
+        # pd.to_numeric con errors='coerce' descarta los montos que no son números.
+        dfBloque = contar_primer_digito_por_grupo(bloque[columna_grupo], pd.to_numeric(bloque[columna_valor], errors='coerce'))
+        # .add alinea los grupos por índice, así un grupo que aparece en varios bloques suma sus conteos.
+        dfConteos = dfBloque if dfConteos is None else dfConteos.add(dfBloque, fill_value=0)
+    if dfConteos is None:
+        return pd.DataFrame(columns=list(range(1, 10)), dtype=np.int64)
+    return dfConteos.astype(np.int64)
+
+def rankear_grupos(dfConteos, esperadas, min_datos=1):
+    """
+    Calcula chi-cuadrado y MAD de todos los grupos a la vez y los ordena del más al menos desviado de Benford.
+
+    Args:
+        dfConteos (pandas.DataFrame): Conteos del primer dígito por grupo (grupos x dígitos).
+        esperadas (numpy.ndarray): Proporciones esperadas de cada dígito.
+        min_datos (int, optional): Número mínimo de datos para incluir un grupo. Con pocos datos la prueba no es confiable.
+
+    Returns:
+        pandas.DataFrame: Un grupo por fila con el número de datos, chi-cuadrado, p-valor, MAD y conformidad,
+                          ordenado por MAD de mayor a menor.
+    """
+    conteos = dfConteos.to_numpy(dtype=float)
+    n = conteos.sum(axis=1)
+    incluidos = n >= max(min_datos, 1)
+    conteos, n = conteos[incluidos], n[incluidos]
+    # Operaciones sobre la matriz completa: cada fila es un grupo y cada columna un dígito.
+    observadas = conteos / n[:, None]
+    mad = np.mean(np.abs(observadas - esperadas), axis=1)
+    chi2 = n * np.sum((observadas - esperadas) ** 2 / esperadas, axis=1)
+    umbrales = UMBRALES_MAD["primer"]
+    dfRanking = pd.DataFrame({
+        'Grupo': dfConteos.index[incluidos],
+        'Números analizados': n.astype(np.int64),
+        'Chi-cuadrado': chi2,
+        'p-valor': stats.chi2.sf(chi2, df=len(esperadas) - 1),
+        'MAD': mad,
+        # np.select asigna la etiqueta de conformidad según el primer umbral que cumple cada MAD.
+        'Conformidad (MAD)': np.select([mad <= umbrales[0], mad <= umbrales[1], mad <= umbrales[2]],
+                                       ["Cercana", "Aceptable", "Marginal"], default="No conforme"),
+    })
+    return dfRanking.sort_values(['MAD', 'Chi-cuadrado'], ascending=False, ignore_index=True)
+
+def calcular_estadisticos(conteos, esperadas):
+    """
+    Calcula los estadísticos de conformidad entre las frecuencias observadas y las esperadas.
 
     Args:
-        numeros (list): Una lista de números (enteros o flotantes).
+        conteos (numpy.ndarray): Conteos observados de cada dígito.
+        esperadas (numpy.ndarray): Proporciones esperadas de cada dígito.
 
     Returns:
-        list: Una lista de cadenas, donde cada cadena es el primer dígito significativo
-              del número correspondiente. Los números cero son ignorados.
+        dict: Número de datos 'n', proporciones 'observadas', estadístico 'chi2', su 'p_valor'
+              y la desviación absoluta media 'mad'.
+    """
+    n = conteos.sum()
+    observadas = conteos / n if n else np.zeros(len(conteos))
+    chi2 = n * np.sum((observadas - esperadas) ** 2 / esperadas)
+    return {
+        "n": int(n),
+        "observadas": observadas,
+        "chi2": chi2,
+        "p_valor": stats.chi2.sf(chi2, df=len(esperadas) - 1),
+        "mad": np.mean(np.abs(observadas - esperadas)),
+    }
+
+def conformidad_mad(mad, prueba):
     """
-    # Se utiliza una comprensión de listas para procesar cada número.
-    # str(abs(int(num)))[0]:
-    #   1. int(num): Convierte el número a entero (trunca decimales).
-    #   2. abs(...): Toma el valor absoluto para manejar números negativos.
-    #   3. str(...): Convierte el entero a cadena.
-    #   4. [0]: Extrae el primer carácter de la cadena (el primer dígito).
-    #   La condición `if int(num) != 0` asegura que no se procesen números que sean cero.
-    return [str(str(abs(int(num)))[0]) for num in numeros if int(num) != 0]
+    Clasifica la MAD según los umbrales de Nigrini de la prueba.
 
-def detect_anomalies(observed, expected, threshold=0.05):
+    Returns:
+        str: 'Cercana', 'Aceptable', 'Marginal', 'No conforme' o '-' si la prueba no tiene umbrales.
+    """
+    if prueba not in UMBRALES_MAD:
+        return "-"
+    for limite, etiqueta in zip(UMBRALES_MAD[prueba], ["Cercana", "Aceptable", "Marginal"]):
+        if mad <= limite:
+            return etiqueta
+    return "No conforme"
+
+def detect_anomalies(observed, expected, threshold=0.05, digits=None):
     """
     Detecta los dígitos cuya frecuencia observada se desvía de la frecuencia esperada
     (Ley de Benford) más allá de un umbral especificado.
 
     Args:
-        observed (numpy.ndarray): Array de frecuencias observadas para los dígitos 1-9.
-        expected (numpy.ndarray): Array de frecuencias esperadas (Benford) para los dígitos 1-9.
+        observed (numpy.ndarray): Array de frecuencias observadas para cada dígito.
+        expected (numpy.ndarray): Array de frecuencias esperadas para cada dígito.
         threshold (float, optional): El umbral de desviación para considerar una anomalía.
                                      Por defecto es 0.05 (5%).
+        digits (list, optional): Etiquetas de los dígitos. Por defecto, del 1 al 9.
 
     Returns:
         tuple:
-            - list: Una lista de los dígitos (1-9) que se consideran anómalos.
+            - list: Una lista de los dígitos que se consideran anómalos.
             - pandas.DataFrame: Un DataFrame con los dígitos, sus frecuencias observadas,
                                 esperadas y la diferencia absoluta.
     """
-    anomalies = [] # Lista para almacenar los dígitos anómalos.
+    if digits is None:
+        digits = list(range(1, 10))
     # Calcula la diferencia absoluta entre las frecuencias observadas y esperadas.
     differences = np.abs(observed - expected)
-    # Itera sobre las frecuencias observadas y esperadas.
-    for i, (obs, exp) in enumerate(zip(observed, expected)):
-        # Si la diferencia absoluta entre la frecuencia observada y esperada es mayor que el umbral.
-        if abs(obs - exp) >= threshold:
-            anomalies.append(i + 1) # Añade el dígito (i+1 porque i es 0-8) a la lista de anomalías.
+    # Compara todas las diferencias con el umbral a la vez. np.flatnonzero devuelve las posiciones que lo superan.
+    anomalies = [digits[i] for i in np.flatnonzero(differences >= threshold)]
 
     # Creación de un DataFrame de Pandas para mostrar la comparación detallada.
     # Esta es una transformación de datos importante con Pandas.
     dfComparacion = pd.DataFrame({
-        'Dígito': list(range(1, 10)),      # Columna 'Dígito' con los números del 1 al 9.
+        'Dígito': digits,                  # Columna 'Dígito' con las etiquetas de los dígitos.
         'Frecuencia Observada': observed,  # Columna con las frecuencias observadas.
         'Frecuencia Esperada': expected,   # Columna con las frecuencias esperadas (Benford).
         'Diferencia': differences          # Columna con las diferencias absolutas calculadas.
     })
     return anomalies, dfComparacion
 
+def grafico_digitos(digits, observed_freq, expected_freq, anomalies, title, expected_name='Benford'):
+    """
+    Crea el gráfico de barras de frecuencias observadas contra la línea de frecuencias esperadas.
+
+    Args:
+        digits (list): Etiquetas de los dígitos (eje X).
+        observed_freq (numpy.ndarray): Frecuencias observadas.
+        expected_freq (numpy.ndarray): Frecuencias esperadas.
+        anomalies (list): Dígitos anómalos, que se resaltan en rojo.
+        title (str): Título del gráfico y del eje X.
+        expected_name (str, optional): Nombre de la línea esperada en la leyenda.
+
+    Returns:
+        plotly.graph_objects.Figure: La figura de Plotly.
+    """
+    fig = go.Figure() # Inicializa una figura de Plotly.
+
+    # Añade las barras de frecuencia observada al gráfico.
+    fig.add_trace(go.Bar(
+        x=digits,             # Eje X: Dígitos.
+        y=observed_freq,      # Eje Y: Frecuencias observadas.
+        name='Observado',     # Nombre de esta traza para la leyenda.
+        # Color condicional: rojo si el dígito está en la lista de anomalías, azul por defecto.
+        marker_color=['#C62E2E' if d in anomalies else '#1f77b4' for d in digits],
+        opacity=0.7,          # Opacidad de las barras.
+        text=observed_freq,   # Texto que se mostrará en las barras (frecuencia observada).
+        # Formato del texto como porcentaje con 2 decimales. Con muchos dígitos no se muestra para no saturar el gráfico.
+        texttemplate="%{text:.2%}" if len(digits) <= 10 else None,
+    ))
+
+    # Añade la línea de la frecuencia esperada al gráfico.
+    fig.add_trace(go.Scatter(
+        x=digits,             # Eje X: Dígitos.
+        y=expected_freq,      # Eje Y: Frecuencias esperadas.
+        mode='lines+markers', # Modo de la traza: líneas y marcadores.
+        name=expected_name,   # Nombre de esta traza para la leyenda.
+        line=dict(color='orange', width=3), # Estilo de la línea.
+        marker=dict(symbol='circle', size=8 if len(digits) <= 10 else 4, color='orange'), # Estilo de los marcadores.
+    ))
+
+    # Configuración del layout del gráfico Plotly.
+    fig.update_layout(
+        xaxis=dict(title=title, tickmode='array', tickvals=digits if len(digits) <= 10 else digits[::10]), # Configuración del eje X.
+        yaxis=dict(title='Frecuencia'), # Título del eje Y (antes de formatear a porcentaje).
+        bargap=0.2, # Espacio entre barras.
+        title=f"Distribución de {title.lower()}" # Título del gráfico.
+    )
+    # Formatea las etiquetas del eje Y como porcentajes.
+    fig.update_yaxes(tickformat=".2%", title="Porcentaje")
+    return fig
+
 # Título principal de la aplicación Streamlit.
 st.title("Validación de la Ley de Benford")
 
 # Creación de pestañas en la interfaz de Streamlit para diferentes métodos de entrada de datos.
 tab = st.segmented_control(
     "Origen de los datos",
-    options=[":material/description: Carga Archivo", ":material/numbers: Carga Texto"],
+    options=[":material/description: Carga Archivo", ":material/numbers: Carga Texto", ":material/groups: Análisis por Grupo"],
     default=":material/description: Carga Archivo", # Pestaña por defecto al cargar la aplicación.
     selection_mode="single",
 )
-numeros=None
+@st.cache_data(show_spinner="Contando dígitos...")
+def contar_digitos_archivo(archivo_cargado):
+    """
+    Cuenta los dígitos del archivo cargado según su tipo. El resultado queda en caché, de modo que
+    cambiar el umbral no vuelve a leer el archivo.
+
+    Args:
+        archivo_cargado (UploadedFile): Archivo CSV, XLSX o TXT cargado en Streamlit.
+
+    Returns:
+        dict or None: Conteos de dígitos por prueba.
+    """
+    archivo_cargado.seek(0)
+    if archivo_cargado.name.endswith('.csv'):
+        # Procesamiento de archivos CSV por bloques de filas.
+        return contar_digitos_csv(archivo_cargado)
+    elif archivo_cargado.name.endswith('.xlsx'):
+        # Procesamiento de archivos Excel (XLSX). Excel no se puede leer por bloques, así que se carga completo.
+        # pd.read_excel(): Lee el archivo Excel en un DataFrame de Pandas.
+        df = pd.read_excel(archivo_cargado)
+        # Se toman todas las columnas numéricas como un solo array. (Transformaciones Pandas)
+        return contar_digitos(df.select_dtypes(include=[np.number]).to_numpy(dtype=float).ravel())
+    elif archivo_cargado.name.endswith('.txt'):
+        # Procesamiento de archivos de texto (TXT).
+        # io.TextIOWrapper decodifica el archivo como UTF-8 línea a línea, sin crear una copia completa del texto.
+        return contar_digitos_lineas(io.TextIOWrapper(archivo_cargado, encoding='utf-8'))
+
+@st.cache_data(show_spinner="Contando dígitos por grupo...")
+def contar_grupos_archivo(archivo_cargado, columna_grupo, columna_valor):
+    """
+    Cuenta el primer dígito por grupo del archivo cargado. El resultado queda en caché por archivo y columnas.
+
+    Args:
+        archivo_cargado (UploadedFile): Archivo CSV o XLSX cargado en Streamlit.
+        columna_grupo (str): Columna por la que se agrupan los números.
+        columna_valor (str): Columna con los montos a analizar.
+
+    Returns:
+        pandas.DataFrame: Conteos con un grupo por fila y una columna por dígito (1-9).
+    """
+    archivo_cargado.seek(0)
+    if archivo_cargado.name.endswith('.csv'):
+        return contar_primer_digito_por_grupo_csv(archivo_cargado, columna_grupo, columna_valor)
+    df = pd.read_excel(archivo_cargado, usecols=[columna_grupo, columna_valor])
+    return contar_primer_digito_por_grupo(df[columna_grupo], pd.to_numeric(df[columna_valor], errors='coerce'))
+
+# Definición de las pruebas: nombre, etiquetas de los dígitos, distribución esperada y nombre de la distribución esperada.
+PRUEBAS = {
+    "primer": ("Primer dígito", list(range(1, 10)), generar_distribucion_benford(), "Benford"),
+    "primeros_dos": ("Primeros dos dígitos", list(range(10, 100)), generar_distribucion_benford_dos_digitos(), "Benford"),
+    "ultimo": ("Último dígito", list(range(0, 10)), generar_distribucion_ultimo_digito(), "Uniforme"),
+}
+
+conteos = None
+dfConteosGrupos = None
 # Contenido de la pestaña "Carga Archivo".
 with st.container(border=True): # Utiliza un contenedor para agrupar widgets y contenido.
     if tab == ":material/description: Carga Archivo":
@@ -143,123 +535,130 @@ with st.container(border=True): # Utiliza un contenedor para agrupar widgets y c
 
         # Widget de Streamlit para cargar archivos. Permite tipos CSV, XLSX, TXT.
         archivo_cargado = st.file_uploader("Carga un archivo (CSV, Excel, TXT)", type=["csv", "xlsx", "txt"])
-        numeros = [] # Inicializa la lista para almacenar los números extraídos.
 
         if archivo_cargado: # Si se ha cargado un archivo:
+            # Los números no se guardan: se leen por bloques y solo se acumulan los conteos de dígitos.
+            conteos = contar_digitos_archivo(archivo_cargado)
+
+    # Contenido de la pestaña "Análisis por Grupo".
+    elif tab == ":material/groups: Análisis por Grupo":
+        st.write("""
+        Carga un archivo con una columna de agrupación (proveedor, sucursal, cuenta...) y una columna de montos.
+        Se analizan todos los grupos a la vez y se ordenan según qué tanto se desvían de la Ley de Benford.
+        """)
+        archivo_cargado = st.file_uploader("Carga un archivo (CSV, Excel)", type=["csv", "xlsx"])
+        if archivo_cargado:
+            # Solo se leen los encabezados para elegir las columnas.
+            archivo_cargado.seek(0)
             if archivo_cargado.name.endswith('.csv'):
-                # Procesamiento de archivos CSV.
-                # pd.read_csv(): Lee el archivo CSV en un DataFrame de Pandas.
-                df = pd.read_csv(archivo_cargado)
-                # Extracción de números:
-                # 1. df.select_dtypes(include=[np.number]): Selecciona solo las columnas numéricas del DataFrame. (Transformación Pandas)
-                # 2. .stack(): Apila las columnas del DataFrame en una Serie, útil si hay múltiples columnas numéricas. (Transformación Pandas)
-                # 3. pd.to_numeric(..., errors='coerce'): Convierte los valores a numéricos. Si un valor no puede ser convertido, se reemplaza por NaT/NaN (Not a Time/Not a Number). (Transformación Pandas)
-                # 4. .dropna(): Elimina las filas/valores que son NaT/NaN. (Transformación Pandas)
-                # 5. .tolist(): Convierte la Serie resultante a una lista de Python.
-                numeros = pd.to_numeric(df.select_dtypes(include=[np.number]).stack(), errors='coerce').dropna().tolist()
-            elif archivo_cargado.name.endswith('.xlsx'):
-                # Procesamiento de archivos Excel (XLSX).
-                # pd.read_excel(): Lee el archivo Excel en un DataFrame de Pandas.
-                df = pd.read_excel(archivo_cargado)
-                # La extracción de números sigue la misma lógica que para los archivos CSV. (Transformaciones Pandas)
-                numeros = pd.to_numeric(df.select_dtypes(include=[np.number]).stack(), errors='coerce').dropna().tolist()
-            elif archivo_cargado.name.endswith('.txt'):
-                # Procesamiento de archivos de texto (TXT).
-                # archivo_cargado.read().decode('utf-8'): Lee el contenido del archivo y lo decodifica como UTF-8.
-                content = archivo_cargado.read().decode('utf-8')
-                # Se procesa cada línea del archivo:
-                # line.strip(): Elimina espacios en blanco al inicio y final de la línea.
-                # line.strip().replace('.', '', 1).replace('-', '', 1).isdigit(): Verifica si la línea (después de quitar un punto decimal y un signo negativo) consiste solo en dígitos.
-                # float(...): Convierte la línea a un número flotante.
-                numeros = [float(line.strip()) for line in content.splitlines() if line.strip().replace('.', '', 1).replace('-', '', 1).isdigit()]
+                columnas = pd.read_csv(archivo_cargado, nrows=0).columns.tolist()
+            else:
+                columnas = pd.read_excel(archivo_cargado, nrows=0).columns.tolist()
+            c1, c2, c3 = st.columns(3)
+            parColumnaGrupo = c1.selectbox("Columna de agrupación", columnas)
+            parColumnaValor = c2.selectbox("Columna de montos", columnas, index=min(1, len(columnas) - 1))
+            parMinDatos = c3.number_input("Mínimo de números por grupo", min_value=1, value=50, step=10,
+                                          help="Los grupos con pocos números no permiten concluir si siguen o no la Ley de Benford.")
+            if parColumnaGrupo == parColumnaValor:
+                st.warning("Selecciona columnas distintas para la agrupación y los montos.")
+            else:
+                dfConteosGrupos = contar_grupos_archivo(archivo_cargado, parColumnaGrupo, parColumnaValor)
 
     # Contenido de la pestaña "Carga Texto".
     else:
         # Widget de Streamlit para entrada de texto multilínea.
         text_input = st.text_area("Pega los números aquí (uno por línea):")
         if text_input: # Si se ha ingresado texto:
-            # La extracción de números sigue una lógica similar a la de los archivos TXT.
-            numeros = [float(line.strip()) for line in text_input.splitlines() if line.strip().replace('.', '', 1).replace('-', '', 1).isdigit()]
+            # La extracción de números sigue la misma lógica que la de los archivos TXT.
+            conteos = contar_digitos_lineas(text_input.splitlines())
 
     # Widget de Streamlit para ingresar el umbral de desviación como un número.
     # El valor se ingresa como porcentaje (0-100) y luego se convierte a proporción (0-1).
-    parUmbral = st.number_input("Umbral de desviación para detectar anomalías (%)", min_value=0.0, max_value=100.0, value=5.0, step=1.0)
+    parUmbral = st.number_input("Umbral de desviación para detectar anomalías (%)", min_value=0.0, max_value=100.0, value=5.0, step=1.0,
+                                help="Se aplica al primer dígito. En las demás pruebas se ajusta al número de dígitos posibles (ej. se divide entre 10 en la prueba de dos dígitos).")
     parUmbral = parUmbral / 100 # Convierte el porcentaje a una proporción.
 
-if numeros: # Si la lista 'numeros' contiene datos:
-    # Extrae los primeros dígitos de los números.
-    digits = obtener_primer_digito(numeros)
-    # Cuenta la frecuencia de cada primer dígito (1-9).
-    digit_counts = {str(d): digits.count(str(d)) for d in range(1, 10)}
-    
-    # Creación de un DataFrame de Pandas para almacenar las frecuencias de los dígitos. (Transformación Pandas)
-    dfDatos = pd.DataFrame(list(digit_counts.items()), columns=['Dígito', 'Frecuencia'])
-    # Cálculo del porcentaje de cada dígito. (Transformación Pandas: creación de nueva columna basada en otras)
-    dfDatos['Porcentaje'] = (dfDatos['Frecuencia'] / dfDatos['Frecuencia'].sum())
-    
-    # Obtiene las frecuencias observadas como un array NumPy desde el DataFrame.
-    observed_freq = dfDatos['Porcentaje'].values
-    # Obtiene las frecuencias esperadas según la Ley de Benford.
+if dfConteosGrupos is not None: # Si se analizó un archivo por grupos:
     expected_freq = generar_distribucion_benford()
-
-    # Detecta anomalías comparando las frecuencias observadas y esperadas con el umbral.
-    anomalies, dfDiferencias = detect_anomalies(observed_freq, expected_freq, parUmbral)
-
-    st.subheader("Distribución de dígitos iniciales") # Subtítulo para la sección de resultados.
-    fig = go.Figure() # Inicializa una figura de Plotly.
-
-    # Añade las barras de frecuencia observada al gráfico.
-    fig.add_trace(go.Bar(
-        x=list(range(1, 10)), # Eje X: Dígitos del 1 al 9.
-        y=observed_freq,      # Eje Y: Frecuencias observadas.
-        name='Observado',     # Nombre de esta traza para la leyenda.
-        # Color condicional: rojo si el dígito está en la lista de anomalías, azul por defecto.
-        marker_color=['#C62E2E' if (d+1) in anomalies else '#1f77b4' for d in range(9)],
-        opacity=0.7,          # Opacidad de las barras.
-        text=observed_freq,   # Texto que se mostrará en las barras (frecuencia observada).
-        texttemplate="%{text:.2%}", # Formato del texto como porcentaje con 2 decimales.
-    ))
-
-    # Añade la línea de la Ley de Benford (frecuencia esperada) al gráfico.
-    fig.add_trace(go.Scatter(
-        x=list(range(1, 10)), # Eje X: Dígitos del 1 al 9.
-        y=expected_freq,      # Eje Y: Frecuencias esperadas (Benford).
-        mode='lines+markers', # Modo de la traza: líneas, marcadores y texto.
-        name='Benford',       # Nombre de esta traza para la leyenda.
-        line=dict(color='orange', width=3), # Estilo de la línea.
-        marker=dict(symbol='circle', size=8, color='orange'), # Estilo de los marcadores.        
-    ))
-
-    # Configuración del layout del gráfico Plotly.
-    fig.update_layout(
-        xaxis=dict(title='Dígito inicial', tickmode='array', tickvals=list(range(1, 10))), # Configuración del eje X.
-        yaxis=dict(title='Frecuencia'), # Título del eje Y (antes de formatear a porcentaje).
-        bargap=0.2, # Espacio entre barras.
-        title="Distribución de dígitos iniciales" # Título del gráfico.
-    )
-    # Formatea las etiquetas del eje Y como porcentajes.
-    fig.update_yaxes(tickformat=".2%", title="Porcentaje")
-    
-    # Divide la interfaz en dos columnas para mostrar el gráfico y la tabla de diferencias.
-    c1, c2 = st.columns([6,4]) # La primera columna es más ancha que la segunda.
-    with c1: # Contenido de la primera columna.
-        # Muestra el gráfico Plotly.
+    # Calcula chi-cuadrado y MAD de todos los grupos con operaciones sobre la matriz de conteos.
+    dfRanking = rankear_grupos(dfConteosGrupos, expected_freq, parMinDatos)
+    st.subheader("Ranking de grupos por desviación de la Ley de Benford")
+    if dfRanking.empty:
+        st.info("Ningún grupo tiene el mínimo de números requerido para el análisis.")
+        st.stop()
+    columns = st.columns(3)
+    columns[0].metric("Grupos analizados", f"{len(dfRanking):,}")
+    columns[1].metric("Grupos no conformes", f"{(dfRanking['Conformidad (MAD)'] == 'No conforme').sum():,}")
+    columns[2].metric("Grupos excluidos (pocos datos)", f"{len(dfConteosGrupos) - len(dfRanking):,}")
+
+    c1, c2 = st.columns([5,5])
+    with c1:
+        # Tabla con todos los grupos ordenados por MAD. Al seleccionar una fila se muestra el detalle del grupo.
+        evento = st.dataframe(dfRanking, use_container_width=True, hide_index=True, on_select="rerun", selection_mode="single-row",
+                              column_config={'Chi-cuadrado': st.column_config.NumberColumn(format="%.2f"),
+                                             'p-valor': st.column_config.NumberColumn(format="%.4f"),
+                                             'MAD': st.column_config.NumberColumn(format="%.4f")})
+    with c2:
+        # Detalle del grupo seleccionado (por defecto, el más desviado).
+        filas = evento.selection.rows
+        grupo = dfRanking['Grupo'].iloc[filas[0] if filas else 0]
+        conteos_grupo = dfConteosGrupos.loc[grupo].to_numpy()
+        observed_freq = conteos_grupo / conteos_grupo.sum()
+        anomalies, _ = detect_anomalies(observed_freq, expected_freq, parUmbral)
+        fig = grafico_digitos(list(range(1, 10)), observed_freq, expected_freq, anomalies, "Primer dígito")
+        fig.update_layout(title=f"Primer dígito: {grupo}")
         st.plotly_chart(fig, use_container_width=True)
-    with c2: # Contenido de la segunda columna.
-        # Formateo de columnas del DataFrame 'dfDiferencias' para mostrar como porcentajes.
-        # .applymap(lambda x: f"{x:.2%}"): Aplica una función lambda a cada celda de las columnas seleccionadas para formatearlas como string de porcentaje. (Transformación Pandas)
-        dfDiferencias[['Frecuencia Observada', 'Frecuencia Esperada', 'Diferencia']] = dfDiferencias[['Frecuencia Observada', 'Frecuencia Esperada', 'Diferencia']].applymap(lambda x: f"{x:.2%}")
-
-        # Aplicación de estilo condicional al DataFrame para colorear las diferencias anómalas.
-        # .style.applymap(): Aplica la función 'color_diferencia' a la columna 'Diferencia'. (Estilización Pandas)
-        dfDiferencias_styled = dfDiferencias.style.applymap(color_diferencia, subset=['Diferencia'])
-        # Muestra el DataFrame estilizado en Streamlit.
-        st.dataframe(dfDiferencias_styled, use_container_width=True, hide_index=True)
-
-        # Muestra un mensaje de advertencia si se detectan anomalías.
-        if anomalies:
-            st.warning(f"¡Anomalía detectada en los dígitos: {', '.join(map(str, anomalies))}!")
-        else: # Muestra un mensaje de éxito si no se detectan anomalías.
-            st.success("No se detectaron anomalías significativas según la Ley de Benford.")
+elif conteos is not None and conteos["primer"].sum() > 0: # Si hay números con dígitos para analizar:
+    # Calcula para cada prueba las frecuencias observadas, chi-cuadrado y MAD.
+    resultados = {prueba: calcular_estadisticos(conteos[prueba], PRUEBAS[prueba][2]) for prueba in PRUEBAS}
+
+    st.subheader("Distribución de dígitos") # Subtítulo para la sección de resultados.
+    # Tabla resumen con los estadísticos de todas las pruebas. (Transformación Pandas)
+    dfEstadisticos = pd.DataFrame([{
+        'Prueba': PRUEBAS[prueba][0],
+        'Números analizados': resultado['n'],
+        'Chi-cuadrado': resultado['chi2'],
+        'p-valor': resultado['p_valor'],
+        'MAD': resultado['mad'],
+        'Conformidad (MAD)': conformidad_mad(resultado['mad'], prueba),
+    } for prueba, resultado in resultados.items()])
+    st.dataframe(dfEstadisticos, use_container_width=True, hide_index=True,
+                 column_config={'Chi-cuadrado': st.column_config.NumberColumn(format="%.2f"),
+                                'p-valor': st.column_config.NumberColumn(format="%.4f"),
+                                'MAD': st.column_config.NumberColumn(format="%.4f")})
+
+    # Una pestaña por prueba con su gráfico y su tabla de diferencias.
+    for tab_prueba, (prueba, (titulo, digits, expected_freq, expected_name)) in zip(st.tabs([p[0] for p in PRUEBAS.values()]), PRUEBAS.items()):
+        with tab_prueba:
+            # Obtiene las frecuencias observadas de la prueba.
+            observed_freq = resultados[prueba]['observadas']
+            # El umbral se ajusta al número de dígitos posibles: con más dígitos cada frecuencia esperada es menor.
+            umbral = parUmbral * 9 / len(digits)
+
+            # Detecta anomalías comparando las frecuencias observadas y esperadas con el umbral.
+            anomalies, dfDiferencias = detect_anomalies(observed_freq, expected_freq, umbral, digits)
+            fig = grafico_digitos(digits, observed_freq, expected_freq, anomalies, titulo, expected_name)
+
+            # Divide la interfaz en dos columnas para mostrar el gráfico y la tabla de diferencias.
+            c1, c2 = st.columns([6,4]) # La primera columna es más ancha que la segunda.
+            with c1: # Contenido de la primera columna.
+                # Muestra el gráfico Plotly.
+                st.plotly_chart(fig, use_container_width=True, key=f"chart-{prueba}")
+            with c2: # Contenido de la segunda columna.
+                # Formateo de columnas del DataFrame 'dfDiferencias' para mostrar como porcentajes.
+                # .applymap(lambda x: f"{x:.2%}"): Aplica una función lambda a cada celda de las columnas seleccionadas para formatearlas como string de porcentaje. (Transformación Pandas)
+                dfDiferencias[['Frecuencia Observada', 'Frecuencia Esperada', 'Diferencia']] = dfDiferencias[['Frecuencia Observada', 'Frecuencia Esperada', 'Diferencia']].applymap(lambda x: f"{x:.2%}")
+
+                # Aplicación de estilo condicional al DataFrame para colorear las diferencias anómalas.
+                # .style.applymap(): Aplica la función 'color_diferencia' a la columna 'Diferencia' con el umbral de la prueba. (Estilización Pandas)
+                dfDiferencias_styled = dfDiferencias.style.applymap(color_diferencia, subset=['Diferencia'], umbral=umbral)
+                # Muestra el DataFrame estilizado en Streamlit.
+                st.dataframe(dfDiferencias_styled, use_container_width=True, hide_index=True)
+
+                # Muestra un mensaje de advertencia si se detectan anomalías.
+                if anomalies:
+                    st.warning(f"¡Anomalía detectada en los dígitos: {', '.join(map(str, anomalies))}!")
+                else: # Muestra un mensaje de éxito si no se detectan anomalías.
+                    st.success(f"No se detectaron anomalías significativas según la distribución {expected_name}.")
 else: # Si no se han cargado o ingresado números.
-    st.info("Por favor, carga o ingresa un listado de números para analizar.")
\ No newline at end of file
+    st.info("Por favor, carga o ingresa un listado de números para analizar.")
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup # pip install beautifulsoup4
+import asyncio
+import time
+import rastreadorSitio as rs # Rastreador asíncrono del sitio (aiohttp)
 
 st.set_page_config(
     page_title="Website Scraper",
@@ -9,74 +10,66 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Extrae el texto de una página web
-def extraerTextoDeURL(url):
-    urlOrigen = requests.get(url)
-    soup = BeautifulSoup(urlOrigen.content,"html.parser")
-    return soup.get_text()
-
 # Convierte un dataframe a CSV
 def convertir_df_to_csv(df):
     return df.to_csv(index=False).encode("utf-8")
 
 # Función que procesa una URL y llena un dataframe
-def procesarURLDataFrame(url,nivelMaximo):
-    """Procesa una URL y llena un dataframe con los textos
+def procesarURLDataFrame(url,nivelMaximo,maxPaginas,concurrencia,conexionesPorHost,usarCache=True):
+    """Rastrea el sitio de forma asíncrona (ver rastreadorSitio.py) y llena un dataframe con los textos.
+    Las filas se acumulan en una lista a medida que llegan y el dataframe se crea una sola vez al final.
+    Con la caché de rastreo, las páginas que no cambiaron desde el rastreo anterior no se vuelven a procesar.
     Args:
-        url (_type_): Enlace que se desea analizar
-        nivelMaximo (_type_): Nivel máximo del nivel de análisis
-    """        
-    global df
-    baseUrl='/'.join(url.split('/')[0:3])        
-    source_url = requests.get(url)
-    soup = BeautifulSoup(source_url.content,"html.parser")
-    for link in soup.find_all('a',href=True):        
-        urlActual=link.get('href')            
-        if "?" in urlActual:
-            urlActual= urlActual.split("?")[0]
-        elif "#" in urlActual:
-            urlActual= urlActual.split("#")[0]
-        if (baseUrl not in urlActual and "http" in urlActual) or len(urlActual)<=1 or urlActual[-4:] in ['.jpg','.svg','.png']:
-            continue
-        elif urlActual[0]=='/':
-            urlSitio = baseUrl + urlActual
-        else:
-            urlSitio=urlActual
-        try:
-            if len(links) >=100:
-                return
-            if urlSitio not in links:                                                                            
-                textoSitio = extraerTextoDeURL(urlSitio).strip()                
-                links.append(urlSitio)
-                if "404" not in textoSitio:
-                    dfNuevo = pd.DataFrame({'link':[urlSitio],'text':[textoSitio]})                        
-                    df = pd.concat([df,dfNuevo])
-                    nivelActual = len(urlSitio.split('/')) - len(urlSitio.split('/')[0:3])                    
-                    if nivelActual <= nivelMaximo:
-                        st.info(f'Procesando: {urlSitio} Nivel: {nivelActual}')                            
-                        procesarURLDataFrame(urlSitio,nivelMaximo)
-                    else:
-                        st.warning(f'Omitido: {urlSitio} Nivel: {nivelActual}')
-                else:
-                    dfNuevo = pd.DataFrame({'link':[urlSitio],'text':['']})
-                    df = pd.concat([df,dfNuevo])
-                    st.error(f'No encontrado: {urlSitio} en Sitio: {url}')
-        except Exception as e:
-            st.error(f'Error: {e}')
+        url (str): Enlace que se desea analizar
+        nivelMaximo (int): Número máximo de saltos de enlace desde la URL inicial
+        maxPaginas (int): Número máximo de páginas a descargar
+        concurrencia (int): Número de descargas simultáneas
+        conexionesPorHost (int): Número máximo de conexiones simultáneas al sitio
+        usarCache (bool): Usar la caché de rastreo (peticiones condicionales) en lugar de descargar todo el sitio
+    Returns:
+        DataFrame con las columnas link, nivel, estado, cache, text y segundos
+    """
+    filas = []
+    avance = st.empty()
+    inicio = time.perf_counter()
+
+    async def recorrer(cache):
+        ultimaActualizacion = 0
+        async for fila in rs.rastrear(url, nivelMaximo, maxPaginas, concurrencia, conexionesPorHost, cache=cache):
+            filas.append(fila)
+            if not fila["estado"].startswith(("2", "3")):
+                st.error(f'No procesado: {fila["link"]} ({fila["estado"]})')
+            # Actualiza el avance como máximo 5 veces por segundo, para no saturar la interfaz
+            ahora = time.perf_counter()
+            if ahora - ultimaActualizacion > 0.2:
+                ultimaActualizacion = ahora
+                avance.info(f'Procesadas: {len(filas)} páginas ({len(filas) / (ahora - inicio):.1f} por segundo). Última: {fila["link"]} Nivel: {fila["nivel"]}')
+
+    if usarCache:
+        with rs.CacheRastreo() as cache:
+            asyncio.run(recorrer(cache))
+    else:
+        asyncio.run(recorrer(None))
+    segundos = time.perf_counter() - inicio
+    sinCambios = sum(fila["cache"] == "sin cambios" for fila in filas)
+    avance.success(f'{len(filas)} páginas procesadas en {segundos:.1f} s ({len(filas) / max(segundos, 1e-9):.1f} por segundo). Sin cambios desde el rastreo anterior: {sinCambios}')
+    return pd.DataFrame(filas, columns=["link", "nivel", "estado", "cache", "text", "segundos"])
 
 st.header('Website scraper 💻')
 parURL= st.text_input("Sitio web a procesar")
 parNivelMaximo= st.number_input("Niveles de análisis",value=2,min_value=1)
+with st.expander("Opciones avanzadas"):
+    parMaxPaginas= st.number_input("Máximo de páginas",value=rs.MAX_PAGINAS,min_value=1,step=100)
+    parConcurrencia= st.number_input("Descargas simultáneas",value=rs.CONCURRENCIA,min_value=1,max_value=256)
+    parConexionesPorHost= st.number_input("Conexiones simultáneas al sitio",value=rs.CONEXIONES_POR_HOST,min_value=1,max_value=256)
+    parUsarCache= st.checkbox("Usar caché de rastreo",value=True,help="Solo se vuelven a procesar las páginas que cambiaron desde el rastreo anterior")
 btnIniciar=st.button("Iniciar",type="primary")
 
 if len(parURL)>0 and btnIniciar:
 
-    df = pd.DataFrame()
-    links = []
-    
     with st.status(f"Procesando sitio **{parURL}**") as status:
         with st.container(height=600):
-            procesarURLDataFrame(parURL, parNivelMaximo)
+            df = procesarURLDataFrame(parURL, parNivelMaximo, parMaxPaginas, parConcurrencia, parConexionesPorHost, parUsarCache)
         status.update(label="Sitio procesado!", state="complete", expanded=False)
 
     csv = convertir_df_to_csv(df)
@@ -0,0 +1,147 @@
+# Almacén local de artículos para streamlitAgregadorRSS.py.
+# Guarda en SQLite el historial de los artículos leídos de los feeds. En cada actualización solo se
+# agregan los artículos nuevos (por su Clave, ver lectorFeeds.py) y con ellos se actualiza una tabla de
+# frecuencias de palabras, así el análisis del historial completo es una consulta ordenada y no un
+# recuento de todos los artículos en cada interacción. La búsqueda de texto completo usa FTS5.
+
+# (sqlite3 viene incluida en la instalación base de Python)
+
+import sqlite3
+import time
+from collections import Counter
+import pandas as pd
+
+# Archivo del almacén
+RUTA_ALMACEN = "articulos_rss.sqlite"
+# Columnas del DataFrame y de la tabla de artículos
+COLUMNAS = {"Clave": "clave", "Título": "titulo", "Descripción": "descripcion", "Link": "link",
+            "Fecha": "fecha", "Imagen": "imagen", "Fuente": "fuente", "Orden": "orden"}
+# Secciones del texto con frecuencias de palabras
+SECCIONES = {"Título": "titulo", "Descripción": "descripcion"}
+# Número de claves por consulta al buscar los artículos que ya están guardados
+CLAVES_POR_CONSULTA = 500
+
+# Stop Words (Palabras vacías) en español e inglés que no se cuentan en las frecuencias
+# Usamos un set (conjunto) porque la búsqueda en sets es mucho más rápida que en listas
+STOP_WORDS = {"de", "la", "el", "en", "y", "a", "los", "las", "un", "una", "que","antes","después","con","por","para","es","al","se","del","lo","su","como","más","o","pero","sus","le","ya","o","si","sin","sobre","todo","también","entre","cuando","muy","hasta","hay","donde","quien","desde"}
+STOP_WORDS.update({"the","and","is","in","to","of","a","that","it" ,"on" ,"for" ,"with" ,"as" ,"was" ,"at" ,"by" ,"an" ,"be" ,"this" ,"are" ,"from" ,"or" ,"which" ,"but" ,"not" ,"have" ,"has" ,"they" ,"you" ,"all" ,"we" ,"his" , "her", "there", "their","about","more","one","what","when","so","if","no","my","your"})
+
+def palabrasTexto(texto):
+    """
+    Divide un texto en palabras para las frecuencias: minúsculas, separadas por espacios,
+    sin stop words y con más de 3 letras.
+    """
+    return [p for p in texto.lower().split() if p not in STOP_WORDS and len(p) > 3]
+
+def abrirAlmacen(ruta=RUTA_ALMACEN):
+    """
+    Abre (o crea) el almacén de artículos.
+
+    Tablas:
+        articulos: Un registro por artículo, con la clave como llave primaria.
+        articulos_fts: Índice FTS5 de título y descripción (tabla de contenido externo sobre articulos).
+            remove_diacritics permite buscar "economia" y encontrar "economía".
+        frecuencias: Cantidad de apariciones de cada palabra por sección, actualizada al agregar artículos.
+    """
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.executescript("""
+        CREATE TABLE IF NOT EXISTS articulos (
+            clave TEXT PRIMARY KEY, titulo TEXT, descripcion TEXT, link TEXT, fecha TEXT,
+            imagen TEXT, fuente TEXT, orden TEXT, agregado REAL);
+        CREATE INDEX IF NOT EXISTS articulos_orden ON articulos (orden);
+        CREATE VIRTUAL TABLE IF NOT EXISTS articulos_fts USING fts5 (
+            titulo, descripcion, content='articulos', tokenize='unicode61 remove_diacritics 2');
+        CREATE TABLE IF NOT EXISTS frecuencias (
+            seccion TEXT, palabra TEXT, cantidad INTEGER, PRIMARY KEY (seccion, palabra)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS frecuencias_cantidad ON frecuencias (seccion, cantidad DESC);
+    """)
+    return conexion
+
+def clavesGuardadas(conexion, claves):
+    """
+    Devuelve el conjunto de las claves que ya están en el almacén.
+    """
+    guardadas = set()
+    for inicio in range(0, len(claves), CLAVES_POR_CONSULTA):
+        parte = claves[inicio:inicio + CLAVES_POR_CONSULTA]
+        consulta = f"SELECT clave FROM articulos WHERE clave IN ({','.join('?' * len(parte))})"
+        guardadas.update(fila[0] for fila in conexion.execute(consulta, parte))
+    return guardadas
+
+def agregarArticulos(conexion, df):
+    """
+    Agrega al almacén los artículos del DataFrame que todavía no están guardados y suma sus palabras
+    a la tabla de frecuencias, todo en una sola transacción.
+
+    Args:
+        conexion: Conexión de abrirAlmacen.
+        df: DataFrame de artículos con las columnas de lectorFeeds.COLUMNAS.
+
+    Returns:
+        Número de artículos nuevos.
+    """
+    # Verificación rápida sin bloqueo: en las interacciones sin artículos nuevos no se toma el bloqueo de escritura
+    if clavesGuardadas(conexion, df["Clave"].tolist()) >= set(df["Clave"]):
+        return 0
+    registros = df.drop_duplicates("Clave")[list(COLUMNAS)].copy()
+    # Las fechas se guardan como texto ISO 8601 (en UTC), que se ordena igual que la fecha
+    registros["Orden"] = [fecha.isoformat() if pd.notna(fecha) else None for fecha in registros["Orden"]]
+    agregado = time.time()
+    with conexion:
+        # BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer las claves guardadas y el último rowid:
+        # si otra sesión agrega los mismos artículos al mismo tiempo, espera a que termine y luego ve sus filas
+        conexion.execute("BEGIN IMMEDIATE")
+        guardadas = clavesGuardadas(conexion, registros["Clave"].tolist())
+        registros = registros[~registros["Clave"].isin(guardadas)]
+        if registros.empty:
+            return 0
+        ultimoRowid = conexion.execute("SELECT COALESCE(MAX(rowid), 0) FROM articulos").fetchone()[0]
+        conexion.executemany("INSERT INTO articulos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             ((*fila, agregado) for fila in registros.itertuples(index=False)))
+        # El índice FTS de contenido externo se actualiza a mano con los artículos recién insertados
+        # (los artículos nunca se borran y la transacción tiene el bloqueo de escritura, así que las filas
+        # con un rowid mayor al último existente son exactamente las de este lote)
+        conexion.execute("""INSERT INTO articulos_fts (rowid, titulo, descripcion)
+            SELECT rowid, titulo, descripcion FROM articulos WHERE rowid > ?""", (ultimoRowid,))
+        for seccion, columna in SECCIONES.items():
+            contador = Counter()
+            for texto in registros[seccion]:
+                contador.update(palabrasTexto(texto))
+            conexion.executemany("""INSERT INTO frecuencias VALUES (?, ?, ?)
+                ON CONFLICT (seccion, palabra) DO UPDATE SET cantidad = cantidad + excluded.cantidad""",
+                ((columna, palabra, cantidad) for palabra, cantidad in contador.items()))
+    return len(registros)
+
+def palabrasFrecuentes(conexion, seccion, cantidad=10):
+    """
+    Devuelve las palabras más frecuentes de una sección ("Título" o "Descripción") en todo el historial.
+
+    Returns:
+        dict {palabra: frecuencia}, de mayor a menor frecuencia.
+    """
+    return dict(conexion.execute("SELECT palabra, cantidad FROM frecuencias WHERE seccion = ? ORDER BY cantidad DESC LIMIT ?",
+                                 (SECCIONES[seccion], cantidad)))
+
+def buscarArticulos(conexion, consulta, limite=100):
+    """
+    Busca artículos en el historial con la sintaxis de FTS5: palabras (todas deben aparecer),
+    "frases exactas", OR, NOT y prefijos (econom*). Los resultados se ordenan por relevancia (bm25).
+    Una consulta con sintaxis inválida lanza sqlite3.OperationalError.
+
+    Returns:
+        DataFrame con las columnas Título, Descripción, Link, Fecha y Fuente.
+    """
+    filas = conexion.execute("""SELECT a.titulo, a.descripcion, a.link, a.fecha, a.fuente
+        FROM articulos_fts JOIN articulos a ON a.rowid = articulos_fts.rowid
+        WHERE articulos_fts MATCH ? ORDER BY articulos_fts.rank LIMIT ?""", (consulta, limite)).fetchall()
+    return pd.DataFrame(filas, columns=["Título", "Descripción", "Link", "Fecha", "Fuente"])
+
+def resumenAlmacen(conexion):
+    """
+    Devuelve un diccionario con el total de artículos, el número de fuentes y la fecha del artículo
+    más antiguo y del más reciente del historial.
+    """
+    total, fuentes, desde, hasta = conexion.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT fuente), MIN(orden), MAX(orden) FROM articulos").fetchone()
+    return {"total": total, "fuentes": fuentes, "desde": desde, "hasta": hasta}
@@ -0,0 +1,76 @@
+# Benchmark del historial de artículos (almacenArticulos.py).
+# Simula meses de actualizaciones de varios feeds: en cada actualización llega un lote de artículos, de los
+# cuales una parte ya estaba guardada. Compara el tiempo del análisis de frecuencias recontando todo el
+# historial con Counter (como lo hacía la aplicación) con la consulta a la tabla de frecuencias incremental,
+# y mide la búsqueda de texto completo con FTS5.
+# Uso: python benchmark_almacen.py [número de días] [artículos nuevos por día]
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import almacenArticulos as aa
+import lectorFeeds as lf
+
+VOCABULARIO = [f"palabra{i}" for i in range(5000)] + ["economía", "mercado", "gobierno", "elecciones", "tecnología", "inteligencia", "artificial"]
+REPETIDOS_POR_LOTE = 0.5  # Fracción del lote que ya estaba en el historial (los feeds repiten sus últimos artículos)
+
+def loteArticulos(dia, cantidad, rng):
+    inicio = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(days=dia)
+    filas = []
+    for i in range(cantidad):
+        titulo = " ".join(rng.choices(VOCABULARIO, k=8))
+        descripcion = " ".join(rng.choices(VOCABULARIO, k=40))
+        link = f"https://noticias.example/{dia}/{i}"
+        fecha = inicio + timedelta(minutes=i)
+        filas.append({"Título": titulo, "Descripción": descripcion, "Link": link, "Fecha": fecha.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+                      "Imagen": "No disponible", "Fuente": f"feed{i % 20}", "Clave": lf.claveArticulo(None, link, titulo, ""), "Orden": fecha})
+    return pd.DataFrame(filas, columns=lf.COLUMNAS)
+
+if __name__ == "__main__":
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else 180
+    porDia = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = random.Random(0)
+    carpeta = tempfile.mkdtemp(prefix="benchmark_almacen_")
+    conexion = aa.abrirAlmacen(os.path.join(carpeta, "articulos.sqlite"))
+    anterior = None
+    historial = []
+    segundosAgregar = 0
+    for dia in range(dias):
+        nuevo = loteArticulos(dia, porDia, rng)
+        # Cada actualización trae los artículos nuevos y una parte de los del día anterior
+        lote = nuevo if anterior is None else pd.concat([nuevo, anterior.head(int(porDia * REPETIDOS_POR_LOTE))])
+        inicio = time.perf_counter()
+        aa.agregarArticulos(conexion, lote)
+        segundosAgregar += time.perf_counter() - inicio
+        historial.append(nuevo)
+        anterior = nuevo
+    historial = pd.concat(historial)
+    print(f"Historial: {aa.resumenAlmacen(conexion)['total']} artículos ({dias} días). "
+          f"Agregar un lote: {segundosAgregar / dias * 1000:.1f} ms en promedio")
+
+    inicio = time.perf_counter()
+    for seccion in aa.SECCIONES:
+        contador = Counter()
+        for texto in historial[seccion]:
+            contador.update(aa.palabrasTexto(texto))
+        recuento = dict(contador.most_common(10))
+    segundosRecuento = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for seccion in aa.SECCIONES:
+        frecuentes = aa.palabrasFrecuentes(conexion, seccion, 10)
+    segundosTabla = time.perf_counter() - inicio
+    print(f"Top 10 palabras: recuento con Counter {segundosRecuento * 1000:.0f} ms, tabla incremental {segundosTabla * 1000:.2f} ms. "
+          # Las palabras empatadas pueden salir en otro orden, así que se comparan las frecuencias
+          f"Mismas frecuencias: {list(recuento.values()) == list(frecuentes.values())}")
+
+    for consulta in ["economia", "inteligencia artificial", '"mercado gobierno"', "palabra12*"]:
+        inicio = time.perf_counter()
+        encontrados = aa.buscarArticulos(conexion, consulta)
+        print(f"Búsqueda {consulta!r}: {len(encontrados)} resultados en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    conexion.close()
+    shutil.rmtree(carpeta)
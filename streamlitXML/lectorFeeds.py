@@ -0,0 +1,192 @@
+# Lectura de feeds RSS para streamlitAgregadorRSS.py.
+# Los feeds se descargan en paralelo con asyncio y aiohttp (una sola sesión con un pool de conexiones) y
+# se analizan de forma incremental: el XML se entrega al parser por bloques a medida que llega de la red
+# (XMLPullParser, la versión no bloqueante de iterparse) y cada <item> se convierte en un diccionario y se
+# elimina del árbol apenas se cierra su etiqueta. Así un feed enorme nunca queda completo en memoria.
+# Los artículos repetidos (el mismo GUID o enlace en varios feeds) se eliminan con un hash.
+
+# Librerías necesarias: pip install aiohttp pandas
+
+import asyncio
+import hashlib
+import io
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import xml.etree.ElementTree as ET
+import aiohttp  # Cliente HTTP asíncrono
+import pandas as pd
+
+# Espacios de nombres usados en los feeds (las imágenes suelen venir en <media:content url="...">)
+NAMESPACES = {'media': 'http://search.yahoo.com/mrss/'}
+ETIQUETA_MEDIA = '{' + NAMESPACES['media'] + '}content'
+# Descargas simultáneas en total y por servidor
+CONCURRENCIA = 16
+CONEXIONES_POR_HOST = 4
+# Tiempo máximo para conectarse a cada feed y entre dos bloques recibidos, en segundos. No se limita el tiempo
+# total de la descarga, para que un feed muy grande que sigue llegando no se corte
+TIMEOUT_SEGUNDOS = 10
+# Tamaño de los bloques que se entregan al parser
+TAMANO_BLOQUE = 64 * 1024
+# Columnas del DataFrame de artículos (Clave y Orden son internas: identificador y fecha para ordenar)
+COLUMNAS = ["Título", "Descripción", "Link", "Fecha", "Imagen", "Fuente", "Clave", "Orden"]
+
+def claveArticulo(guid, link, titulo, fecha):
+    """
+    Calcula el identificador de un artículo para eliminar repetidos: el hash del GUID, o del enlace
+    si el feed no tiene GUID, o del título y la fecha si tampoco tiene enlace.
+    """
+    base = guid or link or f"{titulo}|{fecha}"
+    return hashlib.sha1(base.strip().encode("utf-8")).hexdigest()
+
+def fechaArticulo(texto):
+    """
+    Convierte la fecha de un artículo (RFC 822 en RSS, ISO 8601 en algunos feeds) a datetime en UTC.
+    Devuelve None si la fecha no se puede interpretar.
+    """
+    if not texto:
+        return None
+    try:
+        fecha = parsedate_to_datetime(texto)
+    except (TypeError, ValueError):
+        try:
+            fecha = datetime.fromisoformat(texto.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    # Las fechas sin zona horaria se asumen en UTC
+    return fecha.astimezone(timezone.utc) if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+def extraerArticulo(item, fuente):
+    """
+    Convierte un elemento <item> en el diccionario de un artículo.
+
+    Args:
+        item: Elemento <item> ya completo.
+        fuente: URL o nombre del feed de donde viene el artículo.
+
+    Returns:
+        dict con las columnas de COLUMNAS.
+    """
+    # findtext devuelve el texto de la etiqueta hija, o el valor por defecto si no existe
+    titulo = item.findtext("title", "Sin título")
+    link = item.findtext("link", "#")
+    pubDate = item.findtext("pubDate", "Fecha desconocida")
+    media_content = item.find(ETIQUETA_MEDIA)
+    url = media_content.get('url') if media_content is not None else None
+    return {
+        "Título": titulo,
+        "Descripción": item.findtext("description", "Sin descripción"),
+        "Link": link,
+        "Fecha": pubDate,
+        "Imagen": url if url else "No disponible",
+        "Fuente": fuente,
+        "Clave": claveArticulo(item.findtext("guid"), item.findtext("link"), titulo, pubDate),
+        "Orden": fechaArticulo(item.findtext("pubDate")),
+    }
+
+def articulosDeEventos(eventos, pila, fuente):
+    """
+    Procesa eventos ('start'/'end') del parser y devuelve los artículos de los <item> que se cerraron.
+    Cada <item> procesado se elimina de su elemento padre para liberar memoria.
+
+    Args:
+        eventos: Eventos de iterparse o de XMLPullParser.read_events().
+        pila: Lista con los elementos abiertos, compartida entre llamadas del mismo documento.
+        fuente: URL o nombre del feed.
+    """
+    articulos = []
+    for evento, elemento in eventos:
+        if evento == "start":
+            pila.append(elemento)
+            continue
+        pila.pop()
+        if elemento.tag == "item":
+            articulos.append(extraerArticulo(elemento, fuente))
+            if pila:
+                pila[-1].remove(elemento)
+    return articulos
+
+def leerDocumento(archivo, fuente):
+    """
+    Lee los artículos de un feed completo (archivo o bytes) con iterparse.
+
+    Args:
+        archivo: Ruta, objeto tipo archivo o bytes con el XML.
+        fuente: Nombre del feed para la columna Fuente.
+
+    Returns:
+        Lista de artículos (diccionarios), en el orden del feed.
+    """
+    if isinstance(archivo, bytes):
+        archivo = io.BytesIO(archivo)
+    return articulosDeEventos(ET.iterparse(archivo, events=("start", "end")), [], fuente)
+
+def leerArbol(root, fuente):
+    """
+    Lee los artículos de un documento que ya está cargado como árbol (ET.fromstring), sin volver a
+    analizar el XML. Los <item> se conservan en el árbol.
+
+    Returns:
+        Lista de artículos (diccionarios), en el orden del feed.
+    """
+    return [extraerArticulo(item, fuente) for item in root.iter("item")]
+
+async def leerFeed(sesion, url):
+    """
+    Descarga un feed y lo analiza por bloques a medida que llegan.
+
+    Returns:
+        Lista de artículos del feed.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    pila, articulos = [], []
+    async with sesion.get(url) as respuesta:
+        respuesta.raise_for_status()
+        async for bloque in respuesta.content.iter_chunked(TAMANO_BLOQUE):
+            parser.feed(bloque)
+            articulos.extend(articulosDeEventos(parser.read_events(), pila, url))
+    parser.close()
+    articulos.extend(articulosDeEventos(parser.read_events(), pila, url))
+    return articulos
+
+async def leerFeeds(urls, concurrencia=CONCURRENCIA, conexionesPorHost=CONEXIONES_POR_HOST, timeout=TIMEOUT_SEGUNDOS):
+    """
+    Descarga y analiza varios feeds en paralelo con una sesión compartida.
+
+    Returns:
+        Una tupla (resultados, errores): resultados es una lista con la lista de artículos de cada feed
+        que se pudo leer y errores un diccionario {url: mensaje} con los que fallaron.
+    """
+    conector = aiohttp.TCPConnector(limit=concurrencia, limit_per_host=conexionesPorHost)
+    # Se limitan la conexión y la espera entre bloques, no el tiempo total (ver TIMEOUT_SEGUNDOS)
+    tiempos = aiohttp.ClientTimeout(total=None, connect=timeout, sock_read=timeout)
+    async with aiohttp.ClientSession(connector=conector, timeout=tiempos) as sesion:
+        # return_exceptions=True: un feed que falla no cancela la lectura de los demás
+        respuestas = await asyncio.gather(*(leerFeed(sesion, url) for url in urls), return_exceptions=True)
+    resultados, errores = [], {}
+    for url, respuesta in zip(urls, respuestas):
+        if isinstance(respuesta, Exception):
+            errores[url] = f"{type(respuesta).__name__} {respuesta}".strip()
+        else:
+            resultados.append(respuesta)
+    return resultados, errores
+
+def combinarArticulos(listas):
+    """
+    Une las listas de artículos de varios feeds en un DataFrame sin repetidos (por Clave, se conserva
+    la primera aparición), ordenado del más reciente al más antiguo. Los artículos sin fecha van al final.
+    """
+    unicos = {}
+    for articulos in listas:
+        for articulo in articulos:
+            unicos.setdefault(articulo["Clave"], articulo)
+    df = pd.DataFrame(list(unicos.values()), columns=COLUMNAS)
+    df["Orden"] = pd.to_datetime(df["Orden"], utc=True)
+    # Orden estable: los artículos con la misma fecha conservan el orden del feed
+    return df.sort_values("Orden", ascending=False, na_position="last", kind="stable").reset_index(drop=True)
+
+def cargarFeeds(urls, concurrencia=CONCURRENCIA):
+    """
+    Lee una lista de feeds y devuelve el DataFrame combinado y los errores de lectura.
+    """
+    resultados, errores = asyncio.run(leerFeeds(list(urls), concurrencia))
+    return combinarArticulos(resultados), errores
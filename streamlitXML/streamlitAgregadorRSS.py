@@ -2,45 +2,66 @@
 
 # Descripción:
 # ------------
-# Este script permite cargar feeds RSS desde una URL o un archivo XML local.
+# Este script permite cargar feeds RSS desde una URL, un archivo XML local o una lista de feeds.
 # Su objetivo es enseñar cómo parsear contenido XML, transformarlo en estructuras
 # de datos manejables (DataFrames de Pandas) y visualizarlo en una aplicación web interactiva.
 
 # Características principales:
-# 1. Ingesta de datos: Peticiones HTTP o carga de archivos.
-# 2. Procesamiento XML: Uso de ElementTree para navegar por el árbol de etiquetas.
-# 3. Transformación de datos: Conversión de listas de diccionarios a DataFrames de Pandas.
+# 1. Ingesta de datos: Peticiones HTTP o carga de archivos. Con una lista de feeds, las descargas se hacen
+#    en paralelo con asyncio y aiohttp (ver lectorFeeds.py).
+# 2. Procesamiento XML: Uso de ElementTree para navegar por el árbol de etiquetas. Los artículos se leen
+#    de forma incremental con iterparse, sin cargar el feed completo en memoria.
+# 3. Transformación de datos: Conversión de listas de diccionarios a DataFrames de Pandas, sin artículos
+#    repetidos (por GUID o enlace) y ordenados por fecha.
 # 4. Visualización: Tablas interactivas y tarjetas personalizadas con Streamlit.
 # 5. Análisis de texto: Conteo de frecuencias de palabras (NLP básico).
+# 6. Historial: Los artículos se guardan en SQLite (ver almacenArticulos.py) con frecuencias de palabras
+#    incrementales y búsqueda de texto completo (FTS5).
 
 # Librerías necesarias (Instalación):
 # -----------------------------------
 # Ejecuta el siguiente comando en tu terminal para instalar las dependencias externas:
-# pip install streamlit pandas requests
+# pip install streamlit pandas requests aiohttp
 
-# (Las librerías 'xml', 'collections' e 'io' vienen incluidas en la instalación base de Python)
+# (Las librerías 'xml', 'collections', 'io' y 'sqlite3' vienen incluidas en la instalación base de Python)
 
 
 import streamlit as st  # Framework para crear aplicaciones web de ciencia de datos rápidamente sin saber HTML/CSS
 import pandas as pd     # Librería estándar para manipulación y análisis de datos estructurados (DataFrames)
 from collections import Counter # Herramienta de alto rendimiento para contar elementos hashables (usado para frecuencia de palabras)
+import sqlite3          # Base de datos SQLite incluida en Python (solo se usa aquí para sus errores)
 import requests         # Librería "de facto" en Python para realizar peticiones HTTP (GET, POST) a servidores web
 
 import xml.etree.ElementTree as ET # Librería estándar y ligera para parsear y navegar por árboles de documentos XML
+import lectorFeeds as lf # Lectura incremental y en paralelo de los feeds (ver lectorFeeds.py)
+import almacenArticulos as aa # Historial de artículos en SQLite (ver almacenArticulos.py)
 
 # Configuración inicial de la página de Streamlit (Título de la pestaña del navegador y layout)
 st.set_page_config(page_title="Agregador RSS", layout="wide")
 
 st.title(":material/rss_feed: Agregador y Analizador de RSS")
 
+# Descarga de la lista de feeds. st.cache_data guarda el resultado 10 minutos para que cada interacción
+# con la página (cambiar de pestaña, escribir un XPath...) no vuelva a descargar todos los feeds
+@st.cache_data(ttl=600, show_spinner="Descargando feeds...")
+def cargarListaFeeds(urls):
+    return lf.cargarFeeds(urls)
+
 # --- BARRA LATERAL (SIDEBAR) ---
 # Se utiliza para inputs de configuración que controlan el flujo de la app
 with st.sidebar:
     st.header("Configuración")
     # Widget de selección única para elegir el origen de los datos
-    rss_source = st.radio("Selecciona la fuente:", ["URL", "Archivo XML"])
+    rss_source = st.radio("Selecciona la fuente:", ["URL", "Archivo XML", "Lista de feeds"])
+    # Con el historial, cada carga agrega los artículos nuevos al almacén local y el análisis usa todo el historial
+    parHistorial = st.checkbox("Guardar historial de artículos", value=True)
+    # El visor XML necesita el árbol completo del documento; sin él, el documento se lee de forma incremental
+    parVisorXML = rss_source != "Lista de feeds" and st.checkbox("Visor XML y XPath", value=False,
+                                                                 help="Carga el árbol XML completo del documento para explorarlo")
     
     xml_content = None # Inicializamos la variable que contendrá el XML crudo
+    df_articulos = None # DataFrame con los artículos de todas las fuentes
+    fuente = None # Nombre del feed cargado (URL o nombre del archivo)
     
     if rss_source == "URL":
         rss_url = st.text_input("Ingresa la URL del RSS:")
@@ -50,61 +71,73 @@ with st.sidebar:
                 # timeout=10 es crucial para evitar que la app se congele indefinidamente si el servidor no responde
                 response = requests.get(rss_url, timeout=10)
                 xml_content = response.content # Obtenemos el contenido en bytes
+                fuente = rss_url
                 st.success("✓ RSS cargado exitosamente")
             except Exception as e:
                 st.error(f"Error al cargar URL: {e}")
-    else:
+    elif rss_source == "Archivo XML":
         # Widget específico de Streamlit para subir archivos desde la computadora del usuario
         uploaded_file = st.file_uploader("Carga un archivo XML", type=["xml"])
         if uploaded_file:
             # Leemos el contenido binario del archivo subido
             xml_content = uploaded_file.read()
+            fuente = uploaded_file.name
             st.success("✓ Archivo cargado exitosamente")
+    else:
+        # Una URL por línea; las líneas vacías y repetidas se ignoran
+        texto_feeds = st.text_area("URLs de los feeds (una por línea):", height=200)
+        urls_feeds = tuple(dict.fromkeys(linea.strip() for linea in texto_feeds.splitlines() if linea.strip()))
+        if urls_feeds:
+            df_articulos, errores = cargarListaFeeds(urls_feeds)
+            st.success(f"✓ {len(urls_feeds) - len(errores)} de {len(urls_feeds)} feeds cargados")
+            for url_error, mensaje in errores.items():
+                st.error(f"Error al cargar {url_error}: {mensaje}")
 
 # --- PROCESAMIENTO PRINCIPAL ---
+root = None # Árbol XML completo, solo cuando se carga un único documento y el visor XML está activo
 if xml_content:
-    # try:
+    if parVisorXML:
         # ET.fromstring convierte el string binario/texto en un objeto Element (la raíz del árbol XML)
         # Esto nos permite navegar por las etiquetas como si fueran objetos de Python.
+        # Los artículos se extraen del mismo árbol, sin volver a analizar el documento.
         root = ET.fromstring(xml_content)
-        
-        # Buscamos todas las etiquetas <item> recursivamente (.// significa "en cualquier nivel de profundidad")
-        # En los RSS estándar, cada noticia está dentro de una etiqueta <item>
-        items = root.findall(".//item")        
-        
-        if items:
-            # --- EXTRACCIÓN DE DATOS ---
-            # Inicializamos una lista vacía para almacenar los datos limpios.
-            # Esta lista de diccionarios es el formato ideal para luego crear un DataFrame de Pandas.
-            articulos = []
-            
-            for item in items:
-                # findtext busca la etiqueta hija y devuelve su contenido textual.
-                # El segundo argumento es el valor por defecto si la etiqueta no existe (Manejo de errores básico).
-                titulo = item.findtext("title", "Sin título")
-                descripcion = item.findtext("description", "Sin descripción")
-                link = item.findtext("link", "#")
-                pubDate = item.findtext("pubDate", "Fecha desconocida")
-                
-                # Manejo de Namespaces (Espacios de nombres):
-                # Muchas imágenes en RSS están bajo el namespace 'media' (ej: <media:content url="...">)
-                namespaces = {'media': 'http://search.yahoo.com/mrss/'}
-                media_content = item.find('media:content', namespaces)
-                
-                # Obtenemos el atributo 'url' si la etiqueta media existe
-                url = media_content.get('url') if media_content is not None else "No disponible"
-                
-                # Agregamos el diccionario a nuestra lista procesada
-                articulos.append({
-                    "Título": titulo,
-                    "Descripción": descripcion,
-                    "Link": link,
-                    "Fecha": pubDate,
-                    "Imagen": url if url else "No disponible"
-                })
+        articulos_documento = lf.leerArbol(root, fuente)
+    else:
+        # --- EXTRACCIÓN DE DATOS ---
+        # iterparse recorre el XML como una secuencia de eventos (apertura y cierre de etiquetas):
+        # cada <item> se convierte en un diccionario apenas se cierra y luego se descarta (ver lectorFeeds.py).
+        articulos_documento = lf.leerDocumento(xml_content, fuente)
+    # La lista de diccionarios se convierte en un DataFrame sin repetidos y ordenado por fecha.
+    df_articulos = lf.combinarArticulos([articulos_documento])
+
+# --- HISTORIAL ---
+# Se agregan al almacén solo los artículos que no estaban guardados (los demás se ignoran por su clave)
+conexion = None
+if parHistorial and df_articulos is not None:
+    conexion = aa.abrirAlmacen()
+    nuevos = aa.agregarArticulos(conexion, df_articulos)
+    if nuevos:
+        st.toast(f"{nuevos} artículos nuevos guardados en el historial")
+
+if df_articulos is not None:
+    # try:
+        if len(df_articulos) > 0:
+            # Lista de diccionarios (una por artículo) para los análisis de las pestañas 2 y 3
+            articulos = df_articulos.to_dict("records")
+            # Manejo de Namespaces (Espacios de nombres):
+            # Muchas imágenes en RSS están bajo el namespace 'media' (ej: <media:content url="...">)
+            namespaces = lf.NAMESPACES
             
             # Creamos pestañas para organizar la visualización sin saturar la pantalla
-            tab1, tab2, tab3, tab4 = st.tabs([":material/news: Artículos", ":material/bar_chart_4_bars: Análisis", ":material/1k: Estadísticas",":material/code_blocks: XML"])
+            # La pestaña del historial solo aparece si se guarda el historial y la del visor XML
+            # (siempre la última) cuando se carga un único documento con el visor XML activo
+            pestanas = [":material/news: Artículos", ":material/bar_chart_4_bars: Análisis", ":material/1k: Estadísticas"]
+            if conexion is not None:
+                pestanas.append(":material/history: Historial")
+            if root is not None:
+                pestanas.append(":material/code_blocks: XML")
+            tabs = st.tabs(pestanas)
+            tab1, tab2, tab3 = tabs[:3]
             
             # --- TAB 1: VISUALIZACIÓN DE DATOS CON PANDAS ---
             with tab1:
@@ -116,7 +149,8 @@ if xml_content:
                 # Convertimos la lista de diccionarios en un DataFrame.
                 # Un DataFrame es como una hoja de cálculo en memoria: tiene filas, columnas e índices.
                 # Ventajas: Permite filtrar, ordenar, limpiar y exportar datos masivamente con una sola línea.
-                df = pd.DataFrame(articulos)
+                # Las columnas internas (Clave y Orden) no se muestran
+                df = df_articulos.drop(columns=["Clave", "Orden"])
                 
                 # Widget de control segmentado para cambiar la UI dinámicamente
                 parVista = st.segmented_control(
@@ -159,35 +193,28 @@ if xml_content:
             # --- TAB 2: ANÁLISIS DE TEXTO (NLP Básico) ---
             with tab2:
                 st.subheader("Análisis de Títulos y Descripciones")
+                if conexion is not None:
+                    st.caption(f"Frecuencias de todo el historial guardado ({aa.resumenAlmacen(conexion)['total']} artículos)")
                 
                 for seccion in ["Título", "Descripción"]:
                     st.subheader(f"Análisis de {seccion}")
                     
-                    # 1. Unificar todo el texto en una lista plana
-                    todas_palabras = []
-                    for art in articulos:
-                        # .lower() normaliza a minúsculas
-                        # .split() divide el texto por espacios en blanco convirtiéndolo en lista de palabras
-                        palabras = art[seccion].lower().split()
-                        todas_palabras.extend(palabras)
-                    
-                    # 2. Definir Stop Words (Palabras vacías)
-                    # Usamos un set (conjunto) porque la búsqueda en sets es mucho más rápida que en listas
-                    stop_words = {"de", "la", "el", "en", "y", "a", "los", "las", "un", "una", "que","antes","después","con","por","para","es","al","se","del","lo","su","como","más","o","pero","sus","le","ya","o","si","sin","sobre","todo","también","entre","cuando","muy","hasta","hay","donde","quien","desde"}
-                    stop_wordsEN = {"the","and","is","in","to","of","a","that","it" ,"on" ,"for" ,"with" ,"as" ,"was" ,"at" ,"by" ,"an" ,"be" ,"this" ,"are" ,"from" ,"or" ,"which" ,"but" ,"not" ,"have" ,"has" ,"they" ,"you" ,"all" ,"we" ,"his" , "her", "there", "their","about","more","one","what","when","so","if","no","my","your"}
-                    stop_words.update(stop_wordsEN) # Combinamos stopwords en español e inglés
-                    
-                    # 3. Filtrar palabras usando List Comprehension (Pythonic way)
-                    # Solo pasan palabras que NO están en stop_words Y tienen longitud > 3
-                    palabras_filtradas = [p for p in todas_palabras if p not in stop_words and len(p) > 3]
-                    
-                    if palabras_filtradas:
+                    if conexion is not None:
+                        # Con el historial, las frecuencias ya están contadas en la tabla 'frecuencias'
+                        # (se actualiza solo con los artículos nuevos), así que basta una consulta ordenada
+                        top_palabras = aa.palabrasFrecuentes(conexion, seccion, 10)
+                    else:
+                        # Sin historial se cuentan las palabras de los artículos cargados:
+                        # .lower() normaliza a minúsculas, .split() divide el texto por espacios en blanco
+                        # y se quitan las stop words (palabras vacías) y las palabras de 3 letras o menos
+                        palabras_filtradas = []
+                        for art in articulos:
+                            palabras_filtradas.extend(aa.palabrasTexto(art[seccion]))
                         # Counter crea un diccionario hashmap con la cuenta de cada elemento
-                        contador = Counter(palabras_filtradas)
-                        
                         # Obtenemos las 10 más comunes
-                        top_palabras = dict(contador.most_common(10))                        
-                        
+                        top_palabras = dict(Counter(palabras_filtradas).most_common(10))
+                    
+                    if top_palabras:
                         col1, col2 = st.columns(2)
                         with col1:
                             st.bar_chart(top_palabras) # Gráfico de barras automático de Streamlit
@@ -213,39 +240,59 @@ if xml_content:
                     # set() elimina duplicados automáticamente, útil para contar valores únicos
                     st.metric("Fuentes únicas", len(set(a["Link"] for a in articulos)))
             
-            # --- TAB 4: VISOR XML Y XPATH ---
-            # Esta sección es puramente educativa para entender la estructura del archivo
-            # y cómo funcionan las consultas XPath básicas.
-            # NOTA: XPath es un lenguaje para navegar por elementos y atributos en documentos XML.
-            # Referencia de Xpath: https://quickref.me/xpath.html
-            # Prueba Xpath: https://xpather.com/
-            # Aquí usamos ElementTree que tiene soporte limitado para XPath.
-            # Para soporte completo, se recomienda usar lxml (no incluido en este script por simplicidad).
-            with tab4:
-                st.subheader("Contenido XML")
-                c1,c2=st.columns([6,4])
-                with c1:
-                    st.code(xml_content.decode('utf-8'), language='xml')
-                with c2:
-                    # Input para probar consultas XPath en tiempo real sobre el objeto 'root'
-                    parXpath=st.text_input("Filtrar con XPath (ejemplo: .//item/title):",".//item/title")
+            # --- TAB 4: HISTORIAL Y BÚSQUEDA DE TEXTO COMPLETO ---
+            if conexion is not None:
+                with tabs[3]:
+                    resumen = aa.resumenAlmacen(conexion)
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("Artículos en el historial", resumen["total"])
+                    col2.metric("Fuentes", resumen["fuentes"])
+                    col3.metric("Desde", resumen["desde"][:10] if resumen["desde"] else "-")
+                    # FTS5 permite buscar palabras (deben aparecer todas), "frases exactas", OR, NOT y prefijos (econom*)
+                    parBusqueda = st.text_input("Buscar en el historial:", placeholder='economía OR "tasa de interés"')
+                    if parBusqueda:
+                        try:
+                            df_busqueda = aa.buscarArticulos(conexion, parBusqueda)
+                            st.write(f"{len(df_busqueda)} artículos encontrados (máximo 100, ordenados por relevancia)")
+                            st.data_editor(df_busqueda, disabled=True, column_config={
+                                "Link": st.column_config.LinkColumn("Enlace del artículo")}, hide_index=True)
+                        except sqlite3.OperationalError as e:
+                            st.error(f"Búsqueda no válida: {e}")
+
+            if root is not None:
+                # --- TAB 5: VISOR XML Y XPATH ---
+                # Esta sección es puramente educativa para entender la estructura del archivo
+                # y cómo funcionan las consultas XPath básicas.
+                # NOTA: XPath es un lenguaje para navegar por elementos y atributos en documentos XML.
+                # Referencia de Xpath: https://quickref.me/xpath.html
+                # Prueba Xpath: https://xpather.com/
+                # Aquí usamos ElementTree que tiene soporte limitado para XPath.
+                # Para soporte completo, se recomienda usar lxml (no incluido en este script por simplicidad).
+                with tabs[-1]:
+                    st.subheader("Contenido XML")
+                    c1,c2=st.columns([6,4])
+                    with c1:
+                        st.code(xml_content.decode('utf-8'), language='xml')
+                    with c2:
+                        # Input para probar consultas XPath en tiempo real sobre el objeto 'root'
+                        parXpath=st.text_input("Filtrar con XPath (ejemplo: .//item/title):",".//item/title")
                     
-                    try:
-                        elementos_filtrados = root.findall(parXpath,namespaces)                    
-                        st.write(f"Se encontraron {len(elementos_filtrados)} elementos con el XPath proporcionado.")
-                        resultado = ""
-                        parTipoDatos=st.selectbox("Tipo de datos a mostrar:",["Completo","Solo texto"])
+                        try:
+                            elementos_filtrados = root.findall(parXpath,namespaces)                    
+                            st.write(f"Se encontraron {len(elementos_filtrados)} elementos con el XPath proporcionado.")
+                            resultado = ""
+                            parTipoDatos=st.selectbox("Tipo de datos a mostrar:",["Completo","Solo texto"])
                         
-                        for elem in elementos_filtrados:
-                            if parTipoDatos=="Solo texto":
-                                # .text obtiene solo el contenido textual dentro de la etiqueta
-                                resultado += elem.text + "\n"
-                            else:
-                                # ET.tostring recupera la representación XML completa del elemento
-                                resultado += ET.tostring(elem, encoding='unicode') + "\n"
-                        st.code(resultado, language='xml')
-                    except Exception as e:
-                        st.error(f"Error en XPath:{parXpath}\n   {e}")
+                            for elem in elementos_filtrados:
+                                if parTipoDatos=="Solo texto":
+                                    # .text obtiene solo el contenido textual dentro de la etiqueta
+                                    resultado += elem.text + "\n"
+                                else:
+                                    # ET.tostring recupera la representación XML completa del elemento
+                                    resultado += ET.tostring(elem, encoding='unicode') + "\n"
+                            st.code(resultado, language='xml')
+                        except Exception as e:
+                            st.error(f"Error en XPath:{parXpath}\n   {e}")
         else:
             st.warning("No se encontraron artículos en el RSS")
     
@@ -254,4 +301,8 @@ if xml_content:
     # except Exception as e:
     #     st.error(f"Error procesando RSS: {e}")
 else:
-    st.info("👈 Carga un RSS desde el panel lateral para comenzar")
\ No newline at end of file
+    st.info("👈 Carga un RSS desde el panel lateral para comenzar")
+
+# Cerramos la conexión al historial al terminar de dibujar la página
+if conexion is not None:
+    conexion.close()